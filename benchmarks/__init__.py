@@ -0,0 +1,11 @@
+"""
+Benchmarks of SIMURAN on synthetic Axona datasets.
+
+The modules follow the conventions of airspeed velocity (asv), so they can be
+run against each commit with asv run, compared with asv compare,
+and viewed with asv publish, using the asv.conf.json file in the
+repository root. Without asv, python -m benchmarks.run runs them once
+and stores the results of each commit in benchmarks/results.
+Datasets are written with simuran.synthetic to a temporary directory
+and reused by later benchmarks in the same process.
+"""
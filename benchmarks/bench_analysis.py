@@ -0,0 +1,56 @@
+"""Benchmarks of running analysis on every recording, in serial and in parallel."""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from simuran.recording_container import RecordingContainer
+from simuran.main.main import run_all_analysis
+
+from .common import axona_dataset
+
+
+def summarise_recording(recording):
+    """Return the LFP power, spike counts and mean speed of a recording."""
+    summary = {}
+    for i, signal in enumerate(recording.signals):
+        summary["power{}".format(i)] = float(np.mean(np.square(signal.samples)))
+    for unit in recording.units:
+        tags = unit.underlying.get_unit_tags()
+        for tag in unit.available_units:
+            summary["unit{}_{}".format(unit.group, tag)] = int(np.sum(tags == tag))
+    summary["speed"] = float(np.mean(recording.spatial.underlying.get_speed()))
+    return summary
+
+
+class RunAllAnalysis(object):
+    """Load and summarise each recording of a dataset."""
+
+    params = [["small", "medium"], [1, 2, 4]]
+    param_names = ["scale", "num_cpus"]
+    timeout = 1200
+    number = 1
+
+    def setup(self, scale, num_cpus):
+        start_dir, _ = axona_dataset(scale)
+        self.container = RecordingContainer()
+        self.container.auto_setup(start_dir)
+        self.out_dir = tempfile.mkdtemp(prefix="simuran_bench_out_")
+
+    def teardown(self, scale, num_cpus):
+        shutil.rmtree(self.out_dir, ignore_errors=True)
+
+    def time_run_all_analysis(self, scale, num_cpus):
+        run_all_analysis(
+            self.container,
+            [summarise_recording],
+            None,
+            [],
+            [],
+            True,
+            ["signals", "units", "spatial"],
+            self.out_dir,
+            num_cpus=num_cpus,
+        )
@@ -0,0 +1,68 @@
+"""Benchmarks of finding and parsing recordings in a directory tree."""
+
+import os
+
+import numpy as np
+
+from simuran.recording_container import RecordingContainer
+
+from .common import axona_dataset
+
+
+class ContainerSetup(object):
+    """Set up a container from the parameter files of a dataset."""
+
+    params = [["small", "medium", "large"]]
+    param_names = ["scale"]
+    timeout = 600
+
+    def setup(self, scale):
+        self.start_dir, set_files = axona_dataset(scale)
+        self.param_files = [
+            os.path.join(os.path.dirname(f), "simuran_params.py") for f in set_files
+        ]
+
+    def time_auto_setup(self, scale):
+        RecordingContainer().auto_setup(self.start_dir)
+
+    def time_setup(self, scale):
+        RecordingContainer().setup(self.param_files)
+
+    def track_num_recordings(self, scale):
+        return len(self.param_files)
+
+    track_num_recordings.unit = "recordings"
+
+
+class SummaryData(object):
+    """Extract and round the summary rows of a container of analysed recordings."""
+
+    params = [[1000, 10000], [50]]
+    param_names = ["num_recordings", "num_attrs"]
+    timeout = 600
+
+    def setup(self, num_recordings, num_attrs):
+        from simuran.recording import Recording
+
+        rng = np.random.RandomState(0)
+        self.container = RecordingContainer()
+        # Most attributes are single values, the rest come from one dictionary
+        num_single = num_attrs - num_attrs // 5
+        self.attr_list = [("results", "fn", "v{}".format(i)) for i in range(num_single)]
+        self.attr_list.append(("results", "summary"))
+        for r in range(num_recordings):
+            recording = Recording(base_file=os.path.join("data", "rec{}.set".format(r)))
+            values = rng.rand(num_attrs) * 100
+            recording.results = {
+                "fn": {"v{}".format(i): values[i] for i in range(num_single)},
+                "summary": {
+                    "s{}".format(i): float(values[i])
+                    for i in range(num_single, num_attrs)
+                },
+            }
+            recording.results["fn"]["v0"] = int(r)
+            recording.results["fn"]["v1"] = "label{}".format(r)
+            self.container.append(recording)
+
+    def time_summary_data(self, num_recordings, num_attrs):
+        self.container.summary_data(self.attr_list, decimals=3)
@@ -0,0 +1,35 @@
+"""Benchmarks of saving the figures made by analysis functions."""
+
+import shutil
+import tempfile
+
+import numpy as np
+
+from simuran.main.main import save_figures
+
+import matplotlib.pyplot as plt
+
+
+class SaveFigures(object):
+    """Save and close figures of an LFP trace."""
+
+    params = [[1, 5, 20]]
+    param_names = ["num_figures"]
+    timeout = 600
+    number = 1
+
+    def setup(self, num_figures):
+        self.out_dir = tempfile.mkdtemp(prefix="simuran_bench_figures_")
+        samples = np.random.RandomState(0).normal(0, 1, 15000)
+        self.figures = []
+        for _ in range(num_figures):
+            fig, ax = plt.subplots()
+            ax.plot(samples)
+            self.figures.append(fig)
+
+    def teardown(self, num_figures):
+        plt.close("all")
+        shutil.rmtree(self.out_dir, ignore_errors=True)
+
+    def time_save_figures(self, num_figures):
+        save_figures(self.figures, self.out_dir, set_done=True)
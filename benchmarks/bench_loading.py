@@ -0,0 +1,49 @@
+"""Benchmarks of loading synthetic Axona recordings with NeuroChaT."""
+
+import os
+import time
+
+from simuran.recording import Recording
+
+from .common import axona_dataset
+
+MB = 1024 * 1024
+
+
+class LoadRecording(object):
+    """Load the signals, units and positions of one recording."""
+
+    params = [["small", "medium", "large"]]
+    param_names = ["scale"]
+    timeout = 600
+
+    def setup(self, scale):
+        _, set_files = axona_dataset(scale)
+        rec_dir = os.path.dirname(set_files[0])
+        self.param_file = os.path.join(rec_dir, "simuran_params.py")
+        self.num_bytes = sum(
+            os.path.getsize(os.path.join(rec_dir, f)) for f in os.listdir(rec_dir)
+        )
+        self.recording = Recording(param_file=self.param_file, load=False)
+
+    def time_load(self, scale):
+        Recording(param_file=self.param_file, load=True)
+
+    def time_load_signals(self, scale):
+        self.recording.signals.load()
+
+    def time_load_units(self, scale):
+        self.recording.units.load()
+
+    def time_load_spatial(self, scale):
+        self.recording.spatial.load()
+
+    def peakmem_load(self, scale):
+        Recording(param_file=self.param_file, load=True)
+
+    def track_load_throughput(self, scale):
+        start_time = time.perf_counter()
+        Recording(param_file=self.param_file, load=True)
+        return self.num_bytes / MB / (time.perf_counter() - start_time)
+
+    track_load_throughput.unit = "MB/s"
@@ -0,0 +1,87 @@
+"""Benchmarks of merging the csv files and figures of batch outputs."""
+
+import os
+import shutil
+
+from simuran.main.merge import csv_merge, merge_files
+
+from .common import results_tree
+
+
+class CsvMerge(object):
+    """Merge one results csv file from each output directory."""
+
+    params = [[10, 100, 1000]]
+    param_names = ["num_dirs"]
+    timeout = 600
+
+    def setup(self, num_dirs):
+        self.in_dir = results_tree(num_dirs)
+        self.teardown(num_dirs)
+
+    def teardown(self, num_dirs):
+        merged = os.path.join(self.in_dir, "merge.csv")
+        if os.path.isfile(merged):
+            os.remove(merged)
+
+    def time_csv_merge(self, num_dirs):
+        csv_merge(self.in_dir)
+
+
+class MergeFiles(object):
+    """Copy or link the figures of each output directory into one directory."""
+
+    params = [[10, 100, 1000], ["copy", "hardlink"]]
+    param_names = ["num_dirs", "mode"]
+    timeout = 600
+    number = 1
+
+    def setup(self, num_dirs, mode):
+        self.in_dir = results_tree(num_dirs)
+        self.teardown(num_dirs, mode)
+
+    def teardown(self, num_dirs, mode):
+        shutil.rmtree(
+            os.path.join(self.in_dir, "all_results_merged"), ignore_errors=True
+        )
+
+    def time_merge_files(self, num_dirs, mode):
+        merge_files(self.in_dir, mode=mode)
+
+
+class MergeFilesUnchanged(MergeFiles):
+    """Merge figures again when none of them have changed."""
+
+    def setup(self, num_dirs, mode):
+        super().setup(num_dirs, mode)
+        merge_files(self.in_dir, mode=mode)
+
+
+class MergeNewResults(object):
+    """Merge csv files and figures again after five new outputs are added."""
+
+    params = [[100, 2000]]
+    param_names = ["num_dirs"]
+    timeout = 600
+    number = 1
+
+    def setup(self, num_dirs):
+        self.in_dir = results_tree(num_dirs)
+        self.teardown(num_dirs)
+        csv_merge(self.in_dir)
+        merge_files(self.in_dir)
+        for i in range(5):
+            shutil.copytree(
+                os.path.join(self.in_dir, "batch0"),
+                os.path.join(self.in_dir, "new{}".format(i)),
+            )
+
+    def teardown(self, num_dirs):
+        for i in range(5):
+            shutil.rmtree(
+                os.path.join(self.in_dir, "new{}".format(i)), ignore_errors=True
+            )
+
+    def time_merge_new_results(self, num_dirs):
+        csv_merge(self.in_dir)
+        merge_files(self.in_dir)
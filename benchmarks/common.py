@@ -0,0 +1,72 @@
+"""
+Datasets shared by the benchmarks.
+
+asv runs each benchmark in a new process, so datasets are written once to
+SIMURAN_BENCH_DIR, by default simuran_bench in the temporary directory,
+and reused until the directory is removed.
+"""
+
+import os
+import shutil
+import tempfile
+
+from simuran.synthetic import make_axona_dataset, make_results_tree
+
+# Each scale is (fan_out, write_axona_recording keyword arguments)
+SCALES = {
+    "small": ((2, 2), {"duration": 60, "num_channels": 2, "num_tetrodes": 1}),
+    "medium": ((4, 4), {"duration": 300, "num_channels": 4, "num_tetrodes": 2}),
+    "large": ((4, 4, 2), {"duration": 600, "num_channels": 8, "num_tetrodes": 4}),
+}
+
+DONE_NAME = ".done"
+
+
+def data_dir():
+    """Return the directory datasets are written to."""
+    default = os.path.join(tempfile.gettempdir(), "simuran_bench")
+    return os.environ.get("SIMURAN_BENCH_DIR", default)
+
+
+def _is_written(out_dir):
+    return os.path.isfile(os.path.join(out_dir, DONE_NAME))
+
+
+def _set_written(out_dir):
+    open(os.path.join(out_dir, DONE_NAME), "w").close()
+
+
+def axona_dataset(scale):
+    """Return the directory and set files of the dataset at scale, writing it once."""
+    fan_out, kwargs = SCALES[scale]
+    out_dir = os.path.join(data_dir(), "axona_" + scale)
+    if not _is_written(out_dir):
+        # Remove the files of a dataset that was only partly written
+        shutil.rmtree(out_dir, ignore_errors=True)
+        set_files = make_axona_dataset(out_dir, fan_out, **kwargs)
+        _set_written(out_dir)
+    else:
+        set_files = sorted(
+            os.path.join(root, f)
+            for root, _, files in os.walk(out_dir)
+            for f in files
+            if f.endswith(".set")
+        )
+    return out_dir, set_files
+
+
+def results_tree(num_dirs, rows=20, figures=5):
+    """
+    Return a directory of batch outputs to merge, writing it once.
+
+    See simuran.synthetic.make_results_tree.
+
+    """
+    out_dir = os.path.join(
+        data_dir(), "results_{}_{}_{}".format(num_dirs, rows, figures)
+    )
+    if not _is_written(out_dir):
+        shutil.rmtree(out_dir, ignore_errors=True)
+        make_results_tree(out_dir, num_dirs, rows, figures)
+        _set_written(out_dir)
+    return out_dir
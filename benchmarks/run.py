@@ -0,0 +1,273 @@
+"""
+Run the benchmarks without asv and compare results across commits.
+
+Results are stored in benchmarks/results/<commit>.json,
+with "-dirty" appended to the commit if the tree has uncommitted changes.
+Running some of the benchmarks again replaces only their results.
+
+Examples
+--------
+python -m benchmarks.run
+python -m benchmarks.run --bench "Load|CsvMerge" --repeat 5
+python -m benchmarks.run --compare 1a2b3c4 5d6e7f8
+
+Benchmarks follow the asv conventions. Each method starting with time_
+is timed, those starting with track_ return a value, and those starting
+with peakmem_ record the peak memory traced by tracemalloc during the call,
+which unlike asv excludes memory not allocated through Python and numpy.
+"""
+
+import os
+import io
+import re
+import sys
+import json
+import time
+import inspect
+import argparse
+import platform
+import itertools
+import importlib
+import subprocess
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+PREFIXES = ("time_", "track_", "peakmem_")
+MODULES = (
+    "bench_loading",
+    "bench_container",
+    "bench_analysis",
+    "bench_merge",
+    "bench_figures",
+)
+
+
+def current_commit():
+    """Return the short hash of HEAD, with -dirty if there are local changes."""
+    repo_dir = os.path.dirname(RESULTS_DIR)
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=repo_dir
+        )
+        status = subprocess.check_output(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=repo_dir
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    commit = commit.decode().strip()
+    return commit + "-dirty" if status.strip() else commit
+
+
+def find_benchmarks(pattern=None):
+    """
+    Return the benchmarks matching pattern.
+
+    Returns
+    -------
+    list of tuple
+        (name, class, method name) for each benchmark,
+        where name is module.Class.method.
+
+    """
+    found = []
+    for module_name in MODULES:
+        module = importlib.import_module("benchmarks." + module_name)
+        for cls_name, cls in inspect.getmembers(module, inspect.isclass):
+            if cls.__module__ != module.__name__:
+                continue
+            for method in sorted(dir(cls)):
+                if not method.startswith(PREFIXES):
+                    continue
+                name = "{}.{}.{}".format(module_name, cls_name, method)
+                if (pattern is None) or re.search(pattern, name):
+                    found.append((name, cls, method))
+    return found
+
+
+def _measure(fn, method, params):
+    if method.startswith("track_"):
+        return fn(*params)
+    if method.startswith("peakmem_"):
+        tracemalloc.start()
+        try:
+            fn(*params)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    start_time = time.perf_counter()
+    fn(*params)
+    return time.perf_counter() - start_time
+
+
+def run_benchmark(cls, method, repeat=3):
+    """
+    Run a benchmark with each combination of its parameters.
+
+    Setup and teardown are run around each measurement, so benchmarks
+    that change their inputs, such as saving figures, are measured
+    from the same starting point each time.
+
+    Returns
+    -------
+    list of tuple
+        (parameters, value) for each combination, where value is
+        None if the benchmark raised an error.
+
+    """
+    params = getattr(cls, "params", [])
+    if params and not isinstance(params[0], (list, tuple)):
+        params = [params]
+    results = []
+    for combination in itertools.product(*params):
+        values = []
+        num_runs = 1 if not method.startswith("time_") else repeat
+        try:
+            for _ in range(num_runs):
+                bench = cls()
+                with redirect_stdout(io.StringIO()):
+                    if hasattr(bench, "setup"):
+                        bench.setup(*combination)
+                    try:
+                        values.append(
+                            _measure(getattr(bench, method), method, combination)
+                        )
+                    finally:
+                        if hasattr(bench, "teardown"):
+                            bench.teardown(*combination)
+        except Exception as e:
+            print("    {} failed: {}".format(list(combination), e))
+            results.append((list(combination), None))
+            continue
+        results.append((list(combination), min(values)))
+    return results
+
+
+def _unit(cls, method):
+    if method.startswith("time_"):
+        return "seconds"
+    if method.startswith("peakmem_"):
+        return "bytes"
+    return getattr(getattr(cls, method), "unit", "unit")
+
+
+def save_results(results, location):
+    """Atomically write results to location as JSON."""
+    os.makedirs(os.path.dirname(location), exist_ok=True)
+    temp_name = location + ".tmp"
+    with open(temp_name, "w") as f:
+        json.dump(results, f, indent=2)
+    os.replace(temp_name, location)
+
+
+def load_results(commit):
+    """Load the results stored for commit, a prefix of its hash is enough."""
+    names = [
+        f
+        for f in sorted(os.listdir(RESULTS_DIR))
+        if f.startswith(commit) and f.endswith(".json")
+    ]
+    if len(names) == 0:
+        raise ValueError("No results stored for {} in {}".format(commit, RESULTS_DIR))
+    with open(os.path.join(RESULTS_DIR, names[-1]), "r") as f:
+        return json.load(f)
+
+
+def compare(old, new, factor=1.1):
+    """
+    Print the ratio of new to old for each benchmark in both results.
+
+    Benchmarks whose time or memory grew by more than factor are marked
+    with a +, and those that shrank by more than factor with a -.
+
+    Returns
+    -------
+    list of str
+        The names of the benchmarks that got slower or used more memory.
+
+    """
+    worse = []
+    print("{:>10} {:>10} {:>7}  {}".format("before", "after", "ratio", "benchmark"))
+    for name, entry in new["benchmarks"].items():
+        if name not in old["benchmarks"]:
+            continue
+        old_values = dict(
+            (json.dumps(p), v) for p, v in old["benchmarks"][name]["results"]
+        )
+        for params, value in entry["results"]:
+            old_value = old_values.get(json.dumps(params), None)
+            if (old_value is None) or (value is None) or (old_value == 0):
+                continue
+            ratio = value / old_value
+            # Larger is better for rates, such as MB/s, so flip the ratio
+            if entry["unit"].endswith("/s"):
+                ratio = 1.0 / ratio if ratio != 0 else float("inf")
+            mark = " "
+            if ratio > factor:
+                mark = "+"
+                worse.append("{}{}".format(name, params))
+            elif ratio < 1.0 / factor:
+                mark = "-"
+            print(
+                "{}{:>9.4g} {:>10.4g} {:>7.2f}  {}{}".format(
+                    mark, old_value, value, ratio, name, params
+                )
+            )
+    return worse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--bench", "-b", default=None, help="Regex of benchmarks")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repeats")
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("OLD", "NEW"),
+        default=None,
+        help="Compare the stored results of two commits instead of running",
+    )
+    parser.add_argument(
+        "--factor", type=float, default=1.1, help="Ratio to report as a change"
+    )
+    parsed = parser.parse_args(argv)
+
+    if parsed.compare is not None:
+        old, new = (load_results(commit) for commit in parsed.compare)
+        worse = compare(old, new, parsed.factor)
+        return 1 if worse else 0
+
+    commit = current_commit()
+    results = {
+        "commit": commit,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "machine": platform.node(),
+        "python": platform.python_version(),
+        "benchmarks": {},
+    }
+    for name, cls, method in find_benchmarks(parsed.bench):
+        print("Running {}".format(name))
+        values = run_benchmark(cls, method, parsed.repeat)
+        unit = _unit(cls, method)
+        for params, value in values:
+            print("    {} {} {}".format(params, value, unit))
+        results["benchmarks"][name] = {
+            "params": getattr(cls, "param_names", []),
+            "unit": unit,
+            "results": values,
+        }
+    # Keep the results of benchmarks run earlier on the same commit
+    location = os.path.join(RESULTS_DIR, commit + ".json")
+    if os.path.isfile(location):
+        with open(location, "r") as f:
+            earlier = json.load(f)["benchmarks"]
+        earlier.update(results["benchmarks"])
+        results["benchmarks"] = earlier
+    save_results(results, location)
+    print("Saved results to {}".format(location))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
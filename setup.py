@@ -22,6 +22,7 @@ VERSION = "0.0.1"
 INSTALL_REQUIRES = [
     "matplotlib >= 3.0.2",
     "numpy >= 1.15.0",
+    "pandas",
     "skm_pyutils",
     "seaborn",
     "more_itertools",
@@ -30,6 +31,11 @@ INSTALL_REQUIRES = [
     "doit",
 ]
 
+# Optional packages, installed with pip install simuran[tables]
+EXTRAS_REQUIRE = {
+    "tables": ["pyarrow"],
+}
+
 CLASSIFIERS = [
     "Intended Audience :: Science/Research",
     "Programming Language :: Python :: 3.6",
@@ -64,6 +70,7 @@ if __name__ == "__main__":
         version=VERSION,
         download_url=DOWNLOAD_URL,
         install_requires=INSTALL_REQUIRES,
+        extras_require=EXTRAS_REQUIRE,
         include_package_data=True,
         packages=find_packages(),
         classifiers=CLASSIFIERS,
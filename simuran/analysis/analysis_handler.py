@@ -1,10 +1,14 @@
 """This module provides functionality for performing large batch analysis."""
 
+import time
 import logging
 
 from indexed import IndexedOrderedDict
 from skm_pyutils.py_log import log_exception
 
+from simuran.memory_profiler import profile_memory
+from simuran.tracer import trace
+
 
 class AnalysisHandler(object):
     """
@@ -21,11 +25,16 @@ class AnalysisHandler(object):
         Keyword arguments to pass to the functions to run.
     results : indexed.IndexedOrderedDict
         The results of the function calls
+    timings : list of tuple
+        (function name, seconds) for each function call since the last reset,
+        including calls with results loaded from the cache.
     verbose : bool
         Whether to print more information while running the functions.
     handle_errors : bool
         Whether to handle errors during runtime of underlying functions,
         or to crash on error.
+    cache : simuran.analysis.cache.AnalysisCache or None
+        If not None, function results are loaded from and saved to this cache.
 
     Parameters
     ----------
@@ -33,17 +42,21 @@ class AnalysisHandler(object):
         Sets the value of the verbose attribute, defaults to False.
     handle_errors : bool, optional
         Sets the value of the handle_errors attribute, defaults to False.
+    cache : simuran.analysis.cache.AnalysisCache, optional
+        Sets the value of the cache attribute, defaults to None.
 
     """
 
-    def __init__(self, verbose=False, handle_errors=False):
+    def __init__(self, verbose=False, handle_errors=False, cache=None):
         """See help(AnalysisHandler)."""
         self.fns_to_run = []
         self.fn_params_list = []
         self.fn_kwargs_list = []
         self.results = IndexedOrderedDict()
+        self.timings = []
         self.verbose = verbose
         self.handle_errors = handle_errors
+        self.cache = cache
 
     def set_handle_errors(self, handle_errors):
         """Set the value of self.handle_errors."""
@@ -53,6 +66,10 @@ class AnalysisHandler(object):
         """Set the value of self.verbose."""
         self.verbose = verbose
 
+    def set_cache(self, cache):
+        """Set the value of self.cache."""
+        self.cache = cache
+
     def run_all_fns(self):
         """Run all of the established functions."""
         fn_zipped = zip(self.fns_to_run, self.fn_params_list, self.fn_kwargs_list)
@@ -75,8 +92,9 @@ class AnalysisHandler(object):
         self.fn_kwargs_list = []
 
     def reset_results(self):
-        """Reset the results."""
+        """Reset the results and timings."""
         self.results = IndexedOrderedDict()
+        self.timings = []
 
     def add_fn(self, fn, *args, **kwargs):
         """
@@ -106,6 +124,8 @@ class AnalysisHandler(object):
 
         Pass simuran_save_result as a keyword argument to control
         if the result of the function is saved or not.
+        If self.cache is set, the result is loaded from the cache when
+        available, in which case the function is not run.
 
         Parameters
         ----------
@@ -120,20 +140,34 @@ class AnalysisHandler(object):
         """
         if self.verbose:
             print("Running {} with params {} kwargs {}".format(fn, *args, **kwargs))
-        if self.handle_errors:
-            try:
-                result = fn(*args, **kwargs)
-            except BaseException as e:
-                log_exception(
-                    e,
-                    "Running {} with args {} and kwargs {}".format(
-                        fn.__name__, args, kwargs
-                    ),
-                )
-                self._was_error = True
-                result = "SIMURAN-ERROR"
-        else:
-            result = fn(*args, **kwargs)
+        start_time = time.perf_counter()
+        cache_key = None
+        found = False
+        errored = False
+        with trace(fn.__name__, "function"), profile_memory("function", fn.__name__):
+            if self.cache is not None:
+                cache_key = self.cache.get_key(fn, args, kwargs)
+                found, result = self.cache.load(fn, cache_key)
+            if not found:
+                if self.handle_errors:
+                    try:
+                        result = fn(*args, **kwargs)
+                    except BaseException as e:
+                        log_exception(
+                            e,
+                            "Running {} with args {} and kwargs {}".format(
+                                fn.__name__, args, kwargs
+                            ),
+                        )
+                        self._was_error = True
+                        errored = True
+                        result = "SIMURAN-ERROR"
+                else:
+                    result = fn(*args, **kwargs)
+
+                if (self.cache is not None) and (not errored):
+                    self.cache.save(fn, cache_key, result)
+        self.timings.append((fn.__name__, time.perf_counter() - start_time))
 
         ctr = 1
         save_result = kwargs.get("simuran_save_result", True)
@@ -0,0 +1,400 @@
+"""
+This module provides on disk caching of analysis function results.
+
+Functions are keyed on their own source code only, so editing a helper
+that a cached function calls does not invalidate its results.
+Declare such helpers with cache_depends_on, or bump a version with it
+when the results should change for another reason, such as an upgraded
+library, to stop stale results from being returned.
+"""
+
+import os
+import hashlib
+import inspect
+import pickle
+import tempfile
+from collections import OrderedDict
+from collections.abc import Mapping, Set
+
+import numpy as np
+
+from simuran.base_class import BaseSimuran
+from simuran.base_container import AbstractContainer
+
+
+def fingerprint_file(path):
+    """
+    Return a tuple describing the state of a file on disk.
+
+    Parameters
+    ----------
+    path : str
+        The path to the file.
+
+    Returns
+    -------
+    tuple
+        (path, size, mtime) if the file exists, else (path, None, None).
+
+    """
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError, ValueError):
+        return (path, None, None)
+    return (path, stat.st_size, stat.st_mtime_ns)
+
+
+def fingerprint_source_files(obj):
+    """
+    Return the fingerprints of the files that obj was or will be loaded from.
+
+    Works on any object with source_file or source_files attributes,
+    such as simuran.recording.Recording objects.
+    The units selected for analysis are also included if present,
+    as these change the results of analysis functions.
+
+    Parameters
+    ----------
+    obj : simuran.base_class.BaseSimuran
+        The object to fingerprint.
+
+    Returns
+    -------
+    list of tuple
+        The fingerprint of each file.
+
+    """
+    paths = []
+
+    def add_paths(item):
+        if item is None:
+            return
+        if isinstance(item, str):
+            paths.append(item)
+        elif isinstance(item, dict):
+            for key in sorted(item.keys(), key=str):
+                add_paths(item[key])
+        elif isinstance(item, (list, tuple)):
+            for val in item:
+                add_paths(val)
+
+    add_paths(getattr(obj, "source_file", None))
+    add_paths(getattr(obj, "source_files", None))
+    param_handler = getattr(obj, "param_handler", None)
+    if param_handler is not None:
+        add_paths(getattr(param_handler, "location", None))
+
+    fingerprint = [fingerprint_file(p) for p in paths]
+    units = getattr(obj, "units", None)
+    if units is not None:
+        try:
+            fingerprint.append([u.units_to_use for u in units])
+        except (AttributeError, TypeError):
+            pass
+    return fingerprint
+
+
+def cache_depends_on(*dependencies, version=None):
+    """
+    Declare what the cached results of a function depend on.
+
+    Use as a decorator. The source code of each dependency is added
+    to the cache key of the function, as is the version,
+    so changing either of them runs the function again.
+
+    Parameters
+    ----------
+    *dependencies : function or module
+        The helpers called by the function.
+    version : object, optional
+        Change this to invalidate the cached results, by default None.
+
+    Returns
+    -------
+    function
+        The decorator, which returns the function it is given.
+
+    Example
+    -------
+    .. highlight:: python
+    .. code-block:: python
+
+        @cache_depends_on(filter_signal, version=2)
+        def power(recording):
+            return filter_signal(recording.signals[0]).samples.mean()
+
+    """
+
+    def decorator(fn):
+        fn.cache_dependencies = dependencies
+        fn.cache_version = version
+        return fn
+
+    return decorator
+
+
+def hash_function(fn, _seen=None):
+    """
+    Return a hash of the qualified name and source code of fn.
+
+    If the source code is not available, such as for functions
+    defined in configuration files, the compiled bytecode is used.
+    Dependencies and a version declared with cache_depends_on
+    are included in the hash.
+
+    Parameters
+    ----------
+    fn : function
+        The function to hash.
+
+    Returns
+    -------
+    str
+        The hex digest of the hash.
+
+    """
+    h = hashlib.sha256()
+    h.update(function_name(fn).encode("utf-8"))
+    try:
+        h.update(inspect.getsource(fn).encode("utf-8"))
+    except (OSError, TypeError):
+        code = getattr(fn, "__code__", None)
+        if code is None:
+            h.update(repr(fn).encode("utf-8"))
+        else:
+            h.update(code.co_code)
+            h.update(repr(code.co_consts).encode("utf-8"))
+            h.update(repr(code.co_names).encode("utf-8"))
+    h.update(repr(getattr(fn, "cache_version", None)).encode("utf-8"))
+    # Dependencies can depend on each other, so each is only hashed once
+    seen = {id(fn)} if _seen is None else _seen
+    for dependency in getattr(fn, "cache_dependencies", ()):
+        if id(dependency) in seen:
+            continue
+        seen.add(id(dependency))
+        h.update(hash_function(dependency, seen).encode("utf-8"))
+    return h.hexdigest()
+
+
+def function_name(fn):
+    """Return module.qualname for fn."""
+    module = getattr(fn, "__module__", None)
+    name = getattr(fn, "__qualname__", getattr(fn, "__name__", repr(fn)))
+    if module is None:
+        return name
+    return "{}.{}".format(module, name)
+
+
+def _update_hash(h, obj):
+    """
+    Update the hash h with obj.
+
+    Objects loaded from source files are hashed by their file fingerprints,
+    rather than by their (potentially very large) loaded contents.
+    Sets and mappings are hashed in an order that does not depend on
+    the order of their items, so equal arguments give equal keys.
+
+    Raises
+    ------
+    TypeError
+        If obj can not be hashed reliably.
+
+    """
+    if isinstance(obj, BaseSimuran):
+        h.update(b"simuran")
+        h.update(repr(fingerprint_source_files(obj)).encode("utf-8"))
+    elif isinstance(obj, AbstractContainer):
+        h.update(b"container")
+        for item in obj.container:
+            _update_hash(h, item)
+    elif isinstance(obj, (list, tuple)):
+        h.update("{}{}".format(type(obj).__name__, len(obj)).encode("utf-8"))
+        for item in obj:
+            _update_hash(h, item)
+    elif isinstance(obj, Mapping):
+        h.update("dict{}".format(len(obj)).encode("utf-8"))
+        items = sorted(_digest((key, value)) for key, value in obj.items())
+        for item in items:
+            h.update(item.encode("utf-8"))
+    elif isinstance(obj, Set):
+        h.update("set{}".format(len(obj)).encode("utf-8"))
+        for item in sorted(_digest(item) for item in obj):
+            h.update(item.encode("utf-8"))
+    elif isinstance(obj, np.ndarray):
+        h.update("{}{}".format(obj.dtype, obj.shape).encode("utf-8"))
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif callable(obj):
+        h.update(hash_function(obj).encode("utf-8"))
+    else:
+        try:
+            h.update(pickle.dumps(obj, protocol=4))
+        except Exception as e:
+            raise TypeError("Can't hash {} for caching".format(type(obj))) from e
+
+
+def _digest(obj):
+    """Return the hex digest of a new hash updated with obj."""
+    h = hashlib.sha256()
+    _update_hash(h, obj)
+    return h.hexdigest()
+
+
+class AnalysisCache(object):
+    """
+    Store the results of analysis functions on disk.
+
+    Results are keyed on the qualified name of the function,
+    a hash of its source code, the arguments passed to it,
+    and the fingerprints of the source files of any recordings passed.
+    Helpers called by the function are not part of the key
+    unless they are declared with cache_depends_on.
+    Note that cached functions are not run at all,
+    so functions with side effects (such as plotting) should not be cached.
+
+    Attributes
+    ----------
+    cache_dir : str
+        The directory that results are stored in.
+    stats : collections.OrderedDict
+        A mapping from function name to a dictionary of "hits" and "misses".
+    verbose : bool
+        Whether to print more information.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Sets the value of the cache_dir attribute.
+    verbose : bool, optional
+        Sets the value of the verbose attribute, by default False.
+
+    """
+
+    def __init__(self, cache_dir, verbose=False):
+        """See help(AnalysisCache)."""
+        self.cache_dir = cache_dir
+        self.stats = OrderedDict()
+        self.verbose = verbose
+
+    def get_key(self, fn, args, kwargs):
+        """
+        Return the cache key for fn run with args and kwargs.
+
+        Parameters
+        ----------
+        fn : function
+            The function to be run.
+        args : tuple
+            The positional arguments to the function.
+        kwargs : dict
+            The keyword arguments to the function.
+
+        Returns
+        -------
+        str or None
+            The key, or None if the arguments can't be reliably hashed.
+
+        """
+        h = hashlib.sha256()
+        h.update(hash_function(fn).encode("utf-8"))
+        try:
+            _update_hash(h, args)
+            _update_hash(h, kwargs)
+        except TypeError:
+            return None
+        return h.hexdigest()
+
+    def get_path(self, fn, key):
+        """Return the path to the result of fn stored under key."""
+        return os.path.join(self.cache_dir, function_name(fn), key + ".pickle")
+
+    def load(self, fn, key):
+        """
+        Load a result of fn from the cache.
+
+        Parameters
+        ----------
+        fn : function
+            The function to load results for.
+        key : str or None
+            The key from get_key.
+
+        Returns
+        -------
+        found : bool
+            Whether the result was in the cache.
+        result : object
+            The cached result, or None if not found.
+
+        """
+        found, result = False, None
+        if key is not None:
+            path = self.get_path(fn, key)
+            if os.path.isfile(path):
+                try:
+                    with open(path, "rb") as f:
+                        result = pickle.load(f)
+                    found = True
+                except Exception:
+                    found, result = False, None
+        self.record(function_name(fn), found)
+        if self.verbose and found:
+            print("Loaded cached result of {}".format(function_name(fn)))
+        return found, result
+
+    def save(self, fn, key, result):
+        """
+        Save the result of fn to the cache under key.
+
+        The file is written atomically, so interrupted writes
+        never leave a partial result in the cache.
+
+        Parameters
+        ----------
+        fn : function
+            The function that was run.
+        key : str or None
+            The key from get_key, nothing is saved if this is None.
+        result : object
+            The result of the function.
+
+        Returns
+        -------
+        None
+
+        """
+        if key is None:
+            return
+        path = self.get_path(fn, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(result, f, protocol=4)
+            os.replace(temp_name, path)
+        except Exception:
+            if os.path.isfile(temp_name):
+                os.remove(temp_name)
+
+    def record(self, name, hit):
+        """Record a cache hit (hit=True) or miss for the function name."""
+        entry = self.stats.setdefault(name, {"hits": 0, "misses": 0})
+        entry["hits" if hit else "misses"] += 1
+
+    def merge_stats(self, stats):
+        """Add the counts in stats (from another cache object) to this one."""
+        for name, entry in stats.items():
+            mine = self.stats.setdefault(name, {"hits": 0, "misses": 0})
+            mine["hits"] += entry["hits"]
+            mine["misses"] += entry["misses"]
+
+    def print_stats(self):
+        """Print the cache hits and misses for each function."""
+        if len(self.stats) == 0:
+            return
+        print("Result cache statistics from {}:".format(self.cache_dir))
+        for name, entry in self.stats.items():
+            print(
+                "    {}: {} hits, {} misses".format(
+                    name, entry["hits"], entry["misses"]
+                )
+            )
@@ -1,9 +1,6 @@
 import datetime
 import os
 
-import mne
-from mne.preprocessing import ICA
-
 
 def create_mne_array(recording, ch_names=None):
     """
@@ -21,6 +18,8 @@ def create_mne_array(recording, ch_names=None):
     mne.io.RawArray
 
     """
+    import mne
+
     # TODO work with quantities here to avoid magic division to uV
     raw_data = recording.get_np_signals() / 1000
 
@@ -55,6 +54,8 @@ def ICA_pipeline(
     skip_plots=False,
 ):
     """This is example code using mne."""
+    from mne.preprocessing import ICA
+
     raw = mne_array
     filt_raw = raw.copy()
     filt_raw.load_data().filter(l_freq=1.0, h_freq=90)
@@ -312,36 +312,87 @@ class BaseSimuran(ABC):
             attr_list and friendly_names are not the same size.
 
         """
-        if friendly_names is not None:
-            if len(friendly_names) != len(attr_list):
-                raise ValueError("friendly_names and attr_list must be the same")
+        return compile_attr_list(attr_list, friendly_names)(self)
+
+    def __str__(self):
+        """Call on print."""
+        return "{} with attributes {}".format(self.__class__.__name__, self.__dict__)
+
+
+def compile_attr_list(attr_list, friendly_names=None):
+    """
+    Compile a list of attributes into a function that retrieves them.
+
+    The returned function gives the same dictionary as
+    BaseSimuran.data_dict_from_attr_list, but attr_list is only parsed once,
+    so it is much faster to call on many objects.
+
+    Parameters
+    ----------
+    attr_list : list
+        The list of attributes to retrieve,
+        see BaseSimuran.data_dict_from_attr_list.
+    friendly_names : list, optional
+        What to name each retrieved attribute, (default None).
+        Must be the same size as attr_list or None.
+
+    Returns
+    -------
+    function
+        Takes an object and returns a dict of its retrieved attributes.
+
+    Raises
+    ------
+    ValueError
+        attr_list and friendly_names are not the same size.
 
+    """
+    if friendly_names is not None:
+        if len(friendly_names) != len(attr_list):
+            raise ValueError("friendly_names and attr_list must be the same")
+
+    accessors = []
+    for i, attr_tuple in enumerate(attr_list):
+        steps = []
+        for a in attr_tuple:
+            if a is None:
+                break
+            if isinstance(a, str):
+                # Dictionaries have no attributes of their own to look up
+                steps.append((a, True, not hasattr(dict, a)))
+            else:
+                steps.append((a, False, False))
+        if friendly_names is not None:
+            key, join_key = friendly_names[i], False
+        else:
+            try:
+                key, join_key = "_".join(attr_tuple), False
+            except TypeError:
+                # Only an error if the attribute is not a dictionary
+                key, join_key = attr_tuple, True
+        accessors.append((tuple(steps), key, join_key))
+
+    def data_dict(obj):
         data_out = {}
-        for i, attr_tuple in enumerate(attr_list):
-            item = self
-            for a in attr_tuple:
-                if a is None:
-                    break
-                if isinstance(a, str):
-                    if hasattr(item, a):
+        for steps, key, join_key in accessors:
+            item = obj
+            for a, is_str, dict_key in steps:
+                if dict_key and (type(item) is dict):
+                    item = item[a]
+                elif is_str:
+                    try:
                         item = getattr(item, a)
-                    else:
+                    except AttributeError:
                         item = item[a]
                 else:
                     item = item[a]
                 if callable(item):
                     item = item()
             if isinstance(item, dict):
-                for key, value in item.items():
-                    data_out[key] = value
+                for k, value in item.items():
+                    data_out[k] = value
             else:
-                if friendly_names is None:
-                    key = "_".join(attr_tuple)
-                else:
-                    key = friendly_names[i]
-                data_out[key] = item
+                data_out["_".join(key) if join_key else key] = item
         return data_out
 
-    def __str__(self):
-        """Call on print."""
-        return "{} with attributes {}".format(self.__class__.__name__, self.__dict__)
+    return data_dict
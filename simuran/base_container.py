@@ -5,10 +5,91 @@ import copy
 
 import numpy as np
 
-from simuran.base_class import BaseSimuran
+from simuran.base_class import BaseSimuran, compile_attr_list
 from skm_pyutils.py_save import save_mixed_dict_to_csv
 from skm_pyutils.py_save import save_dicts_to_csv
 
+_data_dict_from_attr_list = BaseSimuran.data_dict_from_attr_list
+
+# Columns shorter than this are rounded value by value
+_MIN_VECTOR_LENGTH = 16
+
+
+def _round_value(value, decimals):
+    """Return round(value, decimals), or value if it can not be rounded."""
+    try:
+        return round(value, decimals)
+    except BaseException:
+        return value
+
+
+def _round_floats(values, decimals):
+    """Round a list of floats, or of numpy floats, as round would."""
+    array = np.array(values, dtype=np.float64)
+    with np.errstate(all="ignore"):
+        rounded = np.round(array, decimals)
+        # Near half way, numpy and round can round in different directions,
+        # and very large or non finite values are left to round too
+        scaled = array * 10.0 ** decimals
+        distance = np.abs(scaled - np.floor(scaled) - 0.5)
+        unsure = ~(distance > np.abs(scaled) * 1e-14 + 1e-12)
+    out = rounded.tolist() if type(values[0]) is float else list(rounded)
+    for i in np.flatnonzero(unsure):
+        out[i] = round(values[i], decimals)
+    return out
+
+
+def _round_values(values, decimals):
+    """
+    Return round(value, decimals) for each value in a column.
+
+    Values that can not be rounded are returned unchanged.
+    Columns of floats are rounded at once with numpy, with the same
+    output as rounding each value.
+
+    """
+    types = set(type(value) for value in values)
+    if (len(types) == 1) and (type(decimals) is int):
+        value_type = types.pop()
+        if value_type in (str, type(None)):
+            return values
+        if (value_type in (int, np.int64)) and (decimals >= 0):
+            return values
+        if (value_type in (float, np.float64)) and (
+            len(values) >= _MIN_VECTOR_LENGTH
+        ):
+            return _round_floats(values, decimals)
+    return [_round_value(value, decimals) for value in values]
+
+
+def _round_rows(rows, decimals):
+    """Round each column of a list of dictionaries in place."""
+    if len(rows) == 0:
+        return
+    keys = rows[0].keys()
+    if all(row.keys() == keys for row in rows):
+        for key in list(keys):
+            values = [row[key] for row in rows]
+            rounded = _round_values(values, decimals)
+            if rounded is not values:
+                for row, value in zip(rows, rounded):
+                    row[key] = value
+        return
+
+    columns = {}
+    for i, row in enumerate(rows):
+        for key, value in row.items():
+            if key in columns:
+                columns[key][0].append(i)
+                columns[key][1].append(value)
+            else:
+                columns[key] = ([i], [value])
+    for key, (indices, values) in columns.items():
+        rounded = _round_values(values, decimals)
+        if rounded is not values:
+            for i, value in zip(indices, rounded):
+                rows[i][key] = value
+
 
 class AbstractContainer(ABC):
     """
@@ -237,9 +318,36 @@ class AbstractContainer(ABC):
         --------
         simuran.base_container.data_from_attr_list
 
+        """
+        data_list = self.summary_data(
+            attr_list, friendly_names=friendly_names, decimals=decimals
+        )
+        save_dicts_to_csv(location, data_list)
+
+    def summary_data(self, attr_list, friendly_names=None, idx=None, decimals=3):
+        """
+        Retrieve the rows saved by save_summary_data.
+
+        Parameters
+        ----------
+        attr_list : list of tuples
+            Attributes to retrieve.
+        friendly_names : list of str, optional
+            The names of the attributes to retrieve, by default None
+        idx : int, optional
+            A specific index to retrieve the row for, by default retrieves all
+        decimals : int, optional
+            The number of decimal places to save outputs with, by default 3
+
+        Returns
+        -------
+        list of dict or dict
+            A dict is returned if idx is not None, otherwise list of dict.
+
         """
         attr_list = [("source_dir",), ("source_name",)] + attr_list
-        for i in range(len(self)):
+        idx_list = range(len(self)) if idx is None else [idx]
+        for i in idx_list:
             if self[i].source_file is not None:
                 self[i].source_dir = os.path.dirname(self[i].source_file)
                 self[i].source_name = os.path.basename(self[i].source_file)
@@ -249,10 +357,9 @@ class AbstractContainer(ABC):
         if friendly_names is not None:
             friendly_names = ["Recording directory", "Recording name"] + friendly_names
 
-        data_list = self.data_from_attr_list(
-            attr_list, friendly_names=friendly_names, decimals=decimals
+        return self.data_from_attr_list(
+            attr_list, friendly_names=friendly_names, idx=idx, decimals=decimals
         )
-        save_dicts_to_csv(location, data_list)
 
     def data_from_attr_list(self, attr_list, friendly_names=None, idx=None, decimals=3):
         """
@@ -292,36 +399,22 @@ class AbstractContainer(ABC):
             if len(friendly_names) != len(attr_list):
                 friendly_names = None
 
-        def get_single(item, attr_list):
-            if isinstance(item, BaseSimuran):
-                data = item.data_dict_from_attr_list(attr_list, friendly_names)
-                try:
-                    round(data, decimals)
-                except BaseException:
-                    try:
-                        data = np.round(data, decimals)
-                    except BaseException:
-                        try:
-                            for key, value in data.items():
-                                try:
-                                    data[key] = round(value, decimals)
-                                except BaseException:
-                                    pass
-                        except BaseException:
-                            pass
-            else:
+        items = list(self) if idx is None else [self[idx]]
+        data_dict = compile_attr_list(attr_list, friendly_names)
+        data_out = []
+        for item in items:
+            if not isinstance(item, BaseSimuran):
                 raise ValueError(
                     "data_from_attr_list is only called on BaseSimuran objects"
                 )
-            return data
-
-        if idx is None:
-            data_out = []
-            for item in self:
-                data_out.append(get_single(item, attr_list))
-        else:
-            data_out = get_single(self[idx], attr_list)
-        return data_out
+            # Subclasses may retrieve their attributes in their own way
+            if type(item).data_dict_from_attr_list is _data_dict_from_attr_list:
+                data_out.append(data_dict(item))
+            else:
+                data = item.data_dict_from_attr_list(attr_list, friendly_names)
+                data_out.append(data)
+        _round_rows(data_out, decimals)
+        return data_out if idx is None else data_out[0]
 
     def sort(self, key, reverse=False):
         """
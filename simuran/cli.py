@@ -1,14 +1,117 @@
 """A command line interface into SIMURAN."""
 import argparse
 import simuran.main
+import simuran.main.progress
 import simuran.batch_setup
+import simuran.tracer
+import simuran.profiler
 import os
+import sys
+
+
+def worker_main(args=None):
+    """
+    Start a worker for a job queue, as simuran worker queue_dir.
+
+    Parameters
+    ----------
+    args : list of str, optional
+        The command line arguments after "worker", by default sys.argv[2:].
+
+    Returns
+    -------
+    int
+        The number of tasks the worker ran.
+
+    """
+    from simuran.main.job_queue import run_worker
+
+    parser = argparse.ArgumentParser("simuran worker")
+    parser.add_argument(
+        "queue_dir",
+        type=str,
+        help="path to the job queue directory passed to simuran --queue_dir",
+    )
+    parser.add_argument(
+        "--poll_interval",
+        type=float,
+        default=2.0,
+        help="Seconds to wait between checks for new tasks, default is 2",
+    )
+    parser.add_argument(
+        "--exit_when_empty",
+        action="store_true",
+        help="Whether to stop once no tasks are pending or running",
+    )
+    parsed = parser.parse_args(sys.argv[2:] if args is None else args)
+    return run_worker(
+        parsed.queue_dir,
+        poll_interval=parsed.poll_interval,
+        exit_when_empty=parsed.exit_when_empty,
+    )
+
+
+def gather_main(args=None):
+    """
+    Combine the outputs of sharded runs, as simuran gather batch_config_path.
+
+    Parameters
+    ----------
+    args : list of str, optional
+        The command line arguments after "gather", by default sys.argv[2:].
+
+    Returns
+    -------
+    tuple of lists
+        The output of simuran.main.batch_main.batch_gather.
+
+    """
+    parser = argparse.ArgumentParser("simuran gather")
+    parser.add_argument(
+        "batch_config_path",
+        type=str,
+        help="path to the configuration file the shards were run with",
+    )
+    parser.add_argument(
+        "--function_config_path",
+        "-fn",
+        type=str,
+        default="",
+        help="path to the function configuration file the shards were run with",
+    )
+    parser.add_argument(
+        "--merge",
+        "-m",
+        action="store_true",
+        help="Whether to merge files after gathering",
+    )
+    parser.add_argument(
+        "--verbose",
+        "-v",
+        action="store_true",
+        help="whether to print extra information during runtime",
+    )
+    parsed = parser.parse_args(sys.argv[2:] if args is None else args)
+    if not os.path.isfile(parsed.function_config_path):
+        parsed.function_config_path = None
+    return simuran.main.batch_main.batch_gather(
+        parsed.batch_config_path,
+        function_to_use=parsed.function_config_path,
+        merge=parsed.merge,
+        verbose=parsed.verbose,
+    )
 
 
 def main():
     """
     Start the SIMURAN command line interface.
 
+    Running simuran worker queue_dir starts a job queue worker instead,
+    see worker_main, simuran gather batch_config_path combines
+    the outputs of sharded runs, see gather_main, and simuran results
+    database_path prints results saved with --results_db,
+    see simuran.main.results_db.cli.
+
     Raises
     ------
     ValueError
@@ -24,6 +127,15 @@ def main():
         The output of running analysis from the specified configuration.
 
     """
+    if len(sys.argv) > 1 and sys.argv[1] == "worker":
+        return worker_main()
+    if len(sys.argv) > 1 and sys.argv[1] == "gather":
+        return gather_main()
+    if len(sys.argv) > 1 and sys.argv[1] == "results":
+        from simuran.main.results_db import cli as results_cli
+
+        return results_cli()
+
     description = "simuran"
     parser = argparse.ArgumentParser(description)
     parser.add_argument(
@@ -99,7 +211,9 @@ def main():
         "-n",
         type=int,
         default=1,
-        help="Number of worker threads to launch, default is 1",
+        help="Total number of CPUs to use, default is 1. "
+        + "This is split automatically between batch workers, "
+        + "recording workers, and numerical library threads",
     )
     parser.add_argument(
         "--overwrite",
@@ -107,6 +221,131 @@ def main():
         action="store_true",
         help="Whether to overwrite existing output",
     )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Whether to resume an interrupted recursive run from its checkpoints",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=None,
+        help="Directory to cache analysis function results in, default is no cache",
+    )
+    parser.add_argument(
+        "--ram_budget",
+        type=float,
+        default=None,
+        help="Memory in GB that recordings analysed in parallel may use at once, "
+        + "default is no limit",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Whether to read recording files while other recordings are analysed",
+    )
+    parser.add_argument(
+        "--queue_dir",
+        type=str,
+        default=None,
+        help="In recursive mode, directory to queue iterations in for "
+        + "simuran worker processes, default is to run them here",
+    )
+    parser.add_argument(
+        "--lease_time",
+        type=float,
+        default=600,
+        help="Seconds a queued iteration can go without a worker heartbeat "
+        + "before it is given to another worker, default is 600",
+    )
+    parser.add_argument(
+        "--shard",
+        type=str,
+        default=None,
+        help="In recursive mode, only run shard i/N of the batch, "
+        + "with i from 0 to N - 1. Iterations are split by the size of their "
+        + "data. Combine the shards with simuran gather. "
+        + "Only iterations are sharded, not the recordings of a single run",
+    )
+    parser.add_argument(
+        "--task_timeout",
+        type=float,
+        default=None,
+        help="Seconds the analysis of one recording may take before its worker "
+        + "is killed, default is no limit. Can not be used with --pipeline, "
+        + "in recursive mode only applies if iterations run in this process",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=0,
+        help="Number of times to retry a recording that failed, timed out, "
+        + "or crashed its worker, default is 0. Can not be used with --pipeline, "
+        + "in recursive mode only applies if iterations run in this process",
+    )
+    parser.add_argument(
+        "--iteration_timeout",
+        type=float,
+        default=None,
+        help="In recursive mode, seconds one iteration may take before its "
+        + "worker is killed, default is no limit",
+    )
+    parser.add_argument(
+        "--iteration_retries",
+        type=int,
+        default=0,
+        help="In recursive mode, number of times to retry an iteration that "
+        + "failed, timed out, or crashed its worker, default is 0",
+    )
+    parser.add_argument(
+        "--memory_profile",
+        action="store_true",
+        help="Whether to save the memory used by each loader, analysis function, "
+        + "and figure save, and report possible leaks",
+    )
+    parser.add_argument(
+        "--trace_dir",
+        type=str,
+        default=None,
+        help="Directory to save a Chrome trace / Perfetto timeline of the run to, "
+        + "default is no trace",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        nargs="?",
+        const="simuran_profile",
+        default=None,
+        help="Profile the run and its workers with cProfile, saving statistics, "
+        + "a hot spot report, and collapsed stacks for flame graphs to this "
+        + "directory, by default simuran_profile if no directory is given. "
+        + "Pass it after the configuration paths",
+    )
+    parser.add_argument(
+        "--table_format",
+        type=str,
+        choices=("parquet", "feather"),
+        default=None,
+        help="Also save the summary and function results as Parquet or Feather "
+        + "tables in sim_results/tables, partitioned by function config and "
+        + "batch, needs pyarrow. Default is csv only",
+    )
+    parser.add_argument(
+        "--results_db",
+        type=str,
+        default=None,
+        help="SQLite database to add the results of each recording to as it "
+        + "finishes, which runs can share. Query it with simuran results. "
+        + "Default is no database",
+    )
+    parser.add_argument(
+        "--status_file",
+        type=str,
+        default=None,
+        help="JSON file to save progress to every few seconds while running, "
+        + "with the rate, time left, and the task of each worker, "
+        + "default is no status file",
+    )
 
     parsed, unparsed = parser.parse_known_args()
     if parsed.dummy is True:
@@ -115,6 +354,14 @@ def main():
     if len(unparsed) > 0:
         raise ValueError("Unrecognized arguments passed {}".format(unparsed))
 
+    with simuran.tracer.tracing(parsed.trace_dir):
+        with simuran.profiler.profiling(parsed.profile):
+            with simuran.main.progress.reporting(parsed.status_file):
+                return _run_parsed(parsed)
+
+
+def _run_parsed(parsed):
+    """Run SIMURAN with the parsed command line arguments of main."""
     if parsed.recursive:
         if not os.path.isfile(parsed.batch_config_path):
             raise FileNotFoundError("Please provide batch_config_path as a valid path")
@@ -133,6 +380,20 @@ def main():
             merge=parsed.merge,
             num_cpus=parsed.num_workers,
             overwrite=parsed.overwrite,
+            resume=parsed.resume,
+            cache_dir=parsed.cache_dir,
+            ram_budget=parsed.ram_budget,
+            pipeline=parsed.pipeline,
+            queue_dir=parsed.queue_dir,
+            lease_time=parsed.lease_time,
+            shard=parsed.shard,
+            iteration_timeout=parsed.iteration_timeout,
+            iteration_retries=parsed.iteration_retries,
+            task_timeout=parsed.task_timeout,
+            retries=parsed.retries,
+            memory_profile=parsed.memory_profile,
+            table_format=parsed.table_format,
+            results_db=parsed.results_db,
         )
 
     elif parsed.grab_params:
@@ -149,6 +410,8 @@ def main():
             raise ValueError(
                 "In non recursive mode, the function configuration path must be a file"
             )
+        if parsed.shard is not None:
+            raise ValueError("--shard can only be used in recursive mode")
         return simuran.main.main.run(
             parsed.batch_config_path,
             parsed.function_config_path,
@@ -159,6 +422,14 @@ def main():
             verbose=parsed.verbose,
             only_check=parsed.dummy,
             num_cpus=parsed.num_workers,
+            cache_dir=parsed.cache_dir,
+            ram_budget=parsed.ram_budget,
+            pipeline=parsed.pipeline,
+            task_timeout=parsed.task_timeout,
+            retries=parsed.retries,
+            memory_profile=parsed.memory_profile,
+            table_format=parsed.table_format,
+            results_db=parsed.results_db,
         )
 
 
@@ -23,9 +23,16 @@ class BaseLoader(ABC):
         A dictionary of filenames used for data loading.
     load_params : dict
         Parameters to pass to the loader function.
+    memory_expansion : float
+        The approximate ratio of the in-memory size of loaded data
+        to the size of its source files on disk, for example 8.0 if
+        one byte integer samples are loaded as 64 bit floats.
+        This is used to schedule recordings in parallel runs.
 
     """
 
+    memory_expansion = 1.0
+
     def __init__(self, load_params={}):
         """See help(BaseLoader)."""
         self.signal = None
@@ -4,15 +4,70 @@ This lists the available loaders in SIMURAN.
 Current loaders are:
 1. params_only : only loads parameters from files.
 2. nc_loader : requires the neurochat package to be installed.
+
+Loaders are imported when they are first used, so that importing SIMURAN
+does not import the packages the loaders depend on.
 """
 import sys
+import importlib
 import traceback
 
-loaders_dict = {"params_only": "params_only_no_cls"}
-try:
-    from simuran.loaders.nc_loader import NCLoader
 
-    loaders_dict["nc_loader"] = NCLoader
-except BaseException:
-    print("Error importing NeuroChaT:")
-    traceback.print_exc(file=sys.stdout)
+class LoaderDict(dict):
+    """
+    A dictionary of loader classes, each imported when it is first used.
+
+    Values are loader classes, or the string "params_only_no_cls".
+    A loader whose module can not be imported is removed, and the error
+    is printed when it is first used.
+
+    Parameters
+    ----------
+    loaders : dict
+        The loaders, with (module name, class name) tuples for the
+        loaders to import when they are first used.
+
+    """
+
+    def __init__(self, loaders):
+        """See help(LoaderDict)."""
+        super().__init__(loaders)
+
+    def _load(self, key):
+        value = dict.__getitem__(self, key)
+        if not isinstance(value, tuple):
+            return value
+        module_name, cls_name = value
+        try:
+            value = getattr(importlib.import_module(module_name), cls_name)
+        except BaseException:
+            print("Error importing {} for the {} loader:".format(module_name, key))
+            traceback.print_exc(file=sys.stdout)
+            del self[key]
+            raise KeyError(key)
+        self[key] = value
+        return value
+
+    def __getitem__(self, key):
+        return self._load(key)
+
+    def get(self, key, default=None):
+        try:
+            return self._load(key)
+        except KeyError:
+            return default
+
+    def items(self):
+        loaded = [(key, self.get(key, None)) for key in list(self.keys())]
+        return [(key, value) for key, value in loaded if value is not None]
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+
+loaders_dict = LoaderDict(
+    {
+        "params_only": "params_only_no_cls",
+        "nc_loader": ("simuran.loaders.nc_loader", "NCLoader"),
+    }
+)
@@ -11,6 +11,9 @@ from skm_pyutils.py_path import get_all_files_in_dir
 class NCLoader(BaseLoader):
     """Load data compatible with the NeuroChaT package."""
 
+    # Axona samples are stored as 8 or 16 bit integers, but loaded as float64
+    memory_expansion = 8.0
+
     def __init__(self, load_params={}):
         """Call super class initialize."""
         super().__init__(load_params=load_params)
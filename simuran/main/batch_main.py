@@ -6,49 +6,121 @@ import multiprocessing
 
 from skm_pyutils.py_log import log_exception
 
-from simuran.main.main import run, modify_path
+from simuran.main.main import run, modify_path, check_pipeline_options
 from simuran.param_handler import ParamHandler
 from simuran.main.merge import merge_files, csv_merge
+from simuran.main.checkpoint import (
+    config_fingerprint,
+    save_checkpoint,
+    is_checkpoint_valid,
+    assemble_checkpoints,
+    clear_checkpoints,
+)
+from simuran.main.cpu_budget import split_cpu_budget
+from simuran.main.job_queue import JobQueue, new_submission_id
+from simuran.main.progress import reporting, report_progress, tracking
+from simuran.main.shard import parse_shard, run_list_weights, shard_indices
+from simuran.main.supervisor import TaskSupervisor
+from simuran.main.table_store import open_result_table
+from simuran.main.worker_pool import (
+    get_worker_pool,
+    imap_unordered,
+    registered_site_dirs,
+    shutdown_worker_pool,
+)
+from simuran.tracer import trace
 
 
 def get_dict_entry(run_dict_list, function_to_use, index):
-    run_dict = run_dict_list[index]
+    return split_run_dict(run_dict_list[index], function_to_use)
+
+
+def split_run_dict(run_dict, function_to_use=None):
+    """
+    Split an entry of the run list into its parameters and config locations.
+
+    The entry itself is not modified.
+
+    Parameters
+    ----------
+    run_dict : dict
+        An entry in the run_list of the batch parameters.
+    function_to_use : str, optional
+        If not None, overrides the function config path, by default None.
+
+    Returns
+    -------
+    run_dict : dict
+        The entry without the config locations and "shard_weight",
+        which are not parameters of simuran.main.main.run.
+    batch_param_loc : str
+        The absolute path to the batch config.
+    fn_param_loc : str
+        The absolute path to the function config.
+
+    """
+    run_dict = dict(run_dict)
     batch_param_loc = run_dict.pop("batch_param_loc")
     fn_param_loc = run_dict.pop("fn_param_loc")
+    # Only used to split the run list into shards
+    run_dict.pop("shard_weight", None)
     if function_to_use is not None:
         fn_param_loc = function_to_use
     return run_dict, os.path.abspath(batch_param_loc), os.path.abspath(fn_param_loc)
 
 
+def _iteration_name(i):
+    """Return the name of iteration i used in traces and progress reports."""
+    return "Iteration {}".format(i)
+
+
 def multiprocessing_func(
     i,
-    run_dict_list,
+    run_dict,
     function_to_use,
     kwargs,
     handle_errors,
     save_info,
     keep_container,
+    checkpoint_dir=None,
 ):
+    """
+    Run a single iteration of the batch.
+
+    If checkpoint_dir is not None, the output is saved to a checkpoint
+    and (i, None, None) is returned in place of the output, so that
+    the results do not need to be sent back to the parent process.
+
+    """
     # TODO printing would have to be stored and done at the end
     print(
         "--------------------SIMURAN Batch Iteration {}--------------------".format(i)
     )
-    run_dict, batch_param_loc, fn_param_loc = get_dict_entry(
-        run_dict_list, function_to_use, i
-    )
+    run_dict, batch_param_loc, fn_param_loc = split_run_dict(run_dict, function_to_use)
     full_kwargs = {**run_dict, **kwargs}
-    if handle_errors:
-        try:
-            results, recording_container = run(
-                batch_param_loc, fn_param_loc, **full_kwargs
-            )
-        except BaseException as e:
-            log_exception(
-                e,
-                "Running batch on iteration {} using {}".format(i, batch_param_loc),
-            )
-    else:
-        results, recording_container = run(batch_param_loc, fn_param_loc, **full_kwargs)
+    failed = False
+    name = _iteration_name(i)
+    with trace(name, "batch", batch_param_loc=batch_param_loc):
+        if handle_errors:
+            try:
+                with tracking("iterations", name):
+                    results, recording_container = run(
+                        batch_param_loc, fn_param_loc, **full_kwargs
+                    )
+            except BaseException as e:
+                log_exception(
+                    e,
+                    "Running batch on iteration {} using {}".format(
+                        i, batch_param_loc
+                    ),
+                )
+                results, recording_container = [], []
+                failed = True
+        else:
+            with tracking("iterations", name):
+                results, recording_container = run(
+                    batch_param_loc, fn_param_loc, **full_kwargs
+                )
 
     if save_info:
         if keep_container:
@@ -61,6 +133,11 @@ def multiprocessing_func(
     else:
         to_use = None
 
+    if (checkpoint_dir is not None) and save_info and not failed:
+        fingerprint = config_fingerprint(batch_param_loc, fn_param_loc, run_dict)
+        save_checkpoint(checkpoint_dir, i, (i, results, to_use), fingerprint)
+        return i, None, None
+
     return i, results, to_use
 
 
@@ -72,11 +149,25 @@ def batch_main(
     save_info=False,
     keep_container=False,
     num_cpus=4,
+    checkpoint_dir=None,
+    resume=False,
+    chunksize=1,
+    preload_modules=None,
+    queue_dir=None,
+    lease_time=600,
+    shard=None,
+    iteration_timeout=None,
+    iteration_retries=0,
     **kwargs
 ):
     """
     Start the main control for running multiple simuran.main.main iterations.
 
+    Iterations are streamed to the workers, and the output of each iteration
+    is handled as soon as it completes. If checkpoint_dir is passed,
+    outputs are written to disk by the workers and are not held in memory
+    until the final output is assembled.
+
     Parameters
     ----------
     run_dict_list : list of dict
@@ -94,8 +185,54 @@ def batch_main(
         If True, keeps the container made in main, by default False
         False just keeps the results and the filenames
     num_cpus : int, optional
-        The number of worker CPUs to launch, by default 4.
+        The total number of CPUs to use, by default 4.
+        This budget is split between batch workers, workers for the recordings
+        in each iteration, and numerical library threads in the workers.
+        See simuran.main.cpu_budget.split_cpu_budget.
         Enter 1 to disable multiprocessing.
+    checkpoint_dir : str, optional
+        If passed, the output of each iteration is saved to this directory
+        as soon as it completes, and the returned output is assembled
+        from these checkpoints. By default None.
+    resume : bool, optional
+        If True, iterations with a checkpoint in checkpoint_dir whose
+        configuration files are unchanged are not run again, by default False.
+    chunksize : int, optional
+        The number of iterations sent to a worker at once, by default 1.
+    preload_modules : list of str, optional
+        Modules to import in each worker when the pool starts, by default None,
+        which uses simuran.main.worker_pool.DEFAULT_PRELOAD_MODULES.
+        The pool is kept alive and re-used by later calls.
+    queue_dir : str, optional
+        If passed, the iterations are written as tasks to a
+        simuran.main.job_queue.JobQueue in this directory instead of
+        being run here. They are run by any number of processes, on any
+        machine sharing the directory, started with "simuran worker queue_dir".
+        Each worker uses the full num_cpus budget. Other batches can share
+        the directory, as each batch only removes its own tasks once
+        they are done. By default None.
+    lease_time : float, optional
+        The seconds a task in queue_dir can go without a heartbeat from its
+        worker before it is given to another worker, by default 600.
+    shard : tuple of int, optional
+        If passed as (i, N), only the iterations in shard i of N are run,
+        see simuran.main.shard.run_list_weights and shard_indices.
+        By default None.
+    iteration_timeout : float, optional
+        The seconds a single iteration may run for before its worker
+        is killed, by default None for no limit.
+        If this or iteration_retries is set, iterations are run in worker
+        processes by a simuran.main.supervisor.TaskSupervisor, which also
+        detects workers that crash. Iterations that still fail are listed
+        at the end if handle_errors is True, and raise an error otherwise.
+    iteration_retries : int, optional
+        The number of times to retry an iteration that raised an error,
+        timed out, or crashed its worker, by default 0.
+    kwargs : keyword arguments
+        Passed to simuran.main.main.run, for example task_timeout and retries
+        to supervise the recordings of iterations run in this process.
+        These are ignored for iterations run in worker processes,
+        where only iteration_timeout and iteration_retries apply.
 
     Returns
     -------
@@ -106,62 +243,213 @@ def batch_main(
         or the recording container, depending on the configuration.
 
     """
-    all_info = []
-
+    # Fail before starting any iterations, rather than in each of them
+    check_pipeline_options(
+        kwargs.get("pipeline", None),
+        kwargs.get("task_timeout", None),
+        kwargs.get("retries", 0),
+    )
     if idx is not None:
-        run_dict, batch_param_loc, fn_param_loc = get_dict_entry(idx)
-        full_kwargs = {**run_dict, **kwargs}
+        run_dict, batch_param_loc, fn_param_loc = get_dict_entry(
+            run_dict_list, function_to_use, idx
+        )
+        full_kwargs = {**run_dict, **kwargs, "num_cpus": num_cpus}
         info = run(batch_param_loc, fn_param_loc, **full_kwargs)
         return info
 
-    if num_cpus > 1:
-        pool = multiprocessing.get_context("spawn").Pool(num_cpus)
-
+    to_run = list(range(len(run_dict_list)))
+    if shard is not None:
+        to_run = shard_indices(run_list_weights(run_dict_list), *shard)
         print(
-            "Launching {} workers for {} iterations".format(
-                num_cpus, len(run_dict_list)
-            )
+            "Running shard {}/{}, iterations {}".format(shard[0], shard[1], to_run)
         )
-        for i in range(len(run_dict_list)):
-            pool.apply_async(
-                multiprocessing_func,
-                args=(
-                    i,
-                    run_dict_list,
-                    function_to_use,
-                    kwargs,
-                    handle_errors,
-                    save_info,
-                    keep_container,
-                ),
-                callback=all_info.append,
+    if resume and (checkpoint_dir is not None):
+        to_check, to_run = to_run, []
+        for i in to_check:
+            run_dict, batch_param_loc, fn_param_loc = get_dict_entry(
+                run_dict_list, function_to_use, i
             )
+            fingerprint = config_fingerprint(batch_param_loc, fn_param_loc, run_dict)
+            if not is_checkpoint_valid(checkpoint_dir, i, fingerprint):
+                to_run.append(i)
+        print(
+            "Resuming from {}, {} of {} iterations already completed".format(
+                checkpoint_dir,
+                len(to_check) - len(to_run),
+                len(to_check),
+            )
+        )
 
-        pool.close()
-        pool.join()
-        all_info = sorted(all_info, key=lambda x: x[0])
-        final_res = ([], [])
-        for item in all_info:
-            final_res[0].append(item[1])
-            final_res[1].append(item[2])
+    num_workers, inner_cpus, num_threads = split_cpu_budget(num_cpus, len(to_run))
+    supervised = (iteration_timeout is not None) or (iteration_retries > 0)
+    if supervised:
+        # Even a single iteration runs in a pool worker, which can not start
+        # its own workers, so the budget goes to library threads instead
+        inner_cpus = 1
+    kwargs = {**kwargs, "num_cpus": inner_cpus}
 
-    else:
-        print("Starting a loop over {} iterations".format(len(run_dict_list)))
-        final_res = ([], [])
-        for i in range(len(run_dict_list)):
-            info = multiprocessing_func(
+    def tasks():
+        for i in to_run:
+            yield (
                 i,
-                run_dict_list,
+                run_dict_list[i],
                 function_to_use,
                 kwargs,
                 handle_errors,
                 save_info,
                 keep_container,
+                checkpoint_dir,
             )
-            final_res[0].append(info[1])
-            final_res[1].append(info[2])
 
-    return final_res
+    final_res = ([None] * len(run_dict_list), [None] * len(run_dict_list))
+
+    def collect(info):
+        i, results, to_use = info
+        final_res[0][i] = results
+        final_res[1][i] = to_use
+
+    with reporting():
+        report_progress("total", "iterations", value=len(to_run))
+        if queue_dir is not None:
+            job_queue = JobQueue(queue_dir, lease_time=lease_time)
+            submission = new_submission_id()
+            task_list = []
+            for task in tasks():
+                i, run_dict = task[0], dict(task[1])
+                for key in ("batch_param_loc", "fn_param_loc"):
+                    run_dict[key] = os.path.abspath(run_dict[key])
+                fn_loc = task[2] if task[2] is None else os.path.abspath(task[2])
+                queue_kwargs = {**task[3], "num_cpus": num_cpus}
+                task_list.append((i, run_dict, fn_loc, queue_kwargs) + task[4:])
+            names = job_queue.submit(
+                multiprocessing_func,
+                task_list,
+                site_dirs=registered_site_dirs(),
+                submission=submission,
+            )
+            print(
+                "Submitted {} iterations to {} as {}, waiting for workers started "
+                "with simuran worker {}".format(
+                    len(names), queue_dir, submission, job_queue.queue_dir
+                )
+            )
+            try:
+                for _, info in job_queue.wait(names):
+                    collect(info)
+                    # Workers of the queue can not send progress to this process
+                    report_progress("finish", "iterations", _iteration_name(info[0]))
+            finally:
+                # Only this submission is removed, other batches may share the queue
+                job_queue.clear(submission)
+
+        elif supervised or (num_workers > 1):
+            # Size the pool from the CPU budget so that later runs with more
+            # iterations re-use it, only num_workers tasks run at once
+            pool_size, _, _ = split_cpu_budget(num_cpus, num_cpus)
+            pool = get_worker_pool(pool_size, num_threads, preload_modules)
+            print(
+                "Launching {} workers with {} threads each for {} "
+                "iterations".format(num_workers, num_threads, len(to_run))
+            )
+            try:
+                if supervised:
+                    supervisor = TaskSupervisor(
+                        timeout=iteration_timeout,
+                        retries=iteration_retries,
+                        raise_errors=not handle_errors,
+                    )
+                    task_list = list(tasks())
+                    labels = [
+                        "{} ({})".format(
+                            _iteration_name(i), run_dict_list[i]["batch_param_loc"]
+                        )
+                        for i in to_run
+                    ]
+                    for _, info in supervisor.run(
+                        pool,
+                        num_workers,
+                        multiprocessing_func,
+                        task_list,
+                        labels=labels,
+                    ):
+                        collect(info)
+                    for failure in supervisor.failures:
+                        i = to_run[failure.index]
+                        collect((i, [], []))
+                        report_progress(
+                            "finish", "iterations", _iteration_name(i), ok=False
+                        )
+                    supervisor.print_report()
+                else:
+                    for info in imap_unordered(
+                        pool,
+                        multiprocessing_func,
+                        tasks(),
+                        chunksize=chunksize,
+                        max_in_flight=num_workers,
+                    ):
+                        collect(info)
+            except BaseException:
+                shutdown_worker_pool(terminate=True)
+                raise
+
+        else:
+            print("Starting a loop over {} iterations".format(len(to_run)))
+            for task in tasks():
+                collect(multiprocessing_func(*task))
+
+    if (checkpoint_dir is not None) and save_info:
+        if shard is not None:
+            return assemble_checkpoints(checkpoint_dir, to_run)
+        return assemble_checkpoints(checkpoint_dir, len(run_dict_list))
+
+    return ([final_res[0][i] for i in to_run], [final_res[1][i] for i in to_run])
+
+
+def _batch_output_locations(run_dict_loc, function_to_use=None):
+    """Return the output directory, name, pickle, and checkpoint locations."""
+    out_dir = os.path.abspath(
+        os.path.join(os.path.dirname(run_dict_loc), "..", "sim_results")
+    )
+    fn_name = (
+        ""
+        if function_to_use is None
+        else "--" + os.path.splitext(os.path.basename(function_to_use))[0]
+    )
+    out_name = os.path.splitext(os.path.basename(run_dict_loc))[0] + fn_name
+    pickle_name = os.path.join(out_dir, "pickles", out_name + "_dump.pickle")
+    checkpoint_dir = os.path.splitext(pickle_name)[0] + "_checkpoints"
+    return out_dir, out_name, pickle_name, checkpoint_dir
+
+
+def _save_batch_output(all_info, pickle_name, out_dir, to_merge, merge):
+    """Atomically dump all_info to pickle_name and optionally merge outputs."""
+    os.makedirs(os.path.dirname(pickle_name), exist_ok=True)
+    temp_name = pickle_name + ".tmp"
+    with open(temp_name, "wb") as f:
+        pickle.dump(all_info, f)
+    os.replace(temp_name, pickle_name)
+
+    if merge:
+        print("--------------------Merging results--------------------")
+        if len(to_merge) == 0:
+            print("Merging everything in {}".format(out_dir))
+            csv_merge(out_dir)
+            merge_files(out_dir)
+        else:
+            for folder in to_merge:
+                print("Merging in the folder {}".format(os.path.join(out_dir, folder)))
+                csv_merge(os.path.join(out_dir, folder))
+                merge_files(os.path.join(out_dir, folder))
+
+
+def _batch_params(run_dict_loc):
+    """Return the batch parameters and the folders to merge in run_dict_loc."""
+    run_dict = ParamHandler(in_loc=run_dict_loc, name="params")
+    to_merge = run_dict.get("to_merge", [])
+    if isinstance(to_merge, str):
+        to_merge = [to_merge]
+    return run_dict, to_merge
 
 
 def batch_run(
@@ -172,6 +460,10 @@ def batch_run(
     overwrite=False,
     merge=True,
     num_cpus=4,
+    resume=False,
+    shard=None,
+    table_format=None,
+    return_table=None,
     **kwargs
 ):
     """
@@ -192,18 +484,38 @@ def batch_run(
     merge: bool, optional
         Whether to merge output data, by default False
     num_cpus : int, optional
-        The number of worker CPUs to launch, by default 4.
+        The total number of CPUs to use, by default 4.
+        See batch_main for how this is split between workers and threads.
         Enter 1 to disable multiprocessing.
+    resume : bool, optional
+        Whether to resume from the checkpoints of a previous incomplete run,
+        by default False. Completed iterations whose configuration files
+        are unchanged are not run again.
+    shard : str or tuple, optional
+        Only run one shard of the batch, given as "i/N" or (i, N), for example
+        from a cluster job array, by default None. Each shard writes checkpoints,
+        and batch_gather combines them into the output of a full run.
+        Iterations are balanced by the size of their data, see
+        simuran.main.shard.run_list_weights and shard_indices.
+    table_format : str, optional
+        "parquet" or "feather" to also save the results of each iteration
+        as tables in sim_results/tables, partitioned by function config
+        and batch, by default None. See simuran.main.table_store.
+    return_table : str, optional
+        "summary" or "results" to return a lazy pyarrow dataset of that
+        table over all saved iterations, instead of the output of batch_main,
+        by default None. Needs table_format.
 
     Returns
     -------
-    list of tuples or tuple
-        the output of batch_main
+    list of tuples or tuple or pyarrow.dataset.Dataset
+        the output of batch_main, or the table if return_table is set
 
     Raises
     ------
     ValueError
         More CPUs than available were entered.
+        return_table was set without table_format.
 
     """
     if num_cpus > multiprocessing.cpu_count():
@@ -212,36 +524,33 @@ def batch_run(
                 multiprocessing.cpu_count()
             )
         )
+    if (return_table is not None) and (table_format is None):
+        raise ValueError("return_table needs a table_format to save tables in")
 
     start_time = time.monotonic()
     modify_path(
         os.path.abspath(os.path.join(os.path.dirname(run_dict_loc), "..", "analysis")),
         verbose=kwargs.get("verbose", False),
     )
-    run_dict = ParamHandler(in_loc=run_dict_loc, name="params")
+    run_dict, to_merge = _batch_params(run_dict_loc)
     after_batch_function = run_dict.get("after_batch_fn", None)
     keep_container = run_dict.get("keep_all_data", False)
-    to_merge = run_dict.get("to_merge", [])
-    if isinstance(to_merge, str):
-        to_merge = [to_merge]
-    out_dir = os.path.abspath(
-        os.path.join(os.path.dirname(run_dict_loc), "..", "sim_results")
-    )
-    fn_name = (
-        ""
-        if function_to_use is None
-        else "--" + os.path.splitext(os.path.basename(function_to_use))[0]
-    )
-    pickle_name = os.path.join(
-        out_dir,
-        "pickles",
-        os.path.splitext(os.path.basename(run_dict_loc))[0] + fn_name + "_dump.pickle",
+    preload_modules = run_dict.get("preload_modules", None)
+    out_dir, out_name, pickle_name, checkpoint_dir = _batch_output_locations(
+        run_dict_loc, function_to_use
     )
+    if shard is not None:
+        shard = parse_shard(shard)
+    table_dir = os.path.join(out_dir, "tables")
+    if table_format is not None:
+        kwargs = {**kwargs, "table_format": table_format, "table_dir": table_dir}
     if (
         (idx is None)
+        and (shard is None)
         and (not kwargs.get("only_check", False))
         and os.path.isfile(pickle_name)
         and (not overwrite)
+        and (not resume)
     ):
         print(
             "Loading data from {}, please delete it to run instead".format(pickle_name)
@@ -249,6 +558,9 @@ def batch_run(
         with open(pickle_name, "rb") as f:
             all_info = pickle.load(f)
     else:
+        # Shards share the checkpoint directory, so they never clear it
+        if (idx is None) and (shard is None) and (not resume):
+            clear_checkpoints(checkpoint_dir)
         all_info = batch_main(
             run_dict["run_list"],
             function_to_use=function_to_use,
@@ -258,41 +570,29 @@ def batch_run(
             keep_container=keep_container,
             should_modify_path=False,
             num_cpus=num_cpus,
+            checkpoint_dir=(checkpoint_dir if idx is None else None),
+            resume=resume,
+            preload_modules=preload_modules,
+            shard=shard,
             **kwargs,
         )
+        if shard is not None:
+            print(
+                "Shard {}/{} completed in {:.2f}mins, ".format(
+                    shard[0], shard[1], (time.monotonic() - start_time) / 60
+                )
+                + "run simuran gather when all shards are done"
+            )
+            return all_info
         if not kwargs.get("only_check", False) and (idx is None):
-            os.makedirs(os.path.dirname(pickle_name), exist_ok=True)
-            with open(pickle_name, "wb") as f:
-                pickle.dump(all_info, f)
-
-            if merge:
-                print("--------------------Merging results--------------------")
-                if len(to_merge) == 0:
-                    print("Merging everything in {}".format(out_dir))
-                    csv_merge(out_dir)
-                    merge_files(out_dir)
-                else:
-                    for folder in to_merge:
-                        print(
-                            "Merging in the folder {}".format(
-                                os.path.join(out_dir, folder)
-                            )
-                        )
-                        csv_merge(os.path.join(out_dir, folder))
-                        merge_files(os.path.join(out_dir, folder))
+            _save_batch_output(all_info, pickle_name, out_dir, to_merge, merge)
     if (
         (not kwargs.get("only_check", False))
         and (after_batch_function is not None)
         and (after_batch_function != "save")
     ):
         print("Running {}".format(after_batch_function.__name__))
-        after_batch_function(
-            all_info,
-            extra_info=(
-                out_dir,
-                os.path.splitext(os.path.basename(run_dict_loc))[0] + fn_name,
-            ),
-        )
+        after_batch_function(all_info, extra_info=(out_dir, out_name))
 
     print(
         "Batch operation completed in {:.2f}mins".format(
@@ -300,4 +600,71 @@ def batch_run(
         )
     )
 
+    if return_table is not None:
+        return open_result_table(table_dir, table=return_table, fmt=table_format)
+    return all_info
+
+
+def batch_gather(run_dict_loc, function_to_use=None, merge=True, verbose=False):
+    """
+    Combine the checkpoints written by sharded runs of batch_run.
+
+    The output pickle, merged files, and after batch function
+    are the same as those of a single batch_run over all iterations.
+
+    Parameters
+    ----------
+    run_dict_loc : str
+        The path to the file describing the parameters for batch running.
+    function_to_use : str, optional
+        The function config the shards were run with, by default None
+    merge : bool, optional
+        Whether to merge output data, by default True
+    verbose : bool, optional
+        Whether to print extra information, by default False
+
+    Returns
+    -------
+    tuple of lists
+        The output of batch_main over all iterations.
+
+    Raises
+    ------
+    RuntimeError
+        If any iteration does not have a checkpoint matching its configuration.
+
+    """
+    modify_path(
+        os.path.abspath(os.path.join(os.path.dirname(run_dict_loc), "..", "analysis")),
+        verbose=verbose,
+    )
+    run_dict, to_merge = _batch_params(run_dict_loc)
+    after_batch_function = run_dict.get("after_batch_fn", None)
+    out_dir, out_name, pickle_name, checkpoint_dir = _batch_output_locations(
+        run_dict_loc, function_to_use
+    )
+    run_list = run_dict["run_list"]
+    missing = []
+    for i in range(len(run_list)):
+        entry, batch_param_loc, fn_param_loc = get_dict_entry(
+            run_list, function_to_use, i
+        )
+        fingerprint = config_fingerprint(batch_param_loc, fn_param_loc, entry)
+        if not is_checkpoint_valid(checkpoint_dir, i, fingerprint):
+            missing.append(i)
+    if len(missing) > 0:
+        raise RuntimeError(
+            "Iterations {} have no up to date checkpoint in {}, ".format(
+                missing, checkpoint_dir
+            )
+            + "run their shards again before gathering"
+        )
+
+    print("Gathering {} iterations from {}".format(len(run_list), checkpoint_dir))
+    all_info = assemble_checkpoints(checkpoint_dir, len(run_list))
+    _save_batch_output(all_info, pickle_name, out_dir, to_merge, merge)
+    if (after_batch_function is not None) and (after_batch_function != "save"):
+        print("Running {}".format(after_batch_function.__name__))
+        after_batch_function(all_info, extra_info=(out_dir, out_name))
+
     return all_info
@@ -0,0 +1,172 @@
+"""This module handles checkpointing the iterations of batch runs to disk."""
+
+import os
+import hashlib
+import pickle
+import shutil
+import tempfile
+
+from simuran.param_handler import ParamHandler
+
+
+def config_fingerprint(batch_param_loc, fn_param_loc, run_dict=None):
+    """
+    Return a hash of the configuration files used by a batch iteration.
+
+    The batch parameter file, the function parameter file,
+    and the mapping file listed in the batch parameters are hashed.
+
+    Parameters
+    ----------
+    batch_param_loc : str
+        Path to the batch parameter file.
+    fn_param_loc : str
+        Path to the function parameter file.
+    run_dict : dict, optional
+        Any extra parameters of this iteration, by default None.
+
+    Returns
+    -------
+    str
+        The hex digest of the hash.
+
+    """
+    h = hashlib.sha256()
+    to_hash = [batch_param_loc, fn_param_loc]
+    if os.path.isfile(batch_param_loc):
+        try:
+            batch_params = ParamHandler(in_loc=batch_param_loc, name="params")
+            to_hash.append(batch_params.get("mapping_file", ""))
+        except BaseException:
+            pass
+    for fname in to_hash:
+        h.update(str(fname).encode("utf-8"))
+        if fname and os.path.isfile(fname):
+            with open(fname, "rb") as f:
+                h.update(f.read())
+    if run_dict is not None:
+        h.update(repr(sorted(run_dict.items(), key=str)).encode("utf-8"))
+    return h.hexdigest()
+
+
+def checkpoint_location(checkpoint_dir, i):
+    """Return the path to the checkpoint of iteration i."""
+    return os.path.join(checkpoint_dir, "iteration_{:05d}.pickle".format(i))
+
+
+def save_checkpoint(checkpoint_dir, i, info, fingerprint):
+    """
+    Atomically save the output of batch iteration i.
+
+    The checkpoint is written to a temporary file,
+    which is then renamed to its final location.
+
+    Parameters
+    ----------
+    checkpoint_dir : str
+        The directory to save the checkpoint to.
+    i : int
+        The iteration number.
+    info : tuple
+        The (i, results, to_use) output of the iteration.
+    fingerprint : str
+        The config_fingerprint of the iteration.
+
+    Returns
+    -------
+    str
+        The path to the saved checkpoint.
+
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    location = checkpoint_location(checkpoint_dir, i)
+    fd, temp_name = tempfile.mkstemp(dir=checkpoint_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump({"fingerprint": fingerprint, "info": info}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_name, location)
+    except BaseException:
+        if os.path.isfile(temp_name):
+            os.remove(temp_name)
+        raise
+    return location
+
+
+def load_checkpoint(checkpoint_dir, i, fingerprint=None):
+    """
+    Load the output of batch iteration i.
+
+    Parameters
+    ----------
+    checkpoint_dir : str
+        The directory the checkpoint was saved to.
+    i : int
+        The iteration number.
+    fingerprint : str, optional
+        If passed, the checkpoint is only returned if it matches this.
+
+    Returns
+    -------
+    tuple or None
+        The (i, results, to_use) output of the iteration,
+        or None if no valid checkpoint exists.
+
+    """
+    location = checkpoint_location(checkpoint_dir, i)
+    if not os.path.isfile(location):
+        return None
+    try:
+        with open(location, "rb") as f:
+            checkpoint = pickle.load(f)
+    except BaseException:
+        return None
+    if (fingerprint is not None) and (checkpoint["fingerprint"] != fingerprint):
+        return None
+    return checkpoint["info"]
+
+
+def is_checkpoint_valid(checkpoint_dir, i, fingerprint):
+    """Return True if iteration i has a checkpoint matching fingerprint."""
+    return load_checkpoint(checkpoint_dir, i, fingerprint) is not None
+
+
+def assemble_checkpoints(checkpoint_dir, num_iterations):
+    """
+    Assemble the output of a batch run from the checkpoints.
+
+    Iterations without a checkpoint, such as those that failed
+    while handling errors, are filled with empty lists.
+
+    Parameters
+    ----------
+    checkpoint_dir : str
+        The directory the checkpoints were saved to.
+    num_iterations : int or list of int
+        The number of iterations in the batch,
+        or the iterations to assemble the output of.
+
+    Returns
+    -------
+    tuple of lists
+        tuple[0] is the list of results,
+        tuple[1] is the list of recording names or containers.
+
+    """
+    final_res = ([], [])
+    if isinstance(num_iterations, int):
+        num_iterations = range(num_iterations)
+    for i in num_iterations:
+        info = load_checkpoint(checkpoint_dir, i)
+        if info is None:
+            info = (i, [], [])
+        final_res[0].append(info[1])
+        final_res[1].append(info[2])
+    return final_res
+
+
+def clear_checkpoints(checkpoint_dir):
+    """Remove all checkpoints in checkpoint_dir."""
+    if os.path.isdir(checkpoint_dir):
+        shutil.rmtree(checkpoint_dir)
@@ -0,0 +1,123 @@
+"""This module splits a CPU budget between worker processes and threads."""
+
+import os
+import sys
+from contextlib import contextmanager
+
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+
+def split_cpu_budget(num_cpus, num_tasks):
+    """
+    Split a total CPU budget for running num_tasks tasks.
+
+    Worker processes in a multiprocessing pool can not launch their own pools,
+    so if more than one worker is used, each worker runs its task serially
+    and the remaining budget is given to library (BLAS/OpenMP) threads.
+    If only one worker is needed, the full budget is passed on to the task.
+
+    Parameters
+    ----------
+    num_cpus : int
+        The total number of CPUs to use.
+    num_tasks : int
+        The number of tasks to run at this level.
+
+    Returns
+    -------
+    num_workers : int
+        The number of worker processes to launch at this level.
+    inner_cpus : int
+        The CPU budget to pass on to each task.
+    num_threads : int
+        The number of library threads each worker process should use.
+
+    """
+    num_cpus = max(1, int(num_cpus))
+    num_workers = max(1, min(num_cpus, num_tasks))
+    if num_workers > 1:
+        return num_workers, 1, max(1, num_cpus // num_workers)
+    return 1, num_cpus, num_cpus
+
+
+def limit_threads(num_threads):
+    """
+    Limit the number of threads used by numerical libraries in this process.
+
+    Environment variables are set for libraries that have not been imported yet,
+    and threadpoolctl is used for those already loaded, if it is installed.
+
+    Parameters
+    ----------
+    num_threads : int
+        The maximum number of threads per library thread pool.
+
+    Returns
+    -------
+    None
+
+    """
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(num_threads)
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    threadpool_limits(limits=num_threads)
+
+
+@contextmanager
+def thread_limited_env(num_threads):
+    """
+    Temporarily set the thread limit environment variables.
+
+    Child processes started in this context inherit the limits
+    before they import any numerical libraries.
+
+    Parameters
+    ----------
+    num_threads : int
+        The maximum number of threads per library thread pool.
+
+    """
+    old_values = {name: os.environ.get(name, None) for name in THREAD_ENV_VARS}
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(num_threads)
+    try:
+        yield
+    finally:
+        for name, value in old_values.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def worker_initializer(num_threads, path_dirs=None):
+    """
+    Set up a worker process of a multiprocessing pool.
+
+    Parameters
+    ----------
+    num_threads : int
+        The maximum number of library threads to use in the worker.
+    path_dirs : list of str, optional
+        Directories from the parent process path to add to the worker path,
+        so that analysis functions can be unpickled, by default None.
+
+    Returns
+    -------
+    None
+
+    """
+    limit_threads(num_threads)
+    if path_dirs is not None:
+        for path_dir in path_dirs:
+            if path_dir not in sys.path:
+                sys.path.append(path_dir)
@@ -0,0 +1,408 @@
+"""
+This module provides a job queue shared through a directory on disk.
+
+Tasks are written as files to queue_dir/pending. Workers claim a task
+by renaming its file into queue_dir/claimed, which only one worker
+can do, and write the output to queue_dir/done. While a task runs,
+its worker keeps touching the claimed file. If a worker stops doing so
+for longer than the lease time, the task is moved back to pending
+and claimed again by another worker.
+
+As the queue only relies on atomic renames, workers can run
+on any machine that shares the queue directory.
+Each call to submit names its tasks with a new submission id, so any
+number of batches can share one queue and only clear their own tasks.
+"""
+
+import os
+import site
+import time
+import uuid
+import pickle
+import socket
+import threading
+import traceback
+from datetime import datetime
+
+from simuran.tracer import get_trace_dir, set_trace_dir
+from simuran.profiler import get_profile_dir, set_profile_dir, profiled
+
+PENDING = "pending"
+CLAIMED = "claimed"
+DONE = "done"
+
+
+def default_worker_id():
+    """Return a name for this process that is unique across machines."""
+    return "{}-{}".format(socket.gethostname(), os.getpid())
+
+
+def new_submission_id():
+    """Return a submission id that is unique across processes and machines."""
+    started = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return "{}-{}".format(started, uuid.uuid4().hex[:8])
+
+
+def _atomic_pickle(obj, location):
+    temp_name = "{}.{}.tmp".format(location, default_worker_id())
+    try:
+        with open(temp_name, "wb") as f:
+            pickle.dump(obj, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_name, location)
+    except BaseException:
+        if os.path.isfile(temp_name):
+            os.remove(temp_name)
+        raise
+
+
+class JobQueue(object):
+    """
+    A queue of tasks stored in a directory.
+
+    Attributes
+    ----------
+    queue_dir : str
+        The directory holding the queue.
+    lease_time : float
+        The number of seconds a claimed task can go without
+        a heartbeat from its worker before it is put back in the queue.
+
+    Parameters
+    ----------
+    queue_dir : str
+        The directory holding the queue, created if it does not exist.
+    lease_time : float, optional
+        See Attributes, by default 600.
+
+    """
+
+    def __init__(self, queue_dir, lease_time=600):
+        """See help(JobQueue)."""
+        self.queue_dir = os.path.abspath(queue_dir)
+        self.lease_time = lease_time
+        for name in (PENDING, CLAIMED, DONE):
+            os.makedirs(os.path.join(self.queue_dir, name), exist_ok=True)
+
+    def _path(self, state, name):
+        return os.path.join(self.queue_dir, state, name)
+
+    def _claimed_files(self):
+        return sorted(os.listdir(os.path.join(self.queue_dir, CLAIMED)))
+
+    def now(self):
+        """
+        Return the current time according to the file system.
+
+        Leases are compared against this, so that the clocks of
+        machines sharing the queue do not need to agree.
+
+        """
+        clock = os.path.join(self.queue_dir, ".clock")
+        with open(clock, "w"):
+            pass
+        return os.path.getmtime(clock)
+
+    def submit(self, fn, args_list, site_dirs=None, submission=None):
+        """
+        Add a task to the queue for each args in args_list.
+
+        The tasks are named submission_task_i.pickle, so tasks of
+        other submissions to the same queue are not affected.
+
+        Parameters
+        ----------
+        fn : function
+            The function to call as fn(*args), it must be importable by workers.
+        args_list : list of tuple
+            The arguments of each task.
+        site_dirs : list of str, optional
+            Directories to process with site.addsitedir in the worker
+            before running the task, by default None.
+            The current trace directory of simuran.tracer, and profile
+            directory of simuran.profiler, are also passed on,
+            so they should be on a shared file system too.
+        submission : str, optional
+            The id to name the tasks with, by default None,
+            which uses a new id from new_submission_id().
+
+        Returns
+        -------
+        list of str
+            The names of the submitted tasks.
+
+        """
+        if submission is None:
+            submission = new_submission_id()
+        names = []
+        for i, args in enumerate(args_list):
+            name = "{}_task_{:05d}.pickle".format(submission, i)
+            # fn and args are unpickled after the site directories are set up
+            task = {
+                "payload": pickle.dumps((fn, args)),
+                "site_dirs": list(site_dirs or []),
+                "trace_dir": get_trace_dir(),
+                "profile_dir": get_profile_dir(),
+                "lease_time": self.lease_time,
+            }
+            _atomic_pickle(task, self._path(PENDING, name))
+            names.append(name)
+        return names
+
+    def claim(self, worker_id=None):
+        """
+        Claim the next pending task.
+
+        Parameters
+        ----------
+        worker_id : str, optional
+            The name of the claiming worker, by default default_worker_id().
+
+        Returns
+        -------
+        tuple or None
+            (name, claimed_path, task) of the claimed task,
+            or None if no task is pending.
+
+        """
+        worker_id = default_worker_id() if worker_id is None else worker_id
+        for name in sorted(os.listdir(os.path.join(self.queue_dir, PENDING))):
+            if not name.endswith(".pickle"):
+                continue
+            claimed_path = self._path(CLAIMED, "{}--{}".format(name, worker_id))
+            try:
+                os.rename(self._path(PENDING, name), claimed_path)
+            except FileNotFoundError:
+                # Another worker claimed this task first
+                continue
+            os.utime(claimed_path)
+            with open(claimed_path, "rb") as f:
+                task = pickle.load(f)
+            return name, claimed_path, task
+        return None
+
+    def complete(self, name, claimed_path, output, failed=False):
+        """
+        Store the output of a claimed task and release the claim.
+
+        Parameters
+        ----------
+        name : str
+            The name of the task.
+        claimed_path : str
+            The path returned by claim.
+        output : object
+            The return value of the task, or the error message if failed.
+        failed : bool, optional
+            Whether the task raised an error, by default False.
+
+        Returns
+        -------
+        None
+
+        """
+        _atomic_pickle(
+            {"failed": failed, "output": output, "worker": default_worker_id()},
+            self._path(DONE, name),
+        )
+        try:
+            os.remove(claimed_path)
+        except FileNotFoundError:
+            # The lease expired and the task was put back in the queue
+            pass
+
+    def requeue_expired(self):
+        """
+        Put claimed tasks whose lease has expired back in the queue.
+
+        Returns
+        -------
+        list of str
+            The names of the tasks put back in the queue.
+
+        """
+        requeued = []
+        now = self.now()
+        for claimed in self._claimed_files():
+            claimed_path = self._path(CLAIMED, claimed)
+            try:
+                expired = now - os.path.getmtime(claimed_path) > self.lease_time
+            except FileNotFoundError:
+                continue
+            name = claimed.split("--")[0]
+            if expired and not os.path.isfile(self._path(DONE, name)):
+                try:
+                    os.rename(claimed_path, self._path(PENDING, name))
+                except FileNotFoundError:
+                    continue
+                print("Lease expired on {}, returning it to the queue".format(claimed))
+                requeued.append(name)
+        return requeued
+
+    def result(self, name):
+        """Return the stored output of task name, or None if it is not done."""
+        location = self._path(DONE, name)
+        if not os.path.isfile(location):
+            return None
+        with open(location, "rb") as f:
+            return pickle.load(f)
+
+    def wait(self, names, poll_interval=2.0):
+        """
+        Wait for tasks to complete, yielding their output as they finish.
+
+        Expired leases are put back in the queue while waiting.
+
+        Parameters
+        ----------
+        names : list of str
+            The names of the tasks to wait for.
+        poll_interval : float, optional
+            The number of seconds between checks of the queue, by default 2.0.
+
+        Yields
+        ------
+        name : str
+            The name of the completed task.
+        output : object
+            The return value of the task.
+
+        Raises
+        ------
+        RuntimeError
+            If a task raised an error in its worker.
+
+        """
+        remaining = list(names)
+        while len(remaining) > 0:
+            for name in list(remaining):
+                result = self.result(name)
+                if result is None:
+                    continue
+                remaining.remove(name)
+                if result["failed"]:
+                    raise RuntimeError(
+                        "Task {} failed on worker {}:\n{}".format(
+                            name, result["worker"], result["output"]
+                        )
+                    )
+                yield name, result["output"]
+            if len(remaining) > 0:
+                self.requeue_expired()
+                time.sleep(poll_interval)
+
+    def num_pending(self):
+        """Return the number of tasks waiting to be claimed."""
+        return len(os.listdir(os.path.join(self.queue_dir, PENDING)))
+
+    def num_claimed(self):
+        """Return the number of tasks currently being run by workers."""
+        return len(self._claimed_files())
+
+    def clear(self, submission):
+        """
+        Remove the pending tasks and the outputs of one submission.
+
+        Tasks of the submission that workers are running are left to finish.
+        Tasks and outputs of other submissions are not changed.
+
+        Parameters
+        ----------
+        submission : str
+            The id the tasks were submitted with.
+
+        Returns
+        -------
+        int
+            The number of files removed.
+
+        """
+        num_removed = 0
+        for state in (PENDING, DONE):
+            dirname = os.path.join(self.queue_dir, state)
+            for fname in os.listdir(dirname):
+                if not fname.startswith(submission + "_task_"):
+                    continue
+                try:
+                    os.remove(os.path.join(dirname, fname))
+                except FileNotFoundError:
+                    # A worker claimed the task first
+                    continue
+                num_removed += 1
+        return num_removed
+
+
+def _heartbeat(claimed_path, interval, stop_event):
+    """Touch claimed_path every interval seconds until stop_event is set."""
+    while not stop_event.wait(interval):
+        try:
+            os.utime(claimed_path)
+        except FileNotFoundError:
+            return
+
+
+def run_worker(queue_dir, poll_interval=2.0, exit_when_empty=False, worker_id=None):
+    """
+    Claim and run tasks from the queue in queue_dir until stopped.
+
+    Parameters
+    ----------
+    queue_dir : str
+        The directory holding the queue.
+    poll_interval : float, optional
+        The number of seconds to wait when no task is pending, by default 2.0.
+    exit_when_empty : bool, optional
+        If True, return once no tasks are pending or running, by default False.
+    worker_id : str, optional
+        The name of this worker, by default default_worker_id().
+
+    Returns
+    -------
+    int
+        The number of tasks this worker ran.
+
+    """
+    job_queue = JobQueue(queue_dir)
+    worker_id = default_worker_id() if worker_id is None else worker_id
+    print("Worker {} waiting for tasks in {}".format(worker_id, job_queue.queue_dir))
+    num_run = 0
+    while True:
+        claimed = job_queue.claim(worker_id)
+        if claimed is None:
+            job_queue.requeue_expired()
+            if exit_when_empty and (job_queue.num_pending() == 0):
+                if job_queue.num_claimed() == 0:
+                    return num_run
+            time.sleep(poll_interval)
+            continue
+
+        name, claimed_path, task = claimed
+        job_queue.lease_time = task["lease_time"]
+        print("Worker {} running {}".format(worker_id, name))
+        for site_dir in task["site_dirs"]:
+            if os.path.isdir(site_dir):
+                site.addsitedir(site_dir)
+        set_trace_dir(task.get("trace_dir", None))
+        set_profile_dir(task.get("profile_dir", None))
+
+        stop_event = threading.Event()
+        heartbeat = threading.Thread(
+            target=_heartbeat,
+            args=(claimed_path, max(task["lease_time"] / 4.0, 0.1), stop_event),
+            daemon=True,
+        )
+        heartbeat.start()
+        try:
+            fn, args = pickle.loads(task["payload"])
+            with profiled():
+                output = fn(*args)
+            failed = False
+        except Exception:
+            output = traceback.format_exc()
+            failed = True
+        finally:
+            stop_event.set()
+            heartbeat.join()
+        job_queue.complete(name, claimed_path, output, failed=failed)
+        num_run += 1
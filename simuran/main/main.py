@@ -6,25 +6,54 @@ import subprocess
 import site
 import sys
 import time
+import threading
 import multiprocessing
 from copy import copy
 from datetime import datetime
 
-from tqdm import tqdm
-
 import simuran.batch_setup
 import simuran.recording_container
 import simuran.recording
 import simuran.analysis.analysis_handler
+import simuran.analysis.cache
 import simuran.param_handler
-import simuran.plot.figure
-
-import matplotlib
-import matplotlib.pyplot as plt
-
-matplotlib.use("Qt4agg")
-
-
+from simuran.main.cpu_budget import split_cpu_budget
+from simuran.main.memory_scheduler import (
+    MemoryScheduler,
+    estimate_recording_memory,
+    source_files_size,
+)
+from simuran.main.supervisor import TaskSupervisor
+from simuran.main.pipeline import AsyncPipeline, read_source_files
+from simuran.main.progress import reporting, report_progress, tracking
+from simuran.main.result_writer import StreamingResultWriter
+from simuran.main.results_db import ResultsDatabase
+from simuran.main.table_store import (
+    default_table_dir,
+    partition_names,
+    save_result_tables,
+)
+from simuran.main.timing import TimingTable, timings_location
+from simuran.main.worker_pool import (
+    get_worker_pool,
+    register_site_dir,
+    shutdown_worker_pool,
+)
+from simuran.memory_profiler import (
+    MemoryProfiler,
+    memory_location,
+    profile_memory,
+    profiling,
+)
+from simuran.tracer import trace, traced
+from simuran.plot.backend import set_default_backend
+
+# matplotlib is only imported when figures are saved, so that starting SIMURAN
+# and its workers is fast, and without a display it uses the Agg backend
+set_default_backend()
+
+
+@traced("figures")
 def save_figures(figures, out_dir, figure_names=[], verbose=False, set_done=False):
     """
     Save all figures to the output directory if they are ready.
@@ -50,6 +79,8 @@ def save_figures(figures, out_dir, figure_names=[], verbose=False, set_done=Fals
         All the figures that were not ready to be saved.
 
     """
+    import simuran.plot.figure
+
     for i, f in enumerate(figures):
         if not isinstance(f, simuran.plot.figure.SimuranFigure):
             figures[i] = simuran.plot.figure.SimuranFigure(figure=f, done=set_done)
@@ -78,6 +109,8 @@ def save_figures(figures, out_dir, figure_names=[], verbose=False, set_done=Fals
 
 def save_unclosed_figures(out_dir):
     """Save any figures which were not closed to out_dir and close them."""
+    import matplotlib.pyplot as plt
+
     figs = list(map(plt.figure, plt.get_fignums()))
     for i, f in enumerate(figs):
         f.savefig(os.path.join(out_dir, "unclosed_plots", "fig_{}.png".format(i)))
@@ -132,6 +165,8 @@ def modify_path(path_dir, verbose=False):
     """
     Add a folder to path and process any .pth files in it.
 
+    The folder is also added to the path of any worker processes.
+
     Parameters
     ----------
     path_dir : str
@@ -148,6 +183,7 @@ def modify_path(path_dir, verbose=False):
         if verbose:
             print("Adding {} to path".format(path_dir))
         site.addsitedir(path_dir)
+        register_site_dir(path_dir)
     elif verbose:
         print("WARNING: {} does not exist, not adding to path".format(path_dir))
     if verbose:
@@ -412,6 +448,40 @@ def set_output_locations(batch_name, function_config_path):
     return out_dir, out_name
 
 
+def _add_recording_fns(analysis_handler, recording, functions, function_args):
+    """Add the functions that operate on a single recording to analysis_handler."""
+    for fn in functions:
+        # TODO get this right
+        if not isinstance(fn, (tuple, list)):
+            fn_args = function_args.get(fn.__name__, ([], {}))
+
+            # This allows for multiple runs of the same function
+            if isinstance(fn_args, dict):
+                for key, value in fn_args.items():
+                    args, kwargs = value
+                    analysis_handler.add_fn(fn, recording, *args, **kwargs)
+            else:
+                args, kwargs = fn_args
+                analysis_handler.add_fn(fn, recording, *args, **kwargs)
+
+
+def recording_label(recording, i):
+    """Return the name of recording i used in reports, its source file if set."""
+    if recording.source_file is None:
+        return "recording {}".format(i)
+    return str(recording.source_file)
+
+
+def _add_timings(timings, label, recording, analysis_handler=None, loaded=False):
+    """Add the load and analysis times of recording to the timings table."""
+    if loaded:
+        for name, seconds in recording.load_times.items():
+            timings.add("load", seconds, label, name)
+    if analysis_handler is not None:
+        for name, seconds in analysis_handler.timings:
+            timings.add("analysis", seconds, label, name)
+
+
 def multiprocessing_func(
     i,
     recording_container,
@@ -422,36 +492,315 @@ def multiprocessing_func(
     load_all,
     to_load,
     out_dir,
+    cache=None,
+    timings=None,
+    memory_profiler=None,
 ):
-    analysis_handler = simuran.analysis.analysis_handler.AnalysisHandler()
+    analysis_handler = simuran.analysis.analysis_handler.AnalysisHandler(cache=cache)
+    timings = TimingTable() if timings is None else timings
+    function_args = {}
     if args_fn is not None:
         function_args = args_fn(recording_container, i, figures)
-    if load_all:
-        recording_container[i].available = to_load
-        recording = recording_container.get(i)
-    else:
-        recording = recording_container[i]
-    for fn in functions:
-        # TODO get this right
-        if not isinstance(fn, (tuple, list)):
-            fn_args = function_args.get(fn.__name__, ([], {}))
-
-            # This allows for multiple runs of the same function
-            if isinstance(fn_args, dict):
-                for key, value in fn_args.items():
-                    args, kwargs = value
-                    analysis_handler.add_fn(fn, recording, *args, **kwargs)
+    label = recording_label(recording_container[i], i)
+    nbytes = source_files_size(recording_container[i].source_files)
+    with profiling(memory_profiler, label), tracking("recordings", label, nbytes):
+        with trace(label, "recording"):
+            if load_all:
+                recording_container[i].available = to_load
+                recording = recording_container.get(i)
             else:
-                args, kwargs = fn_args
-                analysis_handler.add_fn(fn, recording, *args, **kwargs)
-    analysis_handler.run_all_fns()
-    recording_container[i].results = copy(analysis_handler.results)
-    analysis_handler.reset()
-    figures = save_figures(figures, out_dir, figure_names=figure_names, verbose=False)
+                recording = recording_container[i]
+            _add_recording_fns(analysis_handler, recording, functions, function_args)
+            analysis_handler.run_all_fns()
+        _add_timings(timings, label, recording, analysis_handler, loaded=load_all)
+        recording_container[i].results = copy(analysis_handler.results)
+        recording_container[i].argument_sets = _argument_sets(functions, function_args)
+        analysis_handler.reset()
+        with timings.timer("figures", label):
+            with profile_memory("figures", "save_figures"):
+                figures = save_figures(
+                    figures, out_dir, figure_names=figure_names, verbose=False
+                )
 
     return figures
 
 
+def analyse_recording(
+    recording, functions, function_args, load_all, cache_dir=None, label=""
+):
+    """
+    Load a recording if needed and run the analysis functions on it.
+
+    The label names the recording in the returned timings.
+
+    Returns
+    -------
+    results : indexed.IndexedOrderedDict
+        The results of the analysis.
+    stats : dict
+        "cache" holds the cache hits and misses during the analysis, or None,
+        and "timings" a simuran.main.timing.TimingTable of the time taken
+        to load the recording and run each function.
+
+    """
+    cache = None
+    if cache_dir is not None:
+        cache = simuran.analysis.cache.AnalysisCache(cache_dir)
+    analysis_handler = simuran.analysis.analysis_handler.AnalysisHandler(cache=cache)
+    nbytes = source_files_size(recording.source_files)
+    with trace(label, "recording"), tracking("recordings", label, nbytes):
+        if load_all:
+            recording.load()
+        _add_recording_fns(analysis_handler, recording, functions, function_args)
+        analysis_handler.run_all_fns()
+    stats = {
+        "cache": None if cache is None else cache.stats,
+        "timings": TimingTable(),
+    }
+    _add_timings(stats["timings"], label, recording, analysis_handler, load_all)
+
+    return copy(analysis_handler.results), stats
+
+
+def worker_analysis_func(
+    i,
+    recording,
+    functions,
+    function_args,
+    figures,
+    figure_names,
+    load_all,
+    out_dir,
+    cache_dir=None,
+    memory_profile=False,
+):
+    """
+    Run the analysis on a single recording in a worker process.
+
+    The functions must be importable in the worker, for example by
+    placing them in the analysis directory next to the batch configuration.
+    Figures are saved in the worker and are not shared between recordings.
+    If memory_profile is True, memory use is recorded with a
+    simuran.memory_profiler.MemoryProfiler.
+
+    Returns
+    -------
+    i : int
+        The index of the recording in the container.
+    results : indexed.IndexedOrderedDict
+        The results of the analysis.
+    stats : dict
+        The stats from analyse_recording, with "memory" holding the
+        simuran.memory_profiler.MemoryProfiler or None.
+
+    """
+    label = recording_label(recording, i)
+    memory_profiler = MemoryProfiler() if memory_profile else None
+    with profiling(memory_profiler, label):
+        results, stats = analyse_recording(
+            recording, functions, function_args, load_all, cache_dir, label
+        )
+        with stats["timings"].timer("figures", label):
+            with profile_memory("figures", "save_figures"):
+                save_figures(
+                    figures, out_dir, figure_names=figure_names, verbose=False
+                )
+    stats["memory"] = memory_profiler
+
+    return i, results, stats
+
+
+def pipeline_analysis_func(
+    i,
+    recording,
+    functions,
+    function_args,
+    figures,
+    figure_names,
+    load_all,
+    out_dir,
+    cache_dir=None,
+    memory_profile=False,
+):
+    """
+    Run the analysis on a single recording in the CPU stage of a pipeline.
+
+    This is the same as worker_analysis_func, except the figures
+    are returned to be saved in the output stage of the pipeline.
+
+    Returns
+    -------
+    i : int
+        The index of the recording in the container.
+    results : indexed.IndexedOrderedDict
+        The results of the analysis.
+    stats : dict
+        The stats from worker_analysis_func.
+    figures : list
+        The figures after running the analysis.
+
+    """
+    label = recording_label(recording, i)
+    memory_profiler = MemoryProfiler() if memory_profile else None
+    with profiling(memory_profiler, label):
+        results, stats = analyse_recording(
+            recording, functions, function_args, load_all, cache_dir, label
+        )
+    stats["memory"] = memory_profiler
+
+    return i, results, stats, figures
+
+
+def _merge_worker_stats(stats, cache=None, timings=None, memory_profiler=None):
+    """Add the stats returned by a worker to those of this process."""
+    if (cache is not None) and (stats["cache"] is not None):
+        cache.merge_stats(stats["cache"])
+    if timings is not None:
+        timings.extend(stats["timings"].rows)
+    if (memory_profiler is not None) and (stats["memory"] is not None):
+        memory_profiler.extend(stats["memory"].rows)
+
+
+def _write_result(
+    recording_container, i, result_writer=None, results_database=None, timings=None
+):
+    """Write the results of recording i to the writers that are set, timing it."""
+    if (result_writer is None) and (results_database is None):
+        return
+    start_time = time.perf_counter()
+    if result_writer is not None:
+        result_writer.add(i)
+    if results_database is not None:
+        results_database.add(recording_container[i])
+    if timings is not None:
+        label = recording_label(recording_container[i], i)
+        timings.add("summary", time.perf_counter() - start_time, label)
+
+
+def _argument_sets(functions, function_args):
+    """
+    Return the arguments of each result saved by _add_recording_fns.
+
+    Returns
+    -------
+    dict
+        "args=[...], kwargs={...}" by the name the result is saved under,
+        prefixed by the name of the argument set for named argument sets.
+
+    """
+    argument_sets = {}
+    for fn in functions:
+        if isinstance(fn, (tuple, list)):
+            continue
+        fn_args = function_args.get(fn.__name__, ([], {}))
+        if isinstance(fn_args, dict):
+            named = [("{}: ".format(key), value) for key, value in fn_args.items()]
+        else:
+            named = [("", fn_args)]
+        for prefix, (args, kwargs) in named:
+            if not kwargs.get("simuran_save_result", True):
+                continue
+            # Named as by simuran.analysis.analysis_handler.AnalysisHandler
+            save_name, ctr = fn.__name__, 1
+            while save_name in argument_sets:
+                save_name = "{}_{}".format(fn.__name__, ctr)
+                ctr = ctr + 1
+            argument_sets[save_name] = "{}args={!r}, kwargs={!r}".format(
+                prefix, list(args), kwargs
+            )
+    return argument_sets
+
+
+def check_pipeline_options(pipeline, task_timeout=None, retries=0):
+    """
+    Check that task timeouts and retries are not requested with a pipeline.
+
+    Parameters
+    ----------
+    pipeline : bool or dict
+        The pipeline setting, see run_all_analysis.
+    task_timeout : float, optional
+        The seconds a single recording may take, by default None.
+    retries : int, optional
+        The number of times to retry a failed recording, by default 0.
+
+    Returns
+    -------
+    None
+
+    Raises
+    ------
+    ValueError
+        If pipeline is set with task_timeout or retries.
+
+    """
+    if pipeline and ((task_timeout is not None) or (retries > 0)):
+        raise ValueError(
+            "task_timeout and retries can not be used with pipeline, "
+            "as the pipeline does not supervise its workers"
+        )
+
+
+def _run_analysis_pipeline(
+    recording_container,
+    tasks,
+    pool,
+    num_workers,
+    figure_names,
+    out_dir,
+    cache,
+    pipeline,
+    result_writer=None,
+    timings=None,
+    memory_profiler=None,
+    results_database=None,
+    scheduler=None,
+    estimates=None,
+):
+    """Run the tasks through a simuran.main.pipeline.AsyncPipeline."""
+    settings = pipeline if isinstance(pipeline, dict) else {}
+    lock = threading.Lock()
+    can_start = None
+    if (scheduler is not None) and (scheduler.ram_budget is not None):
+
+        def can_start(task, running):
+            in_flight = {other[0]: estimates[other[0]] for other in running}
+            return scheduler.fits(estimates[task[0]], in_flight)
+
+    def read_recording(task):
+        read_source_files(task[1].source_files)
+
+    def save_output(info):
+        i, results, stats, figures = info
+        label = recording_label(recording_container[i], i)
+        start_time = time.perf_counter()
+        save_figures(figures, out_dir, figure_names=figure_names, verbose=False)
+        figure_time = time.perf_counter() - start_time
+        with lock:
+            recording_container[i].results = results
+            _merge_worker_stats(stats, cache, timings, memory_profiler)
+            if timings is not None:
+                timings.add("figures", figure_time, label)
+            _write_result(
+                recording_container, i, result_writer, results_database, timings
+            )
+
+    async_pipeline = AsyncPipeline(
+        pipeline_analysis_func,
+        io_fn=read_recording,
+        output_fn=save_output,
+        pool=pool,
+        io_concurrency=settings.get("io_concurrency", 2),
+        cpu_concurrency=num_workers,
+        output_concurrency=settings.get("output_concurrency", 1),
+        queue_depth=settings.get("queue_depth", 2),
+        can_start=can_start,
+    )
+    async_pipeline.run(tasks)
+    async_pipeline.print_metrics()
+
+
+@traced("main")
 def run_all_analysis(
     recording_container,
     functions,
@@ -462,6 +811,15 @@ def run_all_analysis(
     to_load,
     out_dir,
     num_cpus=1,
+    cache=None,
+    ram_budget=None,
+    pipeline=None,
+    result_writer=None,
+    task_timeout=None,
+    retries=0,
+    timings=None,
+    memory_profiler=None,
+    results_database=None,
 ):
     """
     Run all of the analysis functions on the recording container.
@@ -486,6 +844,48 @@ def run_all_analysis(
         The directory to save the figures to
     num_cpus : int, optional
         The number of CPUs to use, default is 1.
+        This is split between worker processes and numerical library threads,
+        see simuran.main.cpu_budget.split_cpu_budget.
+    cache : simuran.analysis.cache.AnalysisCache, optional
+        A cache to load and store function results in, default is None.
+    ram_budget : float, optional
+        The memory in GB that recordings analysed at the same time may use,
+        default is None for no limit. Memory use of each recording is estimated
+        with simuran.main.memory_scheduler.estimate_recording_memory.
+    pipeline : bool or dict, optional
+        If True or a dict, recordings are run through a
+        simuran.main.pipeline.AsyncPipeline, which reads recording files
+        while other recordings are analysed. The dict can set the
+        "io_concurrency", "output_concurrency", and "queue_depth" of the pipeline.
+        By default None, which does not use a pipeline.
+    result_writer : simuran.main.result_writer.StreamingResultWriter, optional
+        If passed, the summary row of each recording is written
+        as soon as its analysis finishes, by default None.
+    task_timeout : float, optional
+        The seconds the analysis of a single recording may take before
+        its worker is killed, by default None for no limit.
+        If this or retries is set, recordings are analysed in worker processes,
+        see simuran.main.supervisor.TaskSupervisor. Recordings that fail on
+        every attempt are left without results and listed at the end,
+        instead of stopping the run.
+        This and retries can not be used with a pipeline. They are ignored
+        in the workers of a batch pool, which can not start their own workers,
+        so only iteration timeouts and retries apply to those iterations.
+    retries : int, optional
+        The number of times to retry a recording whose analysis raised an error,
+        timed out, or crashed its worker, by default 0.
+    timings : simuran.main.timing.TimingTable, optional
+        If passed, the time taken to load each recording, run each function,
+        save figures, and write summary rows is added to this table.
+    memory_profiler : simuran.memory_profiler.MemoryProfiler, optional
+        If passed, the memory used to load each recording, run each function,
+        and save figures is added to this profiler. Workers profile their
+        own recordings and send the measurements back.
+    results_database : simuran.main.results_db.ResultsDatabase, optional
+        If passed, the results of each recording are added to this database
+        as soon as its analysis finishes, by default None.
+        The arguments each result was computed with are kept in the
+        argument_sets attribute of the recording.
 
     Returns
     -------
@@ -494,42 +894,139 @@ def run_all_analysis(
     figure_names : list of str
         The names of the figures to plot
 
-    """
-    pbar = tqdm(range(len(recording_container)))
+    Raises
+    ------
+    ValueError
+        If pipeline is set with task_timeout or retries.
 
+    """
+    check_pipeline_options(pipeline, task_timeout, retries)
     final_figs = []
-    if num_cpus > 1:
-        pool = multiprocessing.get_context("spawn").Pool(num_cpus)
+    num_workers, _, num_threads = split_cpu_budget(num_cpus, len(recording_container))
+    # Timeouts need a worker process to kill, which batch workers can not start
+    # Pool workers can not start their own workers, so only a pipeline
+    # in threads can run in parallel inside a pool worker
+    in_worker = multiprocessing.current_process().daemon
+    supervised = (task_timeout is not None) or (retries > 0)
+    if supervised and in_worker:
         print(
-            "Launching {} workers for {} iterations".format(
-                num_cpus, len(recording_container)
-            )
+            "Ignoring task_timeout and retries in a batch pool worker, "
+            "use iteration_timeout and iteration_retries instead"
         )
-        for i in pbar:
-            pool.apply_async(
-                multiprocessing_func(
+        supervised = False
+    parallel = (num_workers > 1) and not in_worker
+    if pipeline or supervised or parallel:
+        tasks = []
+        for i in range(len(recording_container)):
+            function_args = {}
+            if args_fn is not None:
+                function_args = args_fn(recording_container, i, figures)
+            recording_container[i].argument_sets = _argument_sets(
+                functions, function_args
+            )
+            if load_all:
+                recording_container[i].available = to_load
+            tasks.append(
+                (
                     i,
-                    recording_container,
+                    recording_container[i],
                     functions,
-                    args_fn,
+                    function_args,
                     figures,
                     figure_names,
                     load_all,
-                    to_load,
                     out_dir,
-                ),
-                callback=final_figs.append,
+                    None if cache is None else cache.cache_dir,
+                    memory_profiler is not None,
+                )
             )
 
-        pool.close()
-        pool.join()
+        estimates = [estimate_recording_memory(r) for r in recording_container]
+        scheduler = MemoryScheduler(ram_budget)
+        pool = None
+        if in_worker:
+            print("Running pipeline in threads for {} recordings".format(len(tasks)))
+        else:
+            # Size the pool from the CPU budget so that later runs with more
+            # recordings re-use it, only num_workers tasks run at once
+            pool_size, _, _ = split_cpu_budget(num_cpus, num_cpus)
+            pool = get_worker_pool(pool_size, num_threads)
+            print(
+                "Launching {} workers with {} threads each for {} recordings".format(
+                    num_workers, num_threads, len(recording_container)
+                )
+            )
+        try:
+            if pipeline:
+                largest_first = sorted(
+                    tasks, key=lambda task: estimates[task[0]], reverse=True
+                )
+                _run_analysis_pipeline(
+                    recording_container,
+                    largest_first,
+                    pool,
+                    num_workers,
+                    figure_names,
+                    out_dir,
+                    cache,
+                    pipeline,
+                    result_writer,
+                    timings,
+                    memory_profiler,
+                    results_database,
+                    scheduler,
+                    estimates,
+                )
+            else:
+                # Failed recordings are only reported if they are supervised,
+                # otherwise the first error stops the run as before
+                supervisor = TaskSupervisor(
+                    timeout=task_timeout, retries=retries, raise_errors=not supervised
+                )
+                for i, results, stats in scheduler.run(
+                    pool,
+                    num_workers,
+                    worker_analysis_func,
+                    tasks,
+                    estimates,
+                    supervisor=supervisor,
+                    labels=[
+                        recording_label(recording, j)
+                        for j, recording in enumerate(recording_container)
+                    ],
+                ):
+                    recording_container[i].results = results
+                    _merge_worker_stats(stats, cache, timings, memory_profiler)
+                    _write_result(
+                        recording_container,
+                        i,
+                        result_writer,
+                        results_database,
+                        timings,
+                    )
+                for failure in supervisor.failures:
+                    i = tasks[failure.index][0]
+                    recording_container[i].results = {}
+                    report_progress(
+                        "finish",
+                        "recordings",
+                        recording_label(recording_container[i], i),
+                        ok=False,
+                    )
+                    _write_result(
+                        recording_container,
+                        i,
+                        result_writer,
+                        results_database,
+                        timings,
+                    )
+                supervisor.print_report()
+        except BaseException:
+            shutdown_worker_pool(terminate=True)
+            raise
 
     else:
-        for i in pbar:
-            disp_name = os.path.relpath(
-                recording_container[i].source_file, recording_container.base_dir
-            )
-            pbar.set_description("Running on {}".format(disp_name))
+        for i in range(len(recording_container)):
             multiprocessing_func(
                 i,
                 recording_container,
@@ -540,12 +1037,21 @@ def run_all_analysis(
                 load_all,
                 to_load,
                 out_dir,
-            ),
+                cache,
+                timings,
+                memory_profiler,
+            )
+            _write_result(
+                recording_container, i, result_writer, results_database, timings
+            )
 
+    function_args = {}
     if args_fn is not None:
-        function_args = args_fn(recording_container, i, final_figs)
+        function_args = args_fn(
+            recording_container, len(recording_container) - 1, final_figs
+        )
 
-    analysis_handler = simuran.analysis.analysis_handler.AnalysisHandler()
+    analysis_handler = simuran.analysis.analysis_handler.AnalysisHandler(cache=cache)
     for func in functions:
         if isinstance(func, (tuple, list)):
             fn, _ = func
@@ -560,7 +1066,11 @@ def run_all_analysis(
                 args, kwargs = fn_args
                 analysis_handler.add_fn(fn, recording_container, *args, **kwargs)
 
-    analysis_handler.run_all_fns()
+    with profiling(memory_profiler, "container"):
+        analysis_handler.run_all_fns()
+    if timings is not None:
+        for name, seconds in analysis_handler.timings:
+            timings.add("analysis", seconds, "", name)
     recording_container.results = copy(analysis_handler.results)
 
     final_figs = save_figures(
@@ -703,11 +1213,25 @@ def main(
     only_check=False,
     should_modify_path=True,
     num_cpus=1,
+    cache_dir=None,
+    ram_budget=None,
+    pipeline=None,
+    task_timeout=None,
+    retries=0,
+    memory_profile=False,
+    table_format=None,
+    table_dir=None,
+    results_db=None,
 ):
     """
     Run the main control functionality.
 
     Also helps to set up files.
+    The time taken by each stage of the run is saved to a table
+    next to the results csv, see simuran.main.timing.TimingTable,
+    and the slowest functions and recordings are printed.
+    Progress is shown while the recordings are analysed,
+    see simuran.main.progress.
 
     Parameters
     ----------
@@ -771,7 +1295,43 @@ def main(
         If True, the directory batch_script_dir/../analysis
         is added to path, by default True.
     num_cpus : int, optional
-        The number of worker CPUs to launch, by default 1.
+        The total number of CPUs to use, by default 1.
+        This is split between recording workers and numerical library threads.
+    cache_dir : str, optional
+        If passed, the results of analysis functions are cached in this directory,
+        and re-used on later runs with unchanged functions, arguments,
+        and recording source files. By default None, which disables caching.
+    ram_budget : float, optional
+        The memory in GB that recordings analysed in parallel may use at once,
+        by default None for no limit.
+    pipeline : bool or dict, optional
+        Whether to read recording files while other recordings are analysed,
+        by default None. See simuran.main.main.run_all_analysis.
+    task_timeout : float, optional
+        The seconds the analysis of a single recording may take,
+        by default None for no limit. Can not be used with pipeline,
+        and is ignored in the workers of a recursive batch run.
+    retries : int, optional
+        The number of times to retry a failed recording, by default 0.
+        Can not be used with pipeline, and is ignored in the workers
+        of a recursive batch run.
+    memory_profile : bool, optional
+        If True, the memory used to load each recording, run each function,
+        and save figures is saved to a table next to the results csv,
+        and functions that may leak memory are printed. By default False.
+        See simuran.memory_profiler.MemoryProfiler.
+    table_format : str, optional
+        "parquet" or "feather" to also save the summary and the results of
+        each function as tables partitioned by function config and batch,
+        by default None. This needs the pyarrow package.
+        See simuran.main.table_store.
+    table_dir : str, optional
+        The directory to save tables to, by default None, which is
+        sim_results/tables next to the directory of batch_name.
+    results_db : str, optional
+        The path to a SQLite database to add the results of each recording to
+        as it finishes, by default None. Runs in parallel processes can share
+        the database. See simuran.main.results_db.
 
     Returns
     -------
@@ -785,6 +1345,7 @@ def main(
     ValueError
         If do_batch_setup is True, but location is not a directory.
         If select_recordings is not None, but location is not a directory.
+        If pipeline is set with task_timeout or retries.
     FileNotFoundError
         If a valid location is not passed.
         If no recordings are found in the location passed
@@ -792,6 +1353,7 @@ def main(
         Non-existant cells are tried to be selected.
 
     """
+    check_pipeline_options(pipeline, task_timeout, retries)
     in_dir = location if os.path.isdir(location) else os.path.dirname(location)
     batch_setup = check_input_params(location, batch_name)
     batch_params = batch_setup.ph
@@ -811,6 +1373,9 @@ def main(
         ):
             return [], []
 
+    timings = TimingTable()
+    memory_profiler = MemoryProfiler() if memory_profile else None
+    setup_start = time.perf_counter()
     recording_container = container_setup(
         location, batch_params, sort_container_fn, reverse_sort
     )
@@ -828,40 +1393,105 @@ def main(
         recording_container.select_cells(
             cell_location, do_cell_picker=do_cell_picker, overwrite=False
         )
+    timings.add("setup", time.perf_counter() - setup_start, name="container")
 
-    start_time = time.monotonic()
-    recording_container.output_dir = out_dir
-    figures = run_all_analysis(
-        recording_container,
-        functions,
-        args_fn,
-        figures,
-        figure_names,
-        load_all,
-        to_load,
-        out_dir,
-        num_cpus=num_cpus,
-    )
+    cache = None
+    if cache_dir is not None:
+        cache = simuran.analysis.cache.AnalysisCache(cache_dir, verbose=verbose)
 
-    recording_container.save_summary_data(
+    result_writer = StreamingResultWriter(
         out_loc,
-        attr_list=attributes_to_save,
+        recording_container,
+        attributes_to_save,
         friendly_names=friendly_names,
         decimals=decimals,
     )
 
-    figures = save_figures(
-        figures, out_dir, figure_names=figure_names, verbose=False, set_done=True
-    )
-    save_unclosed_figures(out_dir)
+    results_database = None
+    if results_db is not None:
+        function_config, batch = partition_names(batch_name, function_config_path)
+        results_database = ResultsDatabase(
+            results_db, batch=batch, function_config=function_config
+        )
+        print(
+            "Saving results to {} as run {}".format(results_db, results_database.run_id)
+        )
 
-    results = recording_container.data_from_attr_list(
-        attributes_to_save, friendly_names=friendly_names, decimals=decimals
-    )
+    start_time = time.monotonic()
+    recording_container.output_dir = out_dir
+    try:
+        with reporting():
+            report_progress("total", "recordings", value=len(recording_container))
+            figures = run_all_analysis(
+                recording_container,
+                functions,
+                args_fn,
+                figures,
+                figure_names,
+                load_all,
+                to_load,
+                out_dir,
+                num_cpus=num_cpus,
+                cache=cache,
+                ram_budget=ram_budget,
+                pipeline=pipeline,
+                result_writer=result_writer,
+                task_timeout=task_timeout,
+                retries=retries,
+                timings=timings,
+                memory_profiler=memory_profiler,
+                results_database=results_database,
+            )
+    finally:
+        # Keep the results of the recordings that finished if the run fails
+        if results_database is not None:
+            results_database.close()
+    with timings.timer("summary", name="finalize"):
+        result_writer.finalize()
+
+    with timings.timer("figures", name="final"):
+        figures = save_figures(
+            figures, out_dir, figure_names=figure_names, verbose=False, set_done=True
+        )
+        save_unclosed_figures(out_dir)
+
+    with timings.timer("summary", name="results"):
+        results = recording_container.data_from_attr_list(
+            attributes_to_save, friendly_names=friendly_names, decimals=decimals
+        )
+
+    if table_format is not None:
+        if table_dir is None:
+            table_dir = default_table_dir(batch_name)
+        function_config, batch = partition_names(
+            batch_name, function_config_path, table_dir
+        )
+        with timings.timer("summary", name="tables"):
+            save_result_tables(
+                recording_container,
+                attributes_to_save,
+                table_dir,
+                function_config,
+                batch,
+                fmt=table_format,
+                friendly_names=friendly_names,
+                decimals=decimals,
+            )
 
     print(
         "Operation completed in {:.2f}mins".format((time.monotonic() - start_time) / 60)
     )
+    timings.print_summary()
+    timing_loc = timings_location(out_loc)
+    print("Saving timings to {}".format(timing_loc))
+    timings.save(timing_loc)
+    if memory_profiler is not None:
+        memory_profiler.print_summary()
+        memory_loc = memory_location(out_loc)
+        print("Saving memory profile to {}".format(memory_loc))
+        memory_profiler.save(memory_loc)
+    if cache is not None:
+        cache.print_stats()
 
     return results, recording_container
 
@@ -883,6 +1513,15 @@ def run(
     only_check=False,
     should_modify_path=True,
     num_cpus=1,
+    cache_dir=None,
+    ram_budget=None,
+    pipeline=None,
+    task_timeout=None,
+    retries=0,
+    memory_profile=False,
+    table_format=None,
+    table_dir=None,
+    results_db=None,
 ):
     """
     Run main more readily without having to set as many params.
@@ -931,7 +1570,36 @@ def run(
         If True, the directory batch_script_dir/../analysis
         is added to path, by default True.
     num_cpus : int, optional
-        The number of worker CPUs to launch, by default 1.
+        The total number of CPUs to use, by default 1.
+    cache_dir : str, optional
+        The directory to cache analysis function results in, by default None.
+        See simuran.main.main.main for more information.
+    ram_budget : float, optional
+        The memory in GB that recordings analysed in parallel may use at once,
+        by default None for no limit.
+    pipeline : bool or dict, optional
+        Whether to read recording files while other recordings are analysed,
+        by default None. See simuran.main.main.run_all_analysis.
+    task_timeout : float, optional
+        The seconds the analysis of a single recording may take,
+        by default None for no limit. Can not be used with pipeline,
+        and is ignored in the workers of a recursive batch run.
+    retries : int, optional
+        The number of times to retry a failed recording, by default 0.
+        Can not be used with pipeline, and is ignored in the workers
+        of a recursive batch run.
+    memory_profile : bool, optional
+        Whether to profile the memory use of the analysis, by default False.
+        See simuran.main.main.main for more information.
+    table_format : str, optional
+        "parquet" or "feather" to also save the results as tables,
+        by default None. See simuran.main.main.main for more information.
+    table_dir : str, optional
+        The directory to save tables to, by default None.
+        See simuran.main.main.main for more information.
+    results_db : str, optional
+        The path to a SQLite database to save results to, by default None.
+        See simuran.main.main.main for more information.
 
     Returns
     -------
@@ -1020,4 +1688,13 @@ def run(
         only_check=only_check,
         should_modify_path=should_modify_path,
         num_cpus=num_cpus,
+        cache_dir=cache_dir,
+        ram_budget=ram_budget,
+        pipeline=pipeline,
+        task_timeout=task_timeout,
+        retries=retries,
+        memory_profile=memory_profile,
+        table_format=table_format,
+        table_dir=table_dir,
+        results_db=results_db,
     )
@@ -0,0 +1,199 @@
+"""This module schedules parallel tasks so their estimated memory fits a budget."""
+
+import os
+
+from simuran.loaders.loader_list import loaders_dict
+from simuran.main.supervisor import TaskSupervisor
+
+
+def iter_source_files(source_files):
+    """
+    Yield the filenames in source_files that exist.
+
+    Parameters
+    ----------
+    source_files : str or list or dict
+        A filename, or a (possibly nested) list or dictionary of filenames,
+        such as simuran.recording.Recording.source_files.
+
+    Yields
+    ------
+    str
+        Each filename that exists on disk.
+
+    """
+    if isinstance(source_files, dict):
+        for value in source_files.values():
+            yield from iter_source_files(value)
+    elif isinstance(source_files, (list, tuple)):
+        for value in source_files:
+            yield from iter_source_files(value)
+    elif isinstance(source_files, str) and os.path.isfile(source_files):
+        yield source_files
+
+
+def source_files_size(source_files):
+    """
+    Return the total size in bytes of the files in source_files.
+
+    Parameters
+    ----------
+    source_files : str or list or dict
+        A filename, or a (possibly nested) list or dictionary of filenames,
+        such as simuran.recording.Recording.source_files.
+        Files that do not exist are counted as zero bytes.
+
+    Returns
+    -------
+    int
+        The total size in bytes.
+
+    """
+    return sum(os.path.getsize(f) for f in iter_source_files(source_files))
+
+
+def get_memory_expansion(loader_name):
+    """
+    Return the memory expansion of the loader called loader_name.
+
+    Parameters
+    ----------
+    loader_name : str
+        The name of the loader in simuran.loaders.loader_list.loaders_dict.
+
+    Returns
+    -------
+    float
+        The ratio of in-memory size to on-disk size,
+        0.0 for loaders that do not load data and 1.0 for unknown loaders.
+
+    """
+    loader_cls = loaders_dict.get(loader_name, None)
+    if loader_cls == "params_only_no_cls":
+        return 0.0
+    return getattr(loader_cls, "memory_expansion", 1.0)
+
+
+def estimate_recording_memory(recording):
+    """
+    Estimate the memory in bytes needed to load a recording.
+
+    This is the size of recording.source_files on disk
+    multiplied by the memory expansion of the recording loader.
+    Recordings without parameters are treated as having an unknown loader.
+
+    Parameters
+    ----------
+    recording : simuran.recording.Recording
+        The recording to estimate the memory usage of.
+
+    Returns
+    -------
+    int
+        The estimated number of bytes.
+
+    """
+    if recording.param_handler is None:
+        loader_name = None
+    else:
+        loader_name = recording.param_handler.get("loader", None)
+    size = source_files_size(recording.source_files)
+    return int(size * get_memory_expansion(loader_name))
+
+
+class MemoryScheduler(object):
+    """
+    Run tasks in a worker pool while their estimated memory fits a budget.
+
+    Pending tasks are considered largest first, which reduces the time
+    spent waiting on a large task at the end of a run.
+    The largest pending task that fits in the remaining budget is started
+    whenever a worker is free. A task larger than the full budget
+    is only started when no other task is running.
+
+    Attributes
+    ----------
+    ram_budget : int or None
+        The memory budget in bytes, None for no limit.
+    peak_in_flight : int
+        The largest estimated memory of tasks running at the same time.
+
+    Parameters
+    ----------
+    ram_budget : float, optional
+        The memory budget in GB, by default None for no limit.
+
+    """
+
+    def __init__(self, ram_budget=None):
+        """See help(MemoryScheduler)."""
+        if ram_budget is not None:
+            ram_budget = int(ram_budget * (1024 ** 3))
+        self.ram_budget = ram_budget
+        self.peak_in_flight = 0
+
+    def fits(self, estimate, in_flight):
+        """Return True if a task of size estimate can start alongside in_flight."""
+        if (self.ram_budget is None) or (len(in_flight) == 0):
+            return True
+        return sum(in_flight.values()) + estimate <= self.ram_budget
+
+    def run(
+        self, pool, num_workers, fn, tasks, estimates, supervisor=None, labels=None
+    ):
+        """
+        Call fn(*task) in the pool for each task, yielding results as they finish.
+
+        Parameters
+        ----------
+        pool : multiprocessing.pool.Pool
+            The pool from simuran.main.worker_pool.get_worker_pool.
+        num_workers : int
+            The number of workers in the pool.
+        fn : function
+            The function to call, must be importable by the workers.
+        tasks : list of tuple
+            The arguments for each call.
+        estimates : list of int
+            The estimated memory in bytes of each task.
+        supervisor : simuran.main.supervisor.TaskSupervisor, optional
+            Handles timeouts, retries, and crashed workers,
+            by default a TaskSupervisor that raises the first error.
+        labels : list of str, optional
+            Descriptions of the tasks used in failure reports, by default None.
+
+        Yields
+        ------
+        object
+            The return value of fn for each task, in completion order.
+            Tasks that fail while the supervisor does not raise errors are skipped.
+
+        Raises
+        ------
+        Exception
+            Any exception raised by fn in a worker, if the supervisor raises errors.
+
+        """
+        if supervisor is None:
+            supervisor = TaskSupervisor()
+        order = sorted(range(len(tasks)), key=lambda i: estimates[i], reverse=True)
+
+        def can_start(idx, running):
+            in_flight = {i: estimates[i] for i in running}
+            if not self.fits(estimates[idx], in_flight):
+                return False
+            self.peak_in_flight = max(
+                self.peak_in_flight, sum(in_flight.values()) + estimates[idx]
+            )
+            return True
+
+        for _, value in supervisor.run(
+            pool,
+            num_workers,
+            fn,
+            tasks,
+            order=order,
+            can_start=can_start,
+            labels=labels,
+        ):
+            yield value
@@ -1,66 +1,274 @@
 """This package holds routine for merging outputs of batch simuran runs."""
 
+import io
 import os
+import json
+import stat
 import shutil
 import argparse
-import re
 import warnings
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
 from skm_pyutils.py_path import get_all_files_in_dir
 
+from simuran.main.timing import TIMING_SUFFIX
+from simuran.memory_profiler import MEMORY_SUFFIX
 
-def merge_files(in_dir, all_result_ext=None):
+# numpy 1.23 parses text files in C, much faster than pandas for small files
+_FAST_LOADTXT = np.lib.NumpyVersion(np.__version__) >= "1.23.0"
+
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".svg", ".gif", ".tiff")
+MERGE_MODES = ("copy", "hardlink", "symlink")
+MANIFEST_NAME = "merge_manifest.json"
+MANIFEST_VERSION = 1
+
+
+class MergeManifest(object):
+    """
+    The record of which source files have been merged in a directory.
+
+    The manifest is saved as JSON in the directory that is merged.
+    Each kind of merge keeps its own section, holding the size and
+    modification time of each source file when it was merged, by its path
+    relative to the directory, so that merging again only reads new and
+    changed files.
+
+    Attributes
+    ----------
+    location : str
+        The path to the manifest file.
+    sections : dict
+        The record of each kind of merge, such as "csv" and "files".
+
+    Parameters
+    ----------
+    in_dir : str
+        The directory that is merged.
+
+    """
+
+    def __init__(self, in_dir):
+        """See help(MergeManifest)."""
+        self.location = os.path.join(in_dir, MANIFEST_NAME)
+        self.sections = {}
+        if not os.path.isfile(self.location):
+            return
+        try:
+            with open(self.location, "r") as f:
+                contents = json.load(f)
+        except (OSError, ValueError) as e:
+            print("Ignoring unreadable merge manifest {}: {}".format(self.location, e))
+            return
+        if contents.get("version", None) == MANIFEST_VERSION:
+            self.sections = contents["sections"]
+
+    def section(self, name):
+        """Return the section called name, adding it if it does not exist."""
+        return self.sections.setdefault(name, {})
+
+    def save(self):
+        """Atomically save the manifest to location."""
+        temp_name = self.location + ".tmp"
+        with open(temp_name, "w") as f:
+            json.dump({"version": MANIFEST_VERSION, "sections": self.sections}, f)
+        os.replace(temp_name, self.location)
+
+
+def _stat_key(path):
+    """Return the [size, modification time in ns] of path, or None."""
+    try:
+        path_stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [path_stat.st_size, path_stat.st_mtime_ns]
+
+
+def merge_files(
+    in_dir, all_result_ext=None, mode="copy", num_threads=8, incremental=True
+):
     """
     Merge all files with the given extension recursively from in_dir.
 
+    The files are placed in in_dir/all_results_merged, named by their path
+    relative to in_dir with the directory separators replaced by "--".
+    Files that the merge manifest of in_dir records as merged with the
+    same size, modification time and mode are skipped, as are files whose
+    size and modification time match the merged file, or that are already
+    linked to it, so merging again only copies new and changed files.
+    Merged files whose source file has been deleted are removed.
+
     Parameters
     ----------
     in_dir : str
         The path to where to start merging from.
     all_result_ext : str, optional
-        The extension to look for, by default None, which takes all
+        The extension to look for, by default None, which takes all images
+    mode : str, optional
+        "copy" to copy files, "hardlink" to hard link them,
+        which falls back to copying if in_dir is on another filesystem,
+        or "symlink" to create symbolic links to them. By default "copy".
+    num_threads : int, optional
+        The number of files to merge at once, by default 8.
+    incremental : bool, optional
+        Whether to skip the files the merge manifest records as merged,
+        by default True. If False, every merged file is checked.
 
     Returns
     -------
-    None
+    dict
+        The number of files "copied", "linked", "skipped", and "removed",
+        and "missing" for files that were removed while merging,
+        which are left out of the merge.
 
     """
+    if mode not in MERGE_MODES:
+        raise ValueError("mode must be one of {}, got {}".format(MERGE_MODES, mode))
     all_file_loc = os.path.join(in_dir, "all_results_merged")
     os.makedirs(all_file_loc, exist_ok=True)
-    print("Copying all results into {}".format(all_file_loc))
+    print("Merging all results into {}".format(all_file_loc))
     dirs = [
         os.path.join(in_dir, o)
         for o in os.listdir(in_dir)
         if os.path.isdir(os.path.join(in_dir, o)) and o != "all_results_merged"
     ]
+    to_merge = []
     for d in dirs:
-        name = d[len(in_dir) :]
-        name = "--".join(name.split(os.sep))
-        print("Copying contents of {}".format(d))
         all_files = get_all_files_in_dir(
             d, ext=all_result_ext, recursive=True, return_absolute=True
         )
         if all_result_ext is None:
             all_files = [
-                f
-                for f in all_files
-                if os.path.splitext(f)[1]
-                in [".png", ".jpg", ".svg", ".png", ".gif", ".tiff"]
+                f for f in all_files if os.path.splitext(f)[1] in IMAGE_EXTENSIONS
             ]
+        for f in all_files:
+            to_merge.append((os.path.relpath(f, in_dir), f))
+
+    manifest = MergeManifest(in_dir)
+    merged = manifest.section("files")
+    existing = set(os.listdir(all_file_loc))
+    counts = {"copied": 0, "linked": 0, "skipped": 0, "removed": 0, "missing": 0}
+    pending = []
+    for rel_name, f in to_merge:
+        o_name = _merged_name(rel_name)
+        key = _stat_key(f)
+        if key is None:
+            # Removed since the directories were listed
+            counts["missing"] += 1
+            continue
+        key = key + [mode]
+        recorded = merged.get(rel_name, None) == key
+        if incremental and recorded and (o_name in existing):
+            counts["skipped"] += 1
+        else:
+            pending.append((rel_name, f, os.path.join(all_file_loc, o_name), key))
+
+    with ThreadPoolExecutor(max_workers=max(num_threads, 1)) as executor:
+        outcomes = executor.map(lambda x: _merge_file(*x[1:3], mode=mode), pending)
+        for (rel_name, _, _, key), outcome in zip(pending, outcomes):
+            counts[outcome] += 1
+            if outcome == "missing":
+                merged.pop(rel_name, None)
+            else:
+                merged[rel_name] = key
+
+    # Files with another extension are kept, only deleted sources are removed
+    current = set(rel_name for rel_name, _ in to_merge)
+    for rel_name in [r for r in merged if r not in current]:
+        if not os.path.isfile(os.path.join(in_dir, rel_name)):
+            o_name = os.path.join(all_file_loc, _merged_name(rel_name))
+            if os.path.lexists(o_name):
+                os.remove(o_name)
+                counts["removed"] += 1
+            del merged[rel_name]
+    manifest.save()
+    print(
+        "Copied {copied}, linked {linked}, and skipped {skipped} unchanged files, "
+        "removed {removed} files of deleted results, "
+        "and left out {missing} files deleted while merging".format(**counts)
+    )
+    return counts
+
 
-        all_names = [
-            "--".join(f[len(in_dir + os.sep) :].split(os.sep)) for f in all_files
-        ]
-        for f, o_name in zip(all_files, all_names):
-            out_name = os.path.join(all_file_loc, o_name)
-            shutil.copy(f, out_name)
+def _merged_name(rel_name):
+    """Return the name in all_results_merged of the file at rel_name."""
+    return "--".join(rel_name.split(os.sep))
+
+
+def _is_merged(src, dst, mode):
+    """Return True if dst is already an up to date merge of src."""
+    try:
+        dst_stat = os.lstat(dst)
+    except FileNotFoundError:
+        return False
+    if stat.S_ISLNK(dst_stat.st_mode):
+        return (mode == "symlink") and (os.readlink(dst) == os.path.abspath(src))
+    if mode == "symlink":
+        return False
+    src_stat = os.stat(src)
+    return (src_stat.st_size == dst_stat.st_size) and (
+        src_stat.st_mtime_ns == dst_stat.st_mtime_ns
+    )
+
+
+def _merge_file(src, dst, mode="copy"):
+    """
+    Copy or link src to dst unless it is unchanged, returning the outcome.
+
+    The outcome is "missing" if src was removed before it could be merged.
+
+    """
+    temp_name = "{}.{}.tmp".format(dst, threading.get_ident())
+    try:
+        if _is_merged(src, dst, mode):
+            return "skipped"
+        outcome = "copied"
+        try:
+            if mode == "symlink":
+                os.symlink(os.path.abspath(src), temp_name)
+                outcome = "linked"
+            elif mode == "hardlink":
+                os.link(src, temp_name)
+                outcome = "linked"
+        except OSError:
+            # Such as hard links to another filesystem, which are copied instead
+            pass
+        if outcome == "copied":
+            # copy2 keeps the modification time, so the copy is skipped next time
+            shutil.copy2(src, temp_name)
+    except FileNotFoundError:
+        if os.path.lexists(temp_name):
+            os.remove(temp_name)
+        return "missing"
+    os.replace(temp_name, dst)
+    return outcome
 
 
-def csv_merge(in_dir, keep_headers=True, insert_newline=True, stats=True, delim=","):
+def csv_merge(
+    in_dir,
+    keep_headers=True,
+    insert_newline=True,
+    stats=True,
+    delim=",",
+    incremental=True,
+):
     """
-    Merge all csv files recursively from in_dir into one file.
+    Merge all csv files recursively from in_dir into in_dir/merge.csv.
+
+    Each file is copied as is, followed by the average and standard
+    deviation of each column from the third onwards if stats is True.
+    Values that are not numbers, such as text or quoted lists, are left out
+    of the statistics.
+
+    The merge manifest of in_dir records where each file is in merge.csv,
+    so merging again only reads new and changed files. New files are
+    appended to merge.csv, and if files changed or were deleted, merge.csv
+    is rewritten from the unchanged parts of the old merge.csv.
+    Everything is merged again if merge.csv changed since the last merge,
+    or if the other arguments are different.
 
     Parameters
     ----------
@@ -74,74 +282,200 @@ def csv_merge(in_dir, keep_headers=True, insert_newline=True, stats=True, delim=
         Do average and std of numerical values, by default True
     delim : str, optional
         What delimiter to use, by default ","
+    incremental : bool, optional
+        Whether to keep the files that the merge manifest records as merged,
+        by default True. If False, every file is merged again.
 
     Returns
     -------
-    None
+    dict
+        The number of files "merged", "skipped", and "removed".
 
     """
-    data_start_col = 2
-    csv_files = get_all_files_in_dir(in_dir, ext="csv", recursive=True)
     o_name = os.path.join(in_dir, "merge.csv")
+    csv_files = {
+        os.path.relpath(f, in_dir): f
+        for f in get_all_files_in_dir(in_dir, ext="csv", recursive=True)
+        if not (
+            f.endswith((TIMING_SUFFIX, MEMORY_SUFFIX))
+            or os.path.abspath(f) == os.path.abspath(o_name)
+        )
+    }
     print("Merging results into {}".format(o_name))
-    if os.path.isfile(o_name):
-        csv_files = csv_files[1:]
-    with open(o_name, "w") as output:
-        for i, f in enumerate(csv_files):
-            print("Merging {}".format(f))
-            with open(f, "r") as open_file:
-                file_data = open_file.read()
-                lines = file_data.split("\n")
-                if keep_headers or (i == 0):
-                    for i, line in enumerate(lines):
-                        output.write(line)
-                        if i != len(lines) - 1:
-                            output.write("\n")
-                else:
-                    for i, line in enumerate(lines[1:]):
-                        output.write(line)
-                        if i != len(lines) - 2:
-                            output.write("\n")
-
-                if stats:
-                    file_data = re.sub('"[^"]+"', "NAN", file_data)
-                    lines = file_data.split("\n")[:-1]
-                    split_up = []
-                    for line in lines[1:]:
-                        if line != "":
-                            split_up.append(line.split(",")[data_start_col:])
-                    data = np.zeros(shape=(len(split_up), len(split_up[0])))
-                    for i, row in enumerate(split_up):
-                        for j, val in enumerate(row):
-                            try:
-                                to_write = float(val.strip())
-                            except BaseException:
-                                to_write = np.nan
-                            data[i, j] = to_write
-                    check = data[-1]
-                    if np.sum(check) == 0:
-                        raise RuntimeError(
-                            "Excel sheet to merge has trailing blank lines"
-                        )
-                    with warnings.catch_warnings():
-                        warnings.filterwarnings(
-                            action="ignore", message="Mean of empty slice"
-                        )
-                        warnings.filterwarnings(
-                            action="ignore",
-                            message="Degrees of freedom <= 0 for slice.",
-                        )
-                        avg = np.nanmean(data, axis=0)
-                        std = np.nanstd(data, axis=0)
-                    avg_str = (
-                        "Average," + "," + ",".join(str(val) for val in avg) + "\n"
-                    )
-                    std_str = "Std," + "," + ",".join(str(val) for val in std) + "\n"
-                    output.write(avg_str)
-                    output.write(std_str)
-
-                if insert_newline:
-                    output.write("\n")
+
+    settings = [keep_headers, insert_newline, stats, delim]
+    manifest = MergeManifest(in_dir)
+    section = manifest.section("csv")
+    entries = section.get("files", {})
+    output_key = _stat_key(o_name)
+    if not (
+        incremental
+        and (output_key is not None)
+        and (section.get("settings", None) == settings)
+        and (section.get("output", None) == output_key)
+    ):
+        entries = {}
+
+    # Files keep their place in merge.csv, and new files are added at the end
+    old_order = sorted(entries, key=lambda r: entries[r]["offset"])
+    order = [r for r in old_order if r in csv_files]
+    order += sorted(r for r in csv_files if r not in entries)
+    blocks = []
+    for i, rel_name in enumerate(order):
+        header = keep_headers or (i == 0)
+        key = _stat_key(csv_files[rel_name])
+        entry = entries.get(rel_name, {})
+        if (entry.get("stat", None) == key) and (entry.get("header", None) == header):
+            blocks.append((rel_name, key, header, None))
+        else:
+            print("Merging {}".format(csv_files[rel_name]))
+            block = _csv_block(
+                csv_files[rel_name], header, stats, delim, insert_newline
+            )
+            blocks.append((rel_name, key, header, block))
+
+    num_kept = 0
+    if order[: len(old_order)] == old_order:
+        while (num_kept < len(old_order)) and (blocks[num_kept][3] is None):
+            num_kept += 1
+    new_entries = {r: entries[r] for r in old_order[:num_kept]}
+    if (num_kept > 0) and (num_kept == len(old_order)):
+        # Only new files, which are appended in place
+        offset = output_key[0]
+        output = open(o_name, "r+b")
+        output.seek(offset)
+        temp_name = None
+    else:
+        num_kept = 0
+        offset = 0
+        old_data = None
+        if any(block is None for _, _, _, block in blocks):
+            with open(o_name, "rb") as f:
+                old_data = f.read()
+        temp_name = o_name + ".tmp"
+        output = open(temp_name, "wb")
+    with output:
+        for rel_name, key, header, block in blocks[num_kept:]:
+            if block is None:
+                start = entries[rel_name]["offset"]
+                block = old_data[start : start + entries[rel_name]["length"]]
+            output.write(block)
+            new_entries[rel_name] = {
+                "stat": key,
+                "header": header,
+                "offset": offset,
+                "length": len(block),
+            }
+            offset += len(block)
+    if temp_name is not None:
+        os.replace(temp_name, o_name)
+
+    section["settings"] = settings
+    section["files"] = new_entries
+    section["output"] = _stat_key(o_name)
+    manifest.save()
+    counts = {
+        "merged": sum(1 for _, _, _, block in blocks if block is not None),
+        "skipped": sum(1 for _, _, _, block in blocks if block is None),
+        "removed": sum(1 for r in old_order if r not in csv_files),
+    }
+    print(
+        "Merged {merged}, skipped {skipped} unchanged, "
+        "and removed {removed} deleted csv files".format(**counts)
+    )
+    return counts
+
+
+def _csv_block(path, header=True, stats=True, delim=",", insert_newline=True):
+    """Return what is written to merge.csv for the csv file at path."""
+    with open(path, "rb") as f:
+        file_data = f.read().replace(b"\r\n", b"\n")
+    parts = [file_data if header else file_data.partition(b"\n")[2]]
+
+    if stats:
+        data = csv_data(file_data.decode("utf-8", errors="replace"), delim=delim)
+        with warnings.catch_warnings():
+            warnings.filterwarnings(action="ignore", message="Mean of empty slice")
+            warnings.filterwarnings(
+                action="ignore",
+                message="Degrees of freedom <= 0 for slice.",
+            )
+            avg = np.nanmean(data, axis=0)
+            std = np.nanstd(data, axis=0)
+        for name, values in (("Average", avg), ("Std", std)):
+            row = delim.join([name, ""] + [str(val) for val in values]) + "\n"
+            parts.append(row.encode("utf-8"))
+
+    if insert_newline:
+        parts.append(b"\n")
+    return b"".join(parts)
+
+
+def csv_data(csv_text, data_start_col=2, delim=","):
+    """
+    Return the numbers in the rows of a csv file after its header.
+
+    Parameters
+    ----------
+    csv_text : str
+        The contents of the csv file.
+    data_start_col : int, optional
+        The first column to return, by default 2,
+        after the recording and name columns.
+    delim : str, optional
+        The delimiter of the file, by default ",".
+
+    Returns
+    -------
+    numpy.ndarray
+        A 2D float array with a row for each non blank row of the file, and
+        a column for each field of the first row from data_start_col.
+        Fields that are not numbers are NaN.
+
+    """
+    first_row = csv_text.split("\n", 2)[1:2]
+    num_cols = first_row[0].count(delim) + 1 if first_row else 0
+    if _FAST_LOADTXT and ('"' not in csv_text) and (num_cols > data_start_col):
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("error")
+                return np.loadtxt(
+                    io.StringIO(csv_text),
+                    delimiter=delim,
+                    skiprows=1,
+                    usecols=range(data_start_col, num_cols),
+                    comments=None,
+                    ndmin=2,
+                )
+        except (ValueError, UserWarning):
+            # Not all numbers, or rows of different lengths
+            pass
+
+    import pandas as pd
+
+    try:
+        frame = pd.read_csv(
+            io.StringIO(csv_text),
+            sep=delim,
+            header=None,
+            skiprows=1,
+            float_precision="round_trip",
+        )
+    except pd.errors.EmptyDataError:
+        return np.zeros(shape=(0, 0))
+    columns = []
+    for _, column in frame.iloc[:, data_start_col:].items():
+        if column.dtype.kind in "iuf":
+            columns.append(column.to_numpy(dtype=float))
+        elif column.dtype.kind == "O":
+            # Mixed columns, or numbers with spaces around them
+            values = pd.to_numeric(column.str.strip(), errors="coerce")
+            columns.append(values.to_numpy(dtype=float))
+        else:
+            columns.append(np.full(len(column), np.nan))
+    if len(columns) == 0:
+        return np.zeros(shape=(len(frame), 0))
+    return np.stack(columns, axis=1)
 
 
 def cli():
@@ -161,6 +495,24 @@ def cli():
         default=None,
         help="the image extension to look for (without .)",
     )
+    parser.add_argument(
+        "--mode",
+        type=str,
+        choices=MERGE_MODES,
+        default="copy",
+        help="whether to copy, hard link, or symbolic link merged images",
+    )
+    parser.add_argument(
+        "--num_threads",
+        type=int,
+        default=8,
+        help="the number of images to merge at once, default is 8",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="merge every file again, not only new and changed files",
+    )
 
     parsed, unparsed = parser.parse_known_args()
     if len(unparsed) > 0:
@@ -168,11 +520,17 @@ def cli():
 
     if parsed.do_csv:
         print("----------CSV MERGE-----------")
-        csv_merge(parsed.directory)
+        csv_merge(parsed.directory, incremental=not parsed.full)
 
     if parsed.do_images:
         print("----------IMAGE MERGE-----------")
-        merge_files(parsed.directory, all_result_ext=parsed.image_extension)
+        merge_files(
+            parsed.directory,
+            all_result_ext=parsed.image_extension,
+            mode=parsed.mode,
+            num_threads=parsed.num_threads,
+            incremental=not parsed.full,
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,362 @@
+"""
+This module runs tasks through an asyncio pipeline of I/O, CPU, and output stages.
+
+The I/O stage reads the raw files of a task in threads, which brings them
+into the operating system file cache while earlier tasks are analysed.
+The CPU stage runs the analysis in a pool of worker processes,
+and the output stage handles the results in threads.
+Each stage has its own concurrency, and the stages are connected by
+bounded queues, so the I/O stage can not read too far ahead of the analysis.
+"""
+
+import time
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from simuran.main.memory_scheduler import iter_source_files
+from simuran.main.worker_pool import apply_async
+from simuran.tracer import traced
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+_DONE = object()
+
+
+@traced("io")
+def read_source_files(source_files, chunk_size=READ_CHUNK_SIZE):
+    """
+    Read all of the files in source_files from disk.
+
+    The contents are discarded, this is used to bring the files
+    into the operating system file cache before they are loaded.
+
+    Parameters
+    ----------
+    source_files : str or list or dict
+        A filename, or a (possibly nested) list or dictionary of filenames,
+        such as simuran.recording.Recording.source_files.
+    chunk_size : int, optional
+        The number of bytes to read at once, by default READ_CHUNK_SIZE.
+
+    Returns
+    -------
+    int
+        The number of bytes read.
+
+    """
+    num_bytes = 0
+    for fname in iter_source_files(source_files):
+        with open(fname, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                num_bytes += len(chunk)
+    return num_bytes
+
+
+class StageMetrics(object):
+    """
+    Metrics on a single stage of an AsyncPipeline.
+
+    Attributes
+    ----------
+    name : str
+        The name of the stage.
+    concurrency : int
+        The number of tasks the stage runs at once.
+    num_items : int
+        The number of tasks completed by the stage.
+    busy_time : float
+        The total time in seconds spent running tasks in the stage.
+    max_queue_depth : int
+        The largest number of tasks seen waiting for this stage.
+    mean_queue_depth : float
+        The average number of tasks seen waiting for this stage.
+
+    """
+
+    def __init__(self, name, concurrency):
+        """See help(StageMetrics)."""
+        self.name = name
+        self.concurrency = concurrency
+        self.num_items = 0
+        self.busy_time = 0.0
+        self.max_queue_depth = 0
+        self._depth_total = 0
+        self._depth_samples = 0
+
+    @property
+    def mean_queue_depth(self):
+        if self._depth_samples == 0:
+            return 0.0
+        return self._depth_total / self._depth_samples
+
+    def record_queue_depth(self, depth):
+        """Record the number of tasks waiting for this stage."""
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        self._depth_total += depth
+        self._depth_samples += 1
+
+    def utilisation(self, wall_time):
+        """Return the fraction of wall_time the stage workers were busy."""
+        if wall_time <= 0:
+            return 0.0
+        return self.busy_time / (wall_time * self.concurrency)
+
+    def __str__(self):
+        """Call on print."""
+        return (
+            "{}: {} workers, {} items, {:.2f}s busy, "
+            "queue depth max {} mean {:.2f}".format(
+                self.name,
+                self.concurrency,
+                self.num_items,
+                self.busy_time,
+                self.max_queue_depth,
+                self.mean_queue_depth,
+            )
+        )
+
+
+class AsyncPipeline(object):
+    """
+    Run tasks through I/O, CPU, and output stages concurrently.
+
+    Attributes
+    ----------
+    metrics : collections.OrderedDict
+        The simuran.main.pipeline.StageMetrics of the io, cpu, and output stages.
+    wall_time : float
+        The time in seconds the last call to run took.
+
+    Parameters
+    ----------
+    cpu_fn : function
+        Called as cpu_fn(*task) in the CPU stage.
+        This must be importable by the workers if pool is passed.
+    io_fn : function, optional
+        Called as io_fn(task) in a thread in the I/O stage, by default None.
+    output_fn : function, optional
+        Called with the return value of cpu_fn in a thread in the output stage,
+        by default None.
+    pool : multiprocessing.pool.Pool, optional
+        The pool from simuran.main.worker_pool.get_worker_pool to run
+        cpu_fn in, by default None, which runs cpu_fn in threads.
+    io_concurrency : int, optional
+        The number of tasks to read at once, by default 2.
+    cpu_concurrency : int, optional
+        The number of tasks to analyse at once, by default 1.
+        This should match the number of workers in pool.
+    output_concurrency : int, optional
+        The number of results to handle at once, by default 1.
+    queue_depth : int, optional
+        The number of tasks that can wait between each stage, by default 2.
+    can_start : function, optional
+        Called as can_start(task, running) with the tasks in the CPU stage,
+        the task is only analysed once this returns True, by default None.
+        This must return True when no tasks are running.
+
+    """
+
+    def __init__(
+        self,
+        cpu_fn,
+        io_fn=None,
+        output_fn=None,
+        pool=None,
+        io_concurrency=2,
+        cpu_concurrency=1,
+        output_concurrency=1,
+        queue_depth=2,
+        can_start=None,
+    ):
+        """See help(AsyncPipeline)."""
+        self.cpu_fn = cpu_fn
+        self.io_fn = io_fn
+        self.output_fn = output_fn
+        self.pool = pool
+        self.can_start = can_start
+        self.queue_depth = max(1, queue_depth)
+        self.metrics = OrderedDict()
+        for name, concurrency in (
+            ("io", io_concurrency),
+            ("cpu", cpu_concurrency),
+            ("output", output_concurrency),
+        ):
+            self.metrics[name] = StageMetrics(name, max(1, concurrency))
+        self.wall_time = 0.0
+
+    def run(self, tasks):
+        """
+        Run all of the tasks through the pipeline.
+
+        Parameters
+        ----------
+        tasks : iterable of tuple
+            The arguments to cpu_fn for each task, started in this order.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        Exception
+            The first exception raised in any stage.
+
+        """
+        loop = asyncio.new_event_loop()
+        executors = {
+            name: ThreadPoolExecutor(max_workers=self.metrics[name].concurrency)
+            for name in ("io", "cpu", "output")
+        }
+        start_time = time.monotonic()
+        try:
+            loop.run_until_complete(self._run(loop, executors, iter(tasks)))
+        finally:
+            self.wall_time = time.monotonic() - start_time
+            for executor in executors.values():
+                executor.shutdown(wait=True)
+            loop.close()
+
+    def print_metrics(self):
+        """Print the metrics of each stage."""
+        print("Pipeline stage metrics over {:.2f}s:".format(self.wall_time))
+        for metrics in self.metrics.values():
+            print(
+                "    {} ({:.0%} utilised)".format(
+                    metrics, metrics.utilisation(self.wall_time)
+                )
+            )
+
+    async def _run(self, loop, executors, tasks):
+        cpu_queue = asyncio.Queue(maxsize=self.queue_depth)
+        output_queue = asyncio.Queue(maxsize=self.queue_depth)
+        # The tasks in the CPU stage, by id as tasks may not be hashable
+        running = {}
+        running_changed = asyncio.Condition()
+
+        async def timed(name, awaitable):
+            start_time = time.monotonic()
+            result = await awaitable
+            self.metrics[name].busy_time += time.monotonic() - start_time
+            self.metrics[name].num_items += 1
+            return result
+
+        async def put(name, queue, item):
+            await queue.put(item)
+            self.metrics[name].record_queue_depth(queue.qsize())
+
+        async def io_worker():
+            for task in tasks:
+                if self.io_fn is not None:
+                    await timed(
+                        "io", loop.run_in_executor(executors["io"], self.io_fn, task)
+                    )
+                else:
+                    self.metrics["io"].num_items += 1
+                await put("cpu", cpu_queue, task)
+
+        async def cpu_worker():
+            while True:
+                task = await cpu_queue.get()
+                if task is _DONE:
+                    return
+                if self.can_start is not None:
+                    async with running_changed:
+                        await running_changed.wait_for(
+                            lambda: self.can_start(task, list(running.values()))
+                        )
+                        running[id(task)] = task
+                try:
+                    if self.pool is None:
+                        future = loop.run_in_executor(
+                            executors["cpu"], self.cpu_fn, *task
+                        )
+                    else:
+                        future = self._apply(loop, task)
+                    result = await timed("cpu", future)
+                finally:
+                    if self.can_start is not None:
+                        async with running_changed:
+                            running.pop(id(task), None)
+                            running_changed.notify_all()
+                await put("output", output_queue, result)
+
+        async def output_worker():
+            while True:
+                result = await output_queue.get()
+                if result is _DONE:
+                    return
+                if self.output_fn is not None:
+                    await timed(
+                        "output",
+                        loop.run_in_executor(
+                            executors["output"], self.output_fn, result
+                        ),
+                    )
+                else:
+                    self.metrics["output"].num_items += 1
+
+        io_workers = [
+            loop.create_task(io_worker())
+            for _ in range(self.metrics["io"].concurrency)
+        ]
+        cpu_workers = [
+            loop.create_task(cpu_worker())
+            for _ in range(self.metrics["cpu"].concurrency)
+        ]
+        output_workers = [
+            loop.create_task(output_worker())
+            for _ in range(self.metrics["output"].concurrency)
+        ]
+
+        async def close_stages():
+            await asyncio.gather(*io_workers)
+            for _ in cpu_workers:
+                await cpu_queue.put(_DONE)
+            await asyncio.gather(*cpu_workers)
+            for _ in output_workers:
+                await output_queue.put(_DONE)
+            await asyncio.gather(*output_workers)
+
+        all_tasks = io_workers + cpu_workers + output_workers
+        all_tasks.append(loop.create_task(close_stages()))
+        done, pending = await asyncio.wait(
+            all_tasks, return_when=asyncio.FIRST_EXCEPTION
+        )
+        for task in pending:
+            task.cancel()
+        if len(pending) > 0:
+            await asyncio.wait(pending)
+        for task in done:
+            if (not task.cancelled()) and (task.exception() is not None):
+                raise task.exception()
+
+    def _apply(self, loop, task):
+        """Run cpu_fn(*task) in the worker pool, returning an asyncio future."""
+        future = loop.create_future()
+
+        def set_result(value):
+            if not future.done():
+                future.set_result(value)
+
+        def set_exception(e):
+            if not future.done():
+                future.set_exception(e)
+
+        def call_in_loop(fn, value):
+            # The loop is closed if another stage failed first
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(fn, value)
+
+        apply_async(
+            self.pool,
+            self.cpu_fn,
+            task,
+            callback=lambda value: call_in_loop(set_result, value),
+            error_callback=lambda e: call_in_loop(set_exception, e),
+        )
+        return future
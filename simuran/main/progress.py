@@ -0,0 +1,372 @@
+"""
+This module reports the progress of runs, across worker processes.
+
+Recordings and batch iterations report when they start and finish with
+report_progress. In the main process these events go straight to the active
+ProgressReporter. Workers of simuran.main.worker_pool send them to the main
+process through a queue created with the pool, so recordings finished in
+any worker are counted as they finish.
+The reporter shows a progress bar with the rate, the megabytes of recording
+files analysed per second and the time left, and can save the same
+information as JSON to a status file for dashboards.
+"""
+
+import os
+import json
+import time
+import socket
+import threading
+from contextlib import contextmanager
+
+_reporter = None
+# In the main process, the queue that workers of the pool send events to
+_pool_queue = None
+# In workers, the queue of the pool, and whether the main process is listening
+_worker_queue = None
+_queue = None
+
+
+def make_progress_queue(context):
+    """
+    Create the queue that workers of a new pool send progress events to.
+
+    Events are written to the queue before the task returns, so they
+    always reach the main process before the result of the task.
+
+    Parameters
+    ----------
+    context : multiprocessing.context.BaseContext
+        The context the pool is started with.
+
+    Returns
+    -------
+    multiprocessing.queues.SimpleQueue
+        The queue, to be passed to set_progress_queue in each worker.
+
+    """
+    global _pool_queue
+    _pool_queue = context.SimpleQueue()
+    return _pool_queue
+
+
+def drop_progress_queue():
+    """Stop reading the queue of a pool that has been shut down."""
+    global _pool_queue
+    _pool_queue = None
+
+
+def set_progress_queue(progress_queue):
+    """Keep the queue of the pool in a worker, called when the worker starts."""
+    global _worker_queue
+    _worker_queue = progress_queue
+
+
+def set_progress_enabled(enabled):
+    """Send events to the main process if enabled, called before each task."""
+    global _queue
+    _queue = _worker_queue if enabled else None
+
+
+def progress_enabled():
+    """Return True if progress events are being counted by this process."""
+    return _reporter is not None
+
+
+def report_progress(kind, unit, key="", value=0, ok=True):
+    """
+    Report the start or finish of a task, or the number of tasks to run.
+
+    Does nothing if no reporter is counting the events.
+
+    Parameters
+    ----------
+    kind : str
+        "total" to add value tasks to the total of unit,
+        "start" when the task called key starts,
+        or "finish" when it finishes.
+    unit : str
+        The kind of task, for example "recordings" or "iterations".
+    key : str, optional
+        The name of the task, by default "".
+    value : int, optional
+        The number of tasks for "total", or for "finish" the bytes
+        of recording files the task analysed, by default 0.
+    ok : bool, optional
+        For "finish", False if the task failed, by default True.
+
+    Returns
+    -------
+    None
+
+    """
+    event = (kind, unit, key, value, ok, os.getpid(), time.time())
+    if _reporter is not None:
+        _reporter.handle(event)
+    elif _queue is not None:
+        _queue.put(event)
+
+
+@contextmanager
+def tracking(unit, key, nbytes=0):
+    """Report the start of key, and its finish when the with statement ends."""
+    report_progress("start", unit, key)
+    try:
+        yield
+    except BaseException:
+        report_progress("finish", unit, key, ok=False)
+        raise
+    report_progress("finish", unit, key, nbytes)
+
+
+class ProgressReporter(object):
+    """
+    Count the tasks that finish in this process and in workers of the pool.
+
+    The first unit given a total, such as "iterations" in a batch run,
+    is the main unit that the progress bar and time left are shown for.
+    A task that is retried is counted once, with its last outcome.
+
+    Attributes
+    ----------
+    status_file : str or None
+        The JSON file the output of summary is saved to while running.
+    interval : float
+        The seconds between saves of the status file.
+    show : bool
+        Whether to show a progress bar.
+    main_unit : str or None
+        The unit that the time left is estimated for.
+    totals : dict
+        The number of tasks of each unit to run.
+    finished : dict
+        For each unit, whether each finished task succeeded, by name.
+    nbytes : int
+        The bytes of recording files of the finished tasks.
+    running : dict
+        For each process, the (name, start time) of its tasks of each unit.
+
+    Parameters
+    ----------
+    status_file : str, optional
+        See Attributes, by default None.
+    interval : float, optional
+        See Attributes, by default 2.0.
+    show : bool, optional
+        See Attributes, by default True.
+
+    """
+
+    def __init__(self, status_file=None, interval=2.0, show=True):
+        """See help(ProgressReporter)."""
+        self.status_file = status_file
+        self.interval = interval
+        self.show = show
+        self.main_unit = None
+        self.totals = {}
+        self.finished = {}
+        self.nbytes = 0
+        self.running = {}
+        self.state = "running"
+        self.start_time = time.time()
+        self._bar = None
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start reading events from workers in a background thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen, daemon=True)
+        self._thread.start()
+
+    def close(self, state="finished"):
+        """Read the remaining events, then save the status file with state."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        while self._receive():
+            pass
+        with self._lock:
+            self.state = state
+            if self._bar is not None:
+                self._bar.close()
+                self._bar = None
+        if self.status_file is not None:
+            self.write_status()
+
+    def handle(self, event):
+        """Count an event from report_progress."""
+        kind, unit, key, value, ok, pid, when = event
+        with self._lock:
+            if kind == "total":
+                self.totals[unit] = self.totals.get(unit, 0) + value
+                if self.main_unit is None:
+                    self.main_unit = unit
+            elif kind == "start":
+                self.running.setdefault(pid, {})[unit] = (key, when)
+            elif kind == "finish":
+                self.finished.setdefault(unit, {})[key] = ok
+                self.nbytes += value
+                # The task may have been started by a worker that died
+                for tasks in self.running.values():
+                    if tasks.get(unit, ("",))[0] == key:
+                        del tasks[unit]
+                self.running = {p: t for p, t in self.running.items() if t}
+            self._update_bar()
+
+    def summary(self):
+        """
+        Return the progress so far.
+
+        Returns
+        -------
+        dict
+            "units" holds the total, completed, failed, and completed per second
+            of each unit. "eta_seconds" is the estimated time left for the
+            main unit, or None, and "running" lists the task of each unit
+            running in each process.
+
+        """
+        with self._lock:
+            now = time.time()
+            elapsed = now - self.start_time
+            units = {}
+            for unit in sorted(set(self.totals) | set(self.finished)):
+                outcomes = self.finished.get(unit, {})
+                completed = sum(1 for ok in outcomes.values() if ok)
+                units[unit] = {
+                    "total": self.totals.get(unit, None),
+                    "completed": completed,
+                    "failed": len(outcomes) - completed,
+                    "per_second": completed / elapsed if elapsed > 0 else 0.0,
+                }
+            eta = None
+            main = units.get(self.main_unit, None)
+            if (main is not None) and (main["per_second"] > 0):
+                remaining = main["total"] - main["completed"] - main["failed"]
+                eta = max(remaining, 0) / main["per_second"]
+            running = [
+                {"pid": pid, "unit": unit, "task": key, "seconds": now - since}
+                for pid, tasks in sorted(self.running.items())
+                for unit, (key, since) in sorted(tasks.items())
+            ]
+            return {
+                "state": self.state,
+                "host": socket.gethostname(),
+                "pid": os.getpid(),
+                "started": self.start_time,
+                "updated": now,
+                "elapsed_seconds": elapsed,
+                "main_unit": self.main_unit,
+                "units": units,
+                "mb_per_second": self.nbytes / (1024 ** 2) / elapsed
+                if elapsed > 0
+                else 0.0,
+                "eta_seconds": eta,
+                "running": running,
+            }
+
+    def write_status(self):
+        """Atomically save the output of summary to status_file as JSON."""
+        status_dir = os.path.dirname(os.path.abspath(self.status_file))
+        os.makedirs(status_dir, exist_ok=True)
+        temp_name = self.status_file + ".tmp"
+        with open(temp_name, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+        os.replace(temp_name, self.status_file)
+
+    def _update_bar(self):
+        if (not self.show) or (self.main_unit is None):
+            return
+        total = self.totals[self.main_unit]
+        if self._bar is None:
+            from tqdm import tqdm
+
+            self._bar = tqdm(total=total, unit=" " + self.main_unit)
+        elif self._bar.total != total:
+            self._bar.total = total
+        outcomes = self.finished.get(self.main_unit, {})
+        elapsed = time.time() - self.start_time
+        postfix = []
+        if elapsed > 0:
+            postfix.append("{:.1f} MB/s".format(self.nbytes / (1024 ** 2) / elapsed))
+        num_failed = sum(1 for ok in outcomes.values() if not ok)
+        if num_failed > 0:
+            postfix.append("{} failed".format(num_failed))
+        if (self.main_unit != "recordings") and ("recordings" in self.finished):
+            postfix.append("{} recordings".format(len(self.finished["recordings"])))
+        tasks = [
+            key
+            for running in self.running.values()
+            for unit, (key, _) in running.items()
+            if unit == self.main_unit
+        ]
+        if len(tasks) == 1:
+            postfix.append("on {}".format(os.path.basename(tasks[0])))
+        elif len(tasks) > 1:
+            postfix.append("{} running".format(len(tasks)))
+        self._bar.set_postfix_str(", ".join(postfix), refresh=False)
+        self._bar.update(len(outcomes) - self._bar.n)
+
+    def _receive(self):
+        """Handle one event from the queue of the pool, if there is one."""
+        progress_queue = _pool_queue
+        try:
+            if (progress_queue is None) or progress_queue.empty():
+                return False
+            event = progress_queue.get()
+        except (OSError, EOFError, ValueError):
+            # The pool was shut down while reading
+            return False
+        self.handle(event)
+        return True
+
+    def _listen(self):
+        last_write = 0.0
+        while not self._stop.is_set():
+            if not self._receive():
+                self._stop.wait(0.05)
+            if (self.status_file is not None) and (
+                time.time() - last_write >= self.interval
+            ):
+                self.write_status()
+                last_write = time.time()
+
+
+@contextmanager
+def reporting(status_file=None, show=True):
+    """
+    Report progress during the body of a with statement.
+
+    Inside another reporting block, or in a worker process, events are
+    counted by the existing reporter and the arguments are not used.
+
+    Parameters
+    ----------
+    status_file : str, optional
+        The JSON file to save progress to every few seconds,
+        by default None, which does not save progress.
+    show : bool, optional
+        Whether to show a progress bar, by default True.
+
+    Yields
+    ------
+    simuran.main.progress.ProgressReporter or None
+        The reporter, or None in a worker process.
+
+    """
+    global _reporter
+    if (_reporter is not None) or (_queue is not None):
+        yield _reporter
+        return
+    reporter = ProgressReporter(status_file, show=show)
+    reporter.start()
+    _reporter = reporter
+    state = "failed"
+    try:
+        yield reporter
+        state = "finished"
+    finally:
+        _reporter = None
+        reporter.close(state)
@@ -0,0 +1,168 @@
+"""This module streams the summary results of a run to csv as recordings finish."""
+
+import os
+import csv
+
+
+def summary_fieldnames(key_lists):
+    """
+    Return the csv columns that skm_pyutils.py_save.save_dicts_to_csv would use.
+
+    The keys of the first row with the most keys come first,
+    followed by any other keys in the order they are first seen.
+
+    Parameters
+    ----------
+    key_lists : list of list of str
+        The keys of each row, in row order.
+
+    Returns
+    -------
+    list of str
+        The column names.
+
+    """
+    if len(key_lists) == 0:
+        return []
+    fieldnames = list(key_lists[0])
+    for keys in key_lists:
+        if len(keys) > len(fieldnames):
+            fieldnames = list(keys)
+    for keys in key_lists:
+        for key in keys:
+            if key not in fieldnames:
+                fieldnames.append(key)
+    return fieldnames
+
+
+class StreamingResultWriter(object):
+    """
+    Write one row of a summary csv per recording as soon as it is analysed.
+
+    Each row is flushed and synced to disk when it is added,
+    so the rows of finished recordings are kept if the run fails.
+    If a row has keys that are not yet columns of the file,
+    the file is rewritten with the new columns.
+    On finalize, the file is rewritten with the rows in container order,
+    which is identical to the file written by
+    simuran.base_container.AbstractContainer.save_summary_data.
+
+    Attributes
+    ----------
+    location : str
+        The path to the csv file.
+    fieldnames : list of str
+        The current columns of the csv file.
+
+    Parameters
+    ----------
+    location : str
+        The path to the csv file, any existing file is overwritten.
+    container : simuran.base_container.AbstractContainer
+        The container holding the recordings.
+    attr_list : list of tuples
+        The attributes to save.
+    friendly_names : list of str, optional
+        The names of the attributes to save, by default None
+    decimals : int, optional
+        The number of decimal places to save outputs with, by default 3
+
+    """
+
+    def __init__(
+        self, location, container, attr_list, friendly_names=None, decimals=3
+    ):
+        """See help(StreamingResultWriter)."""
+        self.location = location
+        self.container = container
+        self.attr_list = attr_list
+        self.friendly_names = friendly_names
+        self.decimals = decimals
+        self.fieldnames = []
+        self._row_keys = {}
+        self._file_order = []
+        if os.path.isfile(location):
+            os.remove(location)
+
+    def add(self, idx):
+        """
+        Append the summary row of the recording at idx to the file.
+
+        Parameters
+        ----------
+        idx : int
+            The index of the recording in the container.
+
+        Returns
+        -------
+        None
+
+        """
+        row = self.container.summary_data(
+            self.attr_list,
+            friendly_names=self.friendly_names,
+            idx=idx,
+            decimals=self.decimals,
+        )
+        new_keys = [key for key in row.keys() if key not in self.fieldnames]
+        if len(self._file_order) == 0:
+            self.fieldnames = list(row.keys())
+            self._rewrite({}, [], self.fieldnames)
+        elif len(new_keys) > 0:
+            rows = self._read_rows()
+            self.fieldnames = self.fieldnames + new_keys
+            self._rewrite(rows, self._file_order, self.fieldnames)
+
+        with open(self.location, "a", newline="") as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=self.fieldnames)
+            writer.writerow(row)
+            csvfile.flush()
+            os.fsync(csvfile.fileno())
+        self._row_keys[idx] = list(row.keys())
+        self._file_order.append(idx)
+
+    def finalize(self):
+        """
+        Rewrite the file with the rows and columns in their final order.
+
+        Returns
+        -------
+        None
+
+        """
+        if len(self._file_order) == 0:
+            return
+        print("Saving summary data to {}".format(self.location))
+        order = sorted(self._file_order)
+        fieldnames = summary_fieldnames([self._row_keys[i] for i in order])
+        self._rewrite(self._read_rows(), order, fieldnames)
+        self.fieldnames = fieldnames
+
+    def _read_rows(self):
+        """Return the rows in the file, keyed by recording index."""
+        with open(self.location, "r", newline="") as csvfile:
+            reader = csv.reader(csvfile)
+            next(reader)
+            rows = {}
+            for idx, values in zip(self._file_order, reader):
+                rows[idx] = dict(zip(self.fieldnames, values))
+        return rows
+
+    def _rewrite(self, rows, order, fieldnames):
+        """Atomically replace the file with rows in order under fieldnames."""
+        dirname = os.path.dirname(os.path.abspath(self.location))
+        os.makedirs(dirname, exist_ok=True)
+        temp_name = self.location + ".tmp"
+        try:
+            with open(temp_name, "w", newline="") as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+                writer.writerow({k: k.replace(" ", "_") for k in fieldnames})
+                for idx in order:
+                    writer.writerow(rows[idx])
+                csvfile.flush()
+                os.fsync(csvfile.fileno())
+            os.replace(temp_name, self.location)
+        except BaseException:
+            if os.path.isfile(temp_name):
+                os.remove(temp_name)
+            raise
@@ -0,0 +1,415 @@
+"""
+This module saves the results of every run to a SQLite database.
+
+Each finished recording adds a row per function result to the "results"
+table, with the recording, function, argument set, key, value, run id and
+time, see simuran.main.table_store.result_rows for the tidy form.
+The "runs" table holds the batch and function config of each run.
+Rows are written in batches, each in one transaction, so runs in parallel
+processes can write to the same database. The database should be on a
+local disk, as SQLite locking is not reliable on network filesystems.
+query_results returns the results of any number of runs as a DataFrame,
+and is also available from the command line as simuran results.
+"""
+
+import os
+import sys
+import time
+import uuid
+import socket
+import sqlite3
+import argparse
+from datetime import datetime
+
+from simuran.main.table_store import result_rows
+
+RESULT_COLUMNS = (
+    "run_id",
+    "recording",
+    "function",
+    "args",
+    "key",
+    "value",
+    "text",
+    "timestamp",
+)
+RUN_COLUMNS = ("run_id", "batch", "function_config", "host", "started")
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS runs ("
+    "run_id TEXT PRIMARY KEY, batch TEXT, function_config TEXT, "
+    "host TEXT, started TEXT)",
+    "CREATE TABLE IF NOT EXISTS results ("
+    "run_id TEXT, recording TEXT, function TEXT, args TEXT, "
+    "key TEXT, value REAL, text TEXT, timestamp TEXT)",
+    "CREATE INDEX IF NOT EXISTS results_recording ON results (recording)",
+    "CREATE INDEX IF NOT EXISTS results_function ON results (function)",
+    "CREATE INDEX IF NOT EXISTS results_run_id ON results (run_id)",
+)
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def new_run_id():
+    """Return a run id that is unique across processes and machines."""
+    started = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return "{}-{}".format(started, uuid.uuid4().hex[:8])
+
+
+def connect(location, timeout=60.0):
+    """
+    Open the database at location, creating its tables if needed.
+
+    Parameters
+    ----------
+    location : str
+        The path to the database file.
+    timeout : float, optional
+        The seconds to wait for other processes to finish writing,
+        by default 60.0.
+
+    Returns
+    -------
+    sqlite3.Connection
+        The connection, which commits only when asked to.
+
+    """
+    dirname = os.path.dirname(os.path.abspath(location))
+    os.makedirs(dirname, exist_ok=True)
+    # Connections may be used from other threads, which callers must serialise
+    connection = sqlite3.connect(
+        location, timeout=timeout, isolation_level=None, check_same_thread=False
+    )
+    # Readers do not block writers, and writers only block each other
+    _retry(connection.execute, "PRAGMA journal_mode=WAL")
+    _retry(_write, connection, [(statement, None) for statement in _SCHEMA])
+    return connection
+
+
+def _write(connection, statements):
+    """Run (sql, rows) statements in one transaction, rows None for execute."""
+    # Take the write lock at the start, so no other writer can go first
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        for sql, rows in statements:
+            if rows is None:
+                connection.execute(sql)
+            else:
+                connection.executemany(sql, rows)
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+
+def _retry(fn, *args, retries=5):
+    """Call fn, retrying if the database stays locked past the timeout."""
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args)
+        except sqlite3.OperationalError as e:
+            if ("locked" not in str(e)) or (attempt == retries):
+                raise
+            time.sleep(0.1 * 2 ** attempt)
+
+
+class ResultsDatabase(object):
+    """
+    Write the results of a run to a SQLite database as recordings finish.
+
+    Rows are kept in memory until batch_size rows are waiting, interval
+    seconds have passed since the last write, or flush or close is called,
+    and are then written in one transaction.
+    Calls from more than one thread must be serialised by the caller.
+
+    Attributes
+    ----------
+    location : str
+        The path to the database file.
+    run_id : str
+        The id of the run the results are saved under.
+    batch_size : int
+        The number of rows to write at once.
+    interval : float
+        The most seconds that rows are kept in memory for.
+    num_rows : int
+        The number of rows written so far.
+
+    Parameters
+    ----------
+    location : str
+        See Attributes.
+    batch : str, optional
+        The name of the batch config of the run, by default "".
+    function_config : str, optional
+        The name of the function config of the run, by default "".
+    run_id : str, optional
+        See Attributes, by default None, which creates a new id.
+    batch_size : int, optional
+        See Attributes, by default 5000.
+    interval : float, optional
+        See Attributes, by default 10.0.
+    timeout : float, optional
+        The seconds to wait for other processes to finish writing,
+        by default 60.0.
+
+    """
+
+    def __init__(
+        self,
+        location,
+        batch="",
+        function_config="",
+        run_id=None,
+        batch_size=5000,
+        interval=10.0,
+        timeout=60.0,
+    ):
+        """See help(ResultsDatabase)."""
+        self.location = location
+        self.run_id = new_run_id() if run_id is None else run_id
+        self.batch_size = batch_size
+        self.interval = interval
+        self.num_rows = 0
+        self._rows = []
+        self._last_write = time.monotonic()
+        self._connection = connect(location, timeout=timeout)
+        run = (self.run_id, batch, function_config, socket.gethostname(), _now())
+        sql = "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?)"
+        _retry(_write, self._connection, [(sql, [run])])
+
+    def add(self, recording):
+        """
+        Add the results of a recording, writing the waiting rows if needed.
+
+        The argument set of each result is taken from the argument_sets
+        attribute of the recording, if it has one, as set by
+        simuran.main.main.run_all_analysis.
+
+        Parameters
+        ----------
+        recording : simuran.recording.Recording
+            The recording, with its results.
+
+        Returns
+        -------
+        None
+
+        """
+        argument_sets = getattr(recording, "argument_sets", {})
+        timestamp = _now()
+        for function, key, value, text in result_rows(recording):
+            self._rows.append(
+                (
+                    self.run_id,
+                    recording.source_file,
+                    function,
+                    argument_sets.get(function, ""),
+                    key,
+                    value,
+                    text,
+                    timestamp,
+                )
+            )
+        if (len(self._rows) >= self.batch_size) or (
+            time.monotonic() - self._last_write >= self.interval
+        ):
+            self.flush()
+
+    def flush(self):
+        """Write the waiting rows in one transaction."""
+        if len(self._rows) == 0:
+            return
+        sql = "INSERT INTO results VALUES ({})".format(
+            ", ".join("?" * len(RESULT_COLUMNS))
+        )
+        _retry(_write, self._connection, [(sql, self._rows)])
+        self.num_rows += len(self._rows)
+        self._rows = []
+        self._last_write = time.monotonic()
+
+    def close(self):
+        """Write the waiting rows and close the database."""
+        if self._connection is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self._connection.close()
+            self._connection = None
+
+
+def _where(filters):
+    """Return the WHERE clause and parameters matching each glob pattern."""
+    clauses, params = [], []
+    for column, pattern in filters:
+        if pattern is not None:
+            clauses.append("{} GLOB ?".format(column))
+            params.append(pattern)
+    if len(clauses) == 0:
+        return "", params
+    return " WHERE " + " AND ".join(clauses), params
+
+
+def query_results(
+    location,
+    recording=None,
+    function=None,
+    key=None,
+    run_id=None,
+    batch=None,
+    function_config=None,
+):
+    """
+    Return the results saved in a database as a tidy DataFrame.
+
+    Each filter is a glob pattern, such as "*rate*", or an exact value.
+    Filters that are None match everything.
+
+    Parameters
+    ----------
+    location : str
+        The path to the database file.
+    recording : str, optional
+        The recording source files to return, by default None.
+    function : str, optional
+        The function names to return, by default None.
+    key : str, optional
+        The result keys to return, by default None.
+    run_id : str, optional
+        The run ids to return, by default None.
+    batch : str, optional
+        The batch config names to return, by default None.
+    function_config : str, optional
+        The function config names to return, by default None.
+
+    Returns
+    -------
+    pandas.DataFrame
+        A row per result, with the columns in RESULT_COLUMNS followed by
+        "batch" and "function_config", ordered as saved.
+
+    Raises
+    ------
+    FileNotFoundError
+        If there is no database at location.
+
+    """
+    import pandas as pd
+
+    if not os.path.isfile(location):
+        raise FileNotFoundError("No results database at {}".format(location))
+    where, params = _where(
+        [
+            ("results.recording", recording),
+            ("results.function", function),
+            ("results.key", key),
+            ("results.run_id", run_id),
+            ("runs.batch", batch),
+            ("runs.function_config", function_config),
+        ]
+    )
+    sql = (
+        "SELECT {}, runs.batch, runs.function_config FROM results "
+        "LEFT JOIN runs ON results.run_id = runs.run_id{} "
+        "ORDER BY results.rowid".format(
+            ", ".join("results." + column for column in RESULT_COLUMNS), where
+        )
+    )
+    connection = sqlite3.connect(location)
+    try:
+        return pd.read_sql_query(sql, connection, params=params)
+    finally:
+        connection.close()
+
+
+def list_runs(location):
+    """
+    Return the runs saved in a database as a DataFrame.
+
+    Parameters
+    ----------
+    location : str
+        The path to the database file.
+
+    Returns
+    -------
+    pandas.DataFrame
+        A row per run, with the columns in RUN_COLUMNS and "num_results",
+        ordered by start time.
+
+    """
+    import pandas as pd
+
+    if not os.path.isfile(location):
+        raise FileNotFoundError("No results database at {}".format(location))
+    sql = (
+        "SELECT {}, COUNT(results.run_id) AS num_results FROM runs "
+        "LEFT JOIN results ON results.run_id = runs.run_id "
+        "GROUP BY runs.run_id ORDER BY runs.started, runs.rowid".format(
+            ", ".join("runs." + column for column in RUN_COLUMNS)
+        )
+    )
+    connection = sqlite3.connect(location)
+    try:
+        return pd.read_sql_query(sql, connection)
+    finally:
+        connection.close()
+
+
+def cli(args=None):
+    """
+    Print or save results from a database, as simuran results database_path.
+
+    Parameters
+    ----------
+    args : list of str, optional
+        The command line arguments after "results", by default sys.argv[2:].
+
+    Returns
+    -------
+    pandas.DataFrame
+        The results or runs that were printed or saved.
+
+    """
+    parser = argparse.ArgumentParser("simuran results")
+    parser.add_argument("database", type=str, help="path to the results database")
+    for name in ("recording", "function", "key", "run_id", "batch", "function_config"):
+        parser.add_argument(
+            "--" + name,
+            type=str,
+            default=None,
+            help="only return results with this {}, ".format(name.replace("_", " "))
+            + 'which can be a glob pattern such as "*rate*"',
+        )
+    parser.add_argument(
+        "--runs", action="store_true", help="list the runs instead of the results"
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        type=str,
+        default=None,
+        help="csv file to save to, default is to print",
+    )
+    parsed = parser.parse_args(sys.argv[2:] if args is None else args)
+    if parsed.runs:
+        frame = list_runs(parsed.database)
+    else:
+        frame = query_results(
+            parsed.database,
+            recording=parsed.recording,
+            function=parsed.function,
+            key=parsed.key,
+            run_id=parsed.run_id,
+            batch=parsed.batch,
+            function_config=parsed.function_config,
+        )
+    if parsed.output is None:
+        print(frame.to_string(index=False))
+    else:
+        print("Saving {} rows to {}".format(len(frame), parsed.output))
+        frame.to_csv(parsed.output, index=False)
+    return frame
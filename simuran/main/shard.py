@@ -0,0 +1,142 @@
+"""This module splits the iterations of a batch into shards for job arrays."""
+
+import os
+
+from skm_pyutils.py_path import get_dirs_matching_regex
+
+from simuran.param_handler import ParamHandler
+
+
+def parse_shard(shard):
+    """
+    Parse a shard description of the form "i/N".
+
+    Parameters
+    ----------
+    shard : str or tuple
+        "i/N" or (i, N), where i is the shard to run, from 0 to N - 1,
+        and N is the number of shards.
+
+    Returns
+    -------
+    tuple of int
+        (i, N)
+
+    Raises
+    ------
+    ValueError
+        If the shard is not valid.
+
+    """
+    if isinstance(shard, str):
+        try:
+            shard_index, num_shards = (int(s) for s in shard.split("/"))
+        except ValueError:
+            raise ValueError("Shard must be given as i/N, got {}".format(shard))
+    else:
+        shard_index, num_shards = shard
+    if num_shards < 1 or not (0 <= shard_index < num_shards):
+        raise ValueError(
+            "Shard index must be from 0 to N - 1, got {}/{}".format(
+                shard_index, num_shards
+            )
+        )
+    return shard_index, num_shards
+
+
+def shard_indices(weights, shard_index, num_shards):
+    """
+    Return the indices of the items in a shard.
+
+    Items are assigned largest weight first to the shard with the
+    least total weight so far, with ties broken by position,
+    so every shard computes the same assignment.
+
+    Parameters
+    ----------
+    weights : list of float
+        The expected cost of each item.
+    shard_index : int
+        The shard to return the items of.
+    num_shards : int
+        The number of shards.
+
+    Returns
+    -------
+    list of int
+        The sorted indices of the items in the shard.
+
+    """
+    loads = [0.0] * num_shards
+    assigned = [[] for _ in range(num_shards)]
+    order = sorted(range(len(weights)), key=lambda i: (-weights[i], i))
+    for i in order:
+        target = min(range(num_shards), key=lambda s: (loads[s], s))
+        loads[target] += weights[i]
+        assigned[target].append(i)
+    return sorted(assigned[shard_index])
+
+
+def iteration_size(batch_param_loc):
+    """
+    Return the bytes of the files an iteration of a batch would analyse.
+
+    These are the files in the directories under the start_dir of the
+    batch config that match its regex_filters, as found by the batch setup.
+
+    Parameters
+    ----------
+    batch_param_loc : str or None
+        The path to the batch config of the iteration.
+
+    Returns
+    -------
+    int or None
+        The total size of the files, or None if the batch config
+        or its start_dir could not be read.
+
+    """
+    if batch_param_loc is None:
+        return None
+    try:
+        ph = ParamHandler(in_loc=batch_param_loc, name="params")
+        dirs = get_dirs_matching_regex(
+            ph["start_dir"], re_filters=ph.get("regex_filters", None)
+        )
+    except Exception:
+        return None
+    total = 0
+    for directory in dirs:
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_file():
+                    total += entry.stat().st_size
+            except OSError:
+                pass
+    return total
+
+
+def run_list_weights(run_dict_list):
+    """
+    Return the weights of the iterations in a batch run_list.
+
+    The weight of an iteration is the size in bytes of the files it
+    analyses, see iteration_size, so the data should not change while
+    the shards of a batch are started. An entry can set "shard_weight"
+    to replace its size. Iterations that can not be sized get the mean
+    size of the others, or 1 if none can be sized.
+
+    """
+    weights = []
+    for run_dict in run_dict_list:
+        if "shard_weight" in run_dict:
+            weights.append(float(run_dict["shard_weight"]))
+        else:
+            weights.append(iteration_size(run_dict.get("batch_param_loc", None)))
+    known = [weight for weight in weights if weight is not None]
+    default = (sum(known) / len(known)) if len(known) > 0 else 1.0
+    return [default if weight is None else float(weight) for weight in weights]
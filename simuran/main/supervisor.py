@@ -0,0 +1,278 @@
+"""This module runs pool tasks with timeouts, retries, and crash detection."""
+
+import os
+import time
+import shutil
+import signal
+import tempfile
+import threading
+import multiprocessing
+
+from simuran.main.worker_pool import apply_async, shutdown_worker_pool
+
+
+class TaskFailure(object):
+    """
+    A task that failed on every attempt.
+
+    Attributes
+    ----------
+    index : int
+        The position of the task in the task list.
+    label : str
+        A description of the task.
+    attempts : int
+        The number of times the task was run.
+    cause : str
+        Why the last attempt failed.
+    exception : Exception or None
+        The exception raised by the task, if it raised one.
+
+    """
+
+    def __init__(self, index, label, attempts, cause, exception=None):
+        """See help(TaskFailure)."""
+        self.index = index
+        self.label = label
+        self.attempts = attempts
+        self.cause = cause
+        self.exception = exception
+
+    def __str__(self):
+        """Call on print."""
+        return "{} failed after {} attempt(s): {}".format(
+            self.label, self.attempts, self.cause
+        )
+
+
+def _supervised_call(status_dir, idx, attempt, fn, args):
+    """Record which process runs this attempt and when it started, then run fn."""
+    marker = os.path.join(status_dir, "{}_{}".format(idx, attempt))
+    with open(marker + ".tmp", "w") as f:
+        f.write("{} {}".format(os.getpid(), time.time()))
+    os.replace(marker + ".tmp", marker)
+    return fn(*args)
+
+
+class TaskSupervisor(object):
+    """
+    Run tasks in a worker pool, recovering from errors, hangs, and crashes.
+
+    An attempt fails if the task raises an error, runs for longer than
+    timeout, or its worker process dies, for example from a segmentation
+    fault or being killed for using too much memory. Workers that time out
+    are killed, and the pool starts a new worker in their place.
+    Failed attempts are retried after a delay that doubles each time.
+
+    Attributes
+    ----------
+    timeout : float or None
+        The seconds a single attempt may run for, None for no limit.
+    retries : int
+        The number of times to retry a failed task.
+    backoff : float
+        The seconds to wait before the first retry.
+    raise_errors : bool
+        If True, the first task to fail on every attempt raises an error.
+        Otherwise, failures are stored in failures and the other tasks continue.
+    failures : list of simuran.main.supervisor.TaskFailure
+        The tasks that failed in the last call to run.
+
+    Parameters
+    ----------
+    timeout : float, optional
+        See Attributes, by default None.
+    retries : int, optional
+        See Attributes, by default 0.
+    backoff : float, optional
+        See Attributes, by default 1.0.
+    raise_errors : bool, optional
+        See Attributes, by default True.
+    poll_interval : float, optional
+        The most seconds between checks on running tasks, by default 0.2.
+        Finished tasks are collected as soon as they finish.
+
+    """
+
+    def __init__(
+        self,
+        timeout=None,
+        retries=0,
+        backoff=1.0,
+        raise_errors=True,
+        poll_interval=0.2,
+    ):
+        """See help(TaskSupervisor)."""
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.raise_errors = raise_errors
+        self.poll_interval = poll_interval
+        self.failures = []
+
+    def run(
+        self, pool, num_workers, fn, tasks, order=None, can_start=None, labels=None
+    ):
+        """
+        Call fn(*task) in the pool for each task, yielding results as they finish.
+
+        Parameters
+        ----------
+        pool : multiprocessing.pool.Pool
+            The pool from simuran.main.worker_pool.get_worker_pool.
+        num_workers : int
+            The number of workers in the pool.
+        fn : function
+            The function to call, must be importable by the workers.
+        tasks : list of tuple
+            The arguments for each call.
+        order : list of int, optional
+            The order to start the tasks in, by default the order of tasks.
+        can_start : function, optional
+            Called as can_start(idx, running) with the indices of the running
+            tasks, the task at idx is only started if this returns True.
+            This must return True when no tasks are running.
+        labels : list of str, optional
+            Descriptions of the tasks used in the report, by default "task i".
+
+        Yields
+        ------
+        idx : int
+            The position of the completed task in tasks.
+        value : object
+            The return value of fn.
+
+        Raises
+        ------
+        Exception
+            If raise_errors is True, the error of the first task to fail
+            on every attempt, or a RuntimeError if the task did not raise.
+
+        """
+        self.failures = []
+        pending = list(range(len(tasks)) if order is None else order)
+        labels = labels or ["task {}".format(i) for i in range(len(tasks))]
+        attempts = {}
+        retry_at = {}
+        running = {}
+        orphaned = False
+        status_dir = tempfile.mkdtemp(prefix="simuran_supervisor_")
+        # Set by the pool when any task finishes, to wake up the loop below
+        finished = threading.Event()
+
+        def on_finish(_):
+            finished.set()
+
+        def fail(idx, cause, exception=None):
+            if attempts[idx] <= self.retries:
+                delay = self.backoff * (2 ** (attempts[idx] - 1))
+                print(
+                    "{} failed ({}), retrying in {:.1f}s".format(
+                        labels[idx], cause, delay
+                    )
+                )
+                retry_at[idx] = time.monotonic() + delay
+                pending.insert(0, idx)
+                return
+            failure = TaskFailure(idx, labels[idx], attempts[idx], cause, exception)
+            self.failures.append(failure)
+            if self.raise_errors:
+                if exception is not None:
+                    raise exception
+                raise RuntimeError(str(failure))
+            print(str(failure))
+
+        try:
+            while len(pending) > 0 or len(running) > 0:
+                finished.clear()
+                collected = False
+                now = time.monotonic()
+                for idx in list(pending):
+                    if len(running) >= num_workers:
+                        break
+                    if retry_at.get(idx, 0) > now:
+                        continue
+                    if (can_start is not None) and not can_start(
+                        idx, list(running.keys())
+                    ):
+                        continue
+                    pending.remove(idx)
+                    attempts[idx] = attempts.get(idx, 0) + 1
+                    running[idx] = apply_async(
+                        pool,
+                        _supervised_call,
+                        (status_dir, idx, attempts[idx], fn, tasks[idx]),
+                        callback=on_finish,
+                        error_callback=on_finish,
+                    )
+
+                for idx, result in list(running.items()):
+                    if not result.ready():
+                        continue
+                    del running[idx]
+                    collected = True
+                    try:
+                        value = result.get()
+                    except Exception as e:
+                        fail(idx, "{}: {}".format(type(e).__name__, e), e)
+                        continue
+                    yield idx, value
+
+                alive = {p.pid for p in multiprocessing.active_children()}
+                for idx in list(running.keys()):
+                    started = self._read_marker(status_dir, idx, attempts[idx])
+                    if started is None or running[idx].ready():
+                        continue
+                    pid, start_time = started
+                    if pid not in alive:
+                        cause = "worker process {} died".format(pid)
+                    elif (self.timeout is not None) and (
+                        time.time() - start_time > self.timeout
+                    ):
+                        _kill(pid)
+                        cause = "timed out after {}s".format(self.timeout)
+                    else:
+                        continue
+                    # The pool never receives a result for this attempt
+                    orphaned = True
+                    del running[idx]
+                    fail(idx, cause)
+
+                # Start the next tasks straight away if any finished,
+                # otherwise wait for one to finish or the next check
+                if not collected:
+                    finished.wait(self.poll_interval)
+        except BaseException:
+            orphaned = True
+            raise
+        finally:
+            shutil.rmtree(status_dir, ignore_errors=True)
+            if orphaned:
+                # A pool with lost tasks can not be closed cleanly
+                shutdown_worker_pool(terminate=True)
+
+    def print_report(self):
+        """Print the tasks that failed in the last call to run."""
+        if len(self.failures) == 0:
+            return
+        print("{} task(s) failed:".format(len(self.failures)))
+        for failure in self.failures:
+            print("    {}".format(failure))
+
+    @staticmethod
+    def _read_marker(status_dir, idx, attempt):
+        marker = os.path.join(status_dir, "{}_{}".format(idx, attempt))
+        try:
+            with open(marker, "r") as f:
+                pid, start_time = f.read().split()
+        except (OSError, ValueError):
+            return None
+        return int(pid), float(start_time)
+
+
+def _kill(pid):
+    """Kill the process pid, ignoring it if it has already exited."""
+    try:
+        os.kill(pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+    except OSError:
+        pass
@@ -0,0 +1,392 @@
+"""
+This module saves the results of runs as partitioned Parquet or Feather tables.
+
+Each run writes two tables, which need the optional pyarrow package.
+"summary" holds the rows of the summary csv, with a typed column per
+attribute. "results" holds the output of each analysis function in a tidy
+form, one row per recording, function and key.
+Tables are partitioned by the name of the function config and of the batch
+config, as table_dir/table/function_config=name/batch=name/part-0.parquet,
+so runs of many batches can be loaded and filtered as one lazy dataset with
+open_result_table. Batch names end with a short hash of the location of the
+batch config, so each iteration of a run list has its own partition, even
+if its batch config has the same file name as another.
+"""
+
+import os
+import hashlib
+import numbers
+from collections.abc import Mapping
+
+from simuran.main.result_writer import summary_fieldnames
+
+TABLE_FORMATS = ("parquet", "feather")
+TABLE_NAMES = ("summary", "results")
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(
+            "Saving results as Parquet or Feather tables needs pyarrow, "
+            "install it with pip install pyarrow"
+        )
+    return pyarrow
+
+
+def partition_names(batch_name, function_config_path=None, table_dir=None):
+    """
+    Return the partition names of a run, as used by save_result_tables.
+
+    Parameters
+    ----------
+    batch_name : str
+        The path to the batch config of the run.
+    function_config_path : str, optional
+        The path to the function config of the run, by default None,
+        which is named "none".
+    table_dir : str, optional
+        The directory the tables are saved in, by default None.
+        If passed, the batch name ends with a hash of the path to the
+        batch config relative to table_dir, which does not change if
+        both are moved together.
+
+    Returns
+    -------
+    function_config : str
+        The name of the function config, without its extension.
+    batch : str
+        The name of the batch config, without its extension,
+        followed by "-" and the hash if table_dir is passed.
+
+    """
+    function_config = "none"
+    if function_config_path is not None:
+        function_config = os.path.splitext(os.path.basename(function_config_path))[0]
+    batch = os.path.splitext(os.path.basename(batch_name))[0]
+    if table_dir is not None:
+        rel_path = os.path.relpath(
+            os.path.abspath(batch_name), os.path.abspath(table_dir)
+        )
+        digest = hashlib.sha1(rel_path.replace(os.sep, "/").encode("utf-8"))
+        batch = "{}-{}".format(batch, digest.hexdigest()[:8])
+    return function_config, batch
+
+
+def default_table_dir(batch_name):
+    """Return the table directory of runs of batch_name, next to sim_results."""
+    return os.path.abspath(
+        os.path.join(os.path.dirname(batch_name), "..", "sim_results", "tables")
+    )
+
+
+def table_location(table_dir, table, function_config, batch, fmt="parquet"):
+    """Return the path to the file of table for one function config and batch."""
+    return os.path.join(
+        table_dir,
+        table,
+        "function_config=" + function_config,
+        "batch=" + batch,
+        "part-0." + fmt,
+    )
+
+
+def _typed_array(values):
+    """Return values as a bool, float, or string pyarrow array."""
+    pa = _import_pyarrow()
+    present = [v for v in values if v is not None]
+    if len(present) == 0:
+        # Null columns take the type of the column in other parts
+        return pa.array(values, type=pa.null())
+    if all(isinstance(v, bool) or type(v).__name__ == "bool_" for v in present):
+        return pa.array([None if v is None else bool(v) for v in values], pa.bool_())
+    if all(isinstance(v, numbers.Real) for v in present):
+        return pa.array(
+            [None if v is None else float(v) for v in values], pa.float64()
+        )
+    return pa.array([None if v is None else str(v) for v in values], pa.string())
+
+
+def summary_table(rows):
+    """
+    Return the rows of a summary as a pyarrow table with typed columns.
+
+    Columns are named as in the summary csv, with spaces replaced by "_".
+    Numbers are saved as floats, and lists or other objects as strings.
+
+    Parameters
+    ----------
+    rows : list of dict
+        The rows, as returned by
+        simuran.base_container.AbstractContainer.summary_data.
+
+    Returns
+    -------
+    pyarrow.Table
+        The table, with a row for each row of the summary.
+
+    """
+    pa = _import_pyarrow()
+    fieldnames = summary_fieldnames([list(row.keys()) for row in rows])
+    columns = [_typed_array([row.get(key, None) for row in rows]) for key in fieldnames]
+    return pa.table(columns, names=[key.replace(" ", "_") for key in fieldnames])
+
+
+def _flatten(value, prefix=""):
+    """Yield the (key, value) pairs of nested mappings, keys joined by "/"."""
+    if isinstance(value, Mapping):
+        for key, inner in value.items():
+            key = str(key) if prefix == "" else prefix + "/" + str(key)
+            yield from _flatten(inner, key)
+    else:
+        yield prefix, value
+
+
+def result_rows(recording):
+    """
+    Yield the results of the analysis functions on a recording in a tidy form.
+
+    Parameters
+    ----------
+    recording : simuran.recording.Recording
+        The recording, with its results.
+
+    Yields
+    ------
+    tuple
+        (function, key, value, text) for each result. function is the name
+        the result is saved under, and key the key of the result, nested keys
+        joined by "/", or "" for results that are not dictionaries.
+        Numbers and booleans are floats in value, with text None, and
+        anything else is converted to a string in text, with value None.
+
+    """
+    for fn_name, result in getattr(recording, "results", {}).items():
+        for key, value in _flatten(result):
+            if isinstance(value, numbers.Real) or type(value).__name__ == "bool_":
+                yield str(fn_name), key, float(value), None
+            else:
+                yield str(fn_name), key, None, None if value is None else str(value)
+
+
+def results_table(recording_container):
+    """
+    Return the results of the analysis functions as a tidy pyarrow table.
+
+    Parameters
+    ----------
+    recording_container : simuran.recording_container.RecordingContainer
+        The container, with the results of each recording.
+
+    Returns
+    -------
+    pyarrow.Table
+        The table, with columns "recording", the source file of the recording,
+        and "function", "key", "value", and "text" as described in result_rows.
+
+    """
+    pa = _import_pyarrow()
+    columns = {"recording": [], "function": [], "key": [], "value": [], "text": []}
+    for recording in recording_container:
+        for row in result_rows(recording):
+            columns["recording"].append(recording.source_file)
+            for name, value in zip(("function", "key", "value", "text"), row):
+                columns[name].append(value)
+    types = {
+        "recording": pa.string(),
+        "function": pa.string(),
+        "key": pa.string(),
+        "value": pa.float64(),
+        "text": pa.string(),
+    }
+    return pa.table(
+        [pa.array(columns[name], types[name]) for name in columns], names=list(columns)
+    )
+
+
+def write_table(table, location, fmt="parquet", compression="zstd"):
+    """
+    Atomically save a pyarrow table to location.
+
+    Parameters
+    ----------
+    table : pyarrow.Table
+        The table to save.
+    location : str
+        The path to save the table to.
+    fmt : str, optional
+        "parquet" or "feather", by default "parquet".
+    compression : str, optional
+        The compression codec, by default "zstd".
+
+    Returns
+    -------
+    None
+
+    """
+    _import_pyarrow()
+    if fmt not in TABLE_FORMATS:
+        raise ValueError("fmt must be one of {}, got {}".format(TABLE_FORMATS, fmt))
+    dirname, basename = os.path.split(os.path.abspath(location))
+    os.makedirs(dirname, exist_ok=True)
+    # Files starting with "." are skipped by datasets, so readers never see it
+    temp_name = os.path.join(dirname, "." + basename + ".tmp")
+    try:
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            pq.write_table(table, temp_name, compression=compression)
+        else:
+            import pyarrow.feather as feather
+
+            feather.write_feather(table, temp_name, compression=compression)
+        os.replace(temp_name, location)
+    except BaseException:
+        if os.path.isfile(temp_name):
+            os.remove(temp_name)
+        raise
+
+
+def save_result_tables(
+    recording_container,
+    attr_list,
+    table_dir,
+    function_config,
+    batch,
+    fmt="parquet",
+    friendly_names=None,
+    decimals=3,
+):
+    """
+    Save the summary and results tables of a run.
+
+    The files of an earlier run with the same function config and batch
+    are replaced.
+
+    Parameters
+    ----------
+    recording_container : simuran.recording_container.RecordingContainer
+        The container, with the results of each recording.
+    attr_list : list of tuples
+        The attributes to save in the summary table.
+    table_dir : str
+        The directory holding the tables of all runs.
+    function_config : str
+        The name of the function config partition.
+    batch : str
+        The name of the batch partition.
+    fmt : str, optional
+        "parquet" or "feather", by default "parquet".
+    friendly_names : list of str, optional
+        The names of the attributes to save, by default None
+    decimals : int, optional
+        The number of decimal places to save the summary with, by default 3
+
+    Returns
+    -------
+    dict
+        The path to the file of each table.
+
+    """
+    rows = recording_container.summary_data(
+        attr_list, friendly_names=friendly_names, decimals=decimals
+    )
+    tables = {
+        "summary": summary_table(rows),
+        "results": results_table(recording_container),
+    }
+    locations = {}
+    for table, contents in tables.items():
+        location = table_location(table_dir, table, function_config, batch, fmt)
+        print("Saving {} table to {}".format(table, location))
+        write_table(contents, location, fmt=fmt)
+        locations[table] = location
+    return locations
+
+
+def _unify_schemas(schemas):
+    """
+    Return one schema for the tables of every run.
+
+    A column saved with different types by different runs, for example
+    numbers in one batch and lists in another, is read as a float column
+    if every type is a bool or float, and as a string column otherwise.
+
+    """
+    pa = _import_pyarrow()
+    # Null columns take the type of the column in other runs
+    types = {}
+    for schema in schemas:
+        for field in schema:
+            found = types.setdefault(field.name, set())
+            if not pa.types.is_null(field.type):
+                found.add(field.type)
+    fields = []
+    for name, found in types.items():
+        if len(found) == 0:
+            fields.append(pa.field(name, pa.null()))
+        elif len(found) == 1:
+            fields.append(pa.field(name, found.pop()))
+        elif all(pa.types.is_boolean(t) or pa.types.is_floating(t) for t in found):
+            fields.append(pa.field(name, pa.float64()))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+
+def open_result_table(table_dir, table="summary", fmt="parquet"):
+    """
+    Return a lazy dataset of one table over every saved run.
+
+    No rows are read until the dataset is converted, for example with
+    dataset.to_table(filter=...) or dataset.to_table().to_pandas().
+    The partitions are the columns "function_config" and "batch".
+    Columns missing from some runs are null in those runs, and columns
+    saved with different types by different runs are read as floats
+    or strings, see _unify_schemas.
+
+    Parameters
+    ----------
+    table_dir : str
+        The directory holding the tables.
+    table : str, optional
+        "summary" or "results", by default "summary".
+    fmt : str, optional
+        "parquet" or "feather", by default "parquet".
+
+    Returns
+    -------
+    pyarrow.dataset.Dataset
+        The dataset.
+
+    Raises
+    ------
+    FileNotFoundError
+        If no runs have saved the table in table_dir.
+
+    """
+    pa = _import_pyarrow()
+    import pyarrow.dataset as ds
+
+    if table not in TABLE_NAMES:
+        raise ValueError("table must be one of {}, got {}".format(TABLE_NAMES, table))
+    location = os.path.join(table_dir, table)
+    if not os.path.isdir(location):
+        raise FileNotFoundError("No {} tables saved in {}".format(table, table_dir))
+    file_format = "ipc" if fmt == "feather" else fmt
+    partitioning = ds.partitioning(
+        pa.schema([("function_config", pa.string()), ("batch", pa.string())]),
+        flavor="hive",
+    )
+    dataset = ds.dataset(location, format=file_format, partitioning=partitioning)
+    # The schema is only inferred from the first file, so combine them all
+    schemas = [dataset.schema] + [
+        fragment.physical_schema for fragment in dataset.get_fragments()
+    ]
+    return ds.dataset(
+        location,
+        schema=_unify_schemas(schemas),
+        format=file_format,
+        partitioning=partitioning,
+    )
@@ -0,0 +1,143 @@
+"""This module records how long each stage of a run takes."""
+
+import os
+import csv
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+TIMING_SUFFIX = "--timings.csv"
+TIMING_FIELDS = ("stage", "recording", "name", "seconds")
+
+
+def timings_location(results_location):
+    """Return the path of the timing table saved next to results_location."""
+    return os.path.splitext(results_location)[0] + TIMING_SUFFIX
+
+
+class TimingTable(object):
+    """
+    A table of the time taken by each stage of a run.
+
+    Each row has a stage, such as "load" or "analysis",
+    the recording it applies to, which is empty for stages of the whole run,
+    the name of the item timed, such as an attribute or function name,
+    and the time taken in seconds.
+
+    Attributes
+    ----------
+    rows : list of dict
+        The rows of the table, with the keys in TIMING_FIELDS.
+
+    """
+
+    def __init__(self):
+        """See help(TimingTable)."""
+        self.rows = []
+
+    def add(self, stage, seconds, recording="", name=""):
+        """Add a row to the table."""
+        self.rows.append(
+            {
+                "stage": stage,
+                "recording": recording,
+                "name": name,
+                "seconds": seconds,
+            }
+        )
+
+    def extend(self, rows):
+        """Add rows, such as those of a table filled in a worker process."""
+        self.rows.extend(rows)
+
+    @contextmanager
+    def timer(self, stage, recording="", name=""):
+        """Add a row with the time taken to run the body of a with statement."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start_time, recording, name)
+
+    def totals(self, key, stage=None):
+        """
+        Return the total seconds for each value of key, largest first.
+
+        Parameters
+        ----------
+        key : str
+            The field to group rows by, one of TIMING_FIELDS.
+        stage : str, optional
+            Only consider rows of this stage, by default None for all rows.
+
+        Returns
+        -------
+        collections.OrderedDict
+            The total seconds for each value of key.
+
+        """
+        totals = {}
+        for row in self.rows:
+            if (stage is not None) and (row["stage"] != stage):
+                continue
+            totals[row[key]] = totals.get(row[key], 0.0) + row["seconds"]
+        return OrderedDict(sorted(totals.items(), key=lambda x: x[1], reverse=True))
+
+    def save(self, location):
+        """
+        Atomically write the table to a csv file.
+
+        Parameters
+        ----------
+        location : str
+            The path to the csv file.
+
+        Returns
+        -------
+        None
+
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(location)), exist_ok=True)
+        temp_name = location + ".tmp"
+        try:
+            with open(temp_name, "w", newline="") as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=TIMING_FIELDS)
+                writer.writeheader()
+                for row in self.rows:
+                    writer.writerow({**row, "seconds": "{:.6f}".format(row["seconds"])})
+            os.replace(temp_name, location)
+        except BaseException:
+            if os.path.isfile(temp_name):
+                os.remove(temp_name)
+            raise
+
+    def print_summary(self, num_rows=5):
+        """
+        Print the time spent in each stage, and the slowest functions and recordings.
+
+        Parameters
+        ----------
+        num_rows : int, optional
+            The number of functions and recordings to list, by default 5.
+
+        Returns
+        -------
+        None
+
+        """
+        if len(self.rows) == 0:
+            return
+        print("Time spent in each stage:")
+        for stage, seconds in self.totals("stage").items():
+            print("    {}: {:.2f}s".format(stage, seconds))
+        slowest_fns = list(self.totals("name", stage="analysis").items())
+        if len(slowest_fns) > 0:
+            print("Slowest analysis functions:")
+            for name, seconds in slowest_fns[:num_rows]:
+                print("    {}: {:.2f}s".format(name, seconds))
+        per_recording = self.totals("recording")
+        per_recording.pop("", None)
+        if len(per_recording) > 0:
+            print("Slowest recordings:")
+            for recording, seconds in list(per_recording.items())[:num_rows]:
+                print("    {}: {:.2f}s".format(recording, seconds))
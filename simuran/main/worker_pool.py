@@ -0,0 +1,311 @@
+"""This module provides a persistent pool of pre-warmed worker processes."""
+
+import sys
+import site
+import queue
+import atexit
+import importlib
+import multiprocessing
+
+from simuran.main.cpu_budget import (
+    thread_limited_env,
+    worker_initializer,
+    limit_threads,
+)
+from simuran.tracer import get_trace_dir, set_trace_dir
+from simuran.profiler import get_profile_dir, set_profile_dir, profiled
+from simuran.main.progress import (
+    make_progress_queue,
+    drop_progress_queue,
+    set_progress_queue,
+    set_progress_enabled,
+    progress_enabled,
+)
+
+DEFAULT_PRELOAD_MODULES = (
+    "numpy",
+    "matplotlib.pyplot",
+    "simuran.main.main",
+)
+
+_pool = None
+_pool_size = 0
+_pool_preload = None
+_task_threads = 1
+_site_dirs = []
+_worker_site_dirs = set()
+_worker_threads = None
+
+
+def register_site_dir(path_dir):
+    """
+    Register a directory to be processed with site.addsitedir in every worker.
+
+    simuran.main.main.modify_path calls this,
+    so analysis modules are available in workers of an existing pool.
+
+    Parameters
+    ----------
+    path_dir : str
+        The directory to add.
+
+    Returns
+    -------
+    None
+
+    """
+    if path_dir not in _site_dirs:
+        _site_dirs.append(path_dir)
+
+
+def registered_site_dirs():
+    """Return the directories registered with register_site_dir."""
+    return list(_site_dirs)
+
+
+def _warm_initializer(
+    num_threads, path_dirs, site_dirs, preload_modules, progress_queue=None
+):
+    """Set up a worker, process site directories, and import preload_modules."""
+    global _worker_threads
+    worker_initializer(num_threads, path_dirs)
+    _worker_threads = num_threads
+    set_progress_queue(progress_queue)
+    _add_site_dirs(site_dirs)
+    for name in preload_modules:
+        try:
+            importlib.import_module(name)
+        except BaseException as e:
+            print("WARNING: could not preload {} in worker: {}".format(name, e))
+
+
+def _add_site_dirs(site_dirs):
+    for site_dir in site_dirs:
+        if site_dir not in _worker_site_dirs:
+            site.addsitedir(site_dir)
+            _worker_site_dirs.add(site_dir)
+
+
+def _call_in_worker(task):
+    """Set up a worker as described by _task_context, then call fn."""
+    global _worker_threads
+    num_threads, site_dirs, trace_dir, profile_dir, progress, fn, args = task
+    if num_threads != _worker_threads:
+        limit_threads(num_threads)
+        _worker_threads = num_threads
+    _add_site_dirs(site_dirs)
+    set_trace_dir(trace_dir)
+    set_profile_dir(profile_dir)
+    set_progress_enabled(progress)
+    with profiled():
+        return fn(*args)
+
+
+def get_worker_pool(num_workers, num_threads=1, preload_modules=None):
+    """
+    Return a pool of warm worker processes, creating it only if needed.
+
+    The pool is kept alive between calls, so successive batch iterations
+    and successive calls to batch_run in one Python session re-use the
+    same workers and do not pay for process start-up and imports again.
+    A running pool with at least num_workers workers is re-used, so callers
+    should size the pool from their CPU budget rather than their number of
+    tasks, and limit their tasks in flight to the workers they need.
+    A new pool is only created if more workers or other preload modules
+    are requested.
+
+    Parameters
+    ----------
+    num_workers : int
+        The smallest number of worker processes.
+    num_threads : int, optional
+        The number of numerical library threads in each worker while running
+        tasks submitted after this call, by default 1.
+    preload_modules : list of str, optional
+        The modules to import in each worker when it starts,
+        by default DEFAULT_PRELOAD_MODULES.
+
+    Returns
+    -------
+    multiprocessing.pool.Pool
+        The pool of workers.
+
+    """
+    global _pool, _pool_size, _pool_preload, _task_threads
+    if preload_modules is None:
+        preload_modules = DEFAULT_PRELOAD_MODULES
+    preload_modules = tuple(preload_modules)
+    _task_threads = num_threads
+    if (
+        (_pool is not None)
+        and (_pool_preload == preload_modules)
+        and (_pool_size >= num_workers)
+    ):
+        return _pool
+
+    shutdown_worker_pool()
+    context = multiprocessing.get_context("spawn")
+    with thread_limited_env(num_threads):
+        _pool = context.Pool(
+            num_workers,
+            initializer=_warm_initializer,
+            initargs=(
+                num_threads,
+                list(sys.path),
+                list(_site_dirs),
+                list(preload_modules),
+                make_progress_queue(context),
+            ),
+        )
+    _pool_size = num_workers
+    _pool_preload = preload_modules
+    return _pool
+
+
+def _task_context():
+    """Return the settings of this process to set up in a worker for a task."""
+    return (
+        _task_threads,
+        tuple(_site_dirs),
+        get_trace_dir(),
+        get_profile_dir(),
+        progress_enabled(),
+    )
+
+
+def _call_chunk(fn, chunk):
+    """Call fn(*args) for each args in chunk, returning the list of results."""
+    return [fn(*args) for args in chunk]
+
+
+def imap_unordered(pool, fn, iterable, chunksize=1, max_in_flight=None):
+    """
+    Call fn(*args) in the pool for each args in iterable, in completion order.
+
+    The number of library threads passed to the last call of get_worker_pool,
+    any site directories registered since the pool started, the
+    trace directory of simuran.tracer, the profile directory of
+    simuran.profiler, and progress reporting of simuran.main.progress
+    are set up in the workers before fn is called.
+
+    Parameters
+    ----------
+    pool : multiprocessing.pool.Pool
+        The pool from get_worker_pool.
+    fn : function
+        The function to call, must be importable by the workers.
+    iterable : iterable of tuple
+        The arguments for each call.
+    chunksize : int, optional
+        The number of calls sent to a worker at once, by default 1.
+    max_in_flight : int, optional
+        The most chunks of calls to run at once, by default None,
+        which uses every worker in the pool. Set this to use only part
+        of a larger pool.
+
+    Returns
+    -------
+    iterator
+        The return values of fn.
+
+    """
+    if max_in_flight is None:
+        context = _task_context()
+        tasks = (context + (fn, args) for args in iterable)
+        return pool.imap_unordered(_call_in_worker, tasks, chunksize=chunksize)
+    return _imap_limited(pool, fn, iterable, chunksize, max(1, max_in_flight))
+
+
+def _imap_limited(pool, fn, iterable, chunksize, max_in_flight):
+    """Run imap_unordered with at most max_in_flight chunks submitted at once."""
+    done = queue.Queue()
+    iterator = iter(iterable)
+    in_flight = 0
+    finished = False
+    while True:
+        while (not finished) and (in_flight < max_in_flight):
+            chunk = []
+            for args in iterator:
+                chunk.append(args)
+                if len(chunk) == chunksize:
+                    break
+            if len(chunk) == 0:
+                finished = True
+                break
+            apply_async(
+                pool,
+                _call_chunk,
+                (fn, chunk),
+                callback=lambda values: done.put((True, values)),
+                error_callback=lambda e: done.put((False, e)),
+            )
+            in_flight += 1
+        if in_flight == 0:
+            return
+        ok, values = done.get()
+        in_flight -= 1
+        if not ok:
+            raise values
+        for value in values:
+            yield value
+
+
+def apply_async(pool, fn, args, callback=None, error_callback=None):
+    """
+    Call fn(*args) in the pool without waiting for the result.
+
+    Parameters
+    ----------
+    pool : multiprocessing.pool.Pool
+        The pool from get_worker_pool.
+    fn : function
+        The function to call, must be importable by the workers.
+    args : tuple
+        The arguments to call fn with.
+    callback : function, optional
+        Called in the parent process with the return value of fn.
+    error_callback : function, optional
+        Called in the parent process with the exception if fn raises.
+
+    Returns
+    -------
+    multiprocessing.pool.AsyncResult
+        The pending result.
+
+    """
+    task = _task_context() + (fn, args)
+    return pool.apply_async(
+        _call_in_worker, (task,), callback=callback, error_callback=error_callback
+    )
+
+
+def shutdown_worker_pool(terminate=False):
+    """
+    Stop the persistent worker pool if it is running.
+
+    Parameters
+    ----------
+    terminate : bool, optional
+        If True, workers are stopped immediately instead of
+        finishing their current tasks, by default False.
+
+    Returns
+    -------
+    None
+
+    """
+    global _pool, _pool_size, _pool_preload
+    if _pool is None:
+        return
+    if terminate:
+        _pool.terminate()
+    else:
+        _pool.close()
+    _pool.join()
+    _pool = None
+    _pool_size = 0
+    _pool_preload = None
+    drop_progress_queue()
+
+
+atexit.register(shutdown_worker_pool)
@@ -0,0 +1,330 @@
+"""
+This module records the memory used by loading, analysis, and figure saving.
+
+Profiling is off by default. While a MemoryProfiler is active in a process,
+each block run in profile_memory records the resident set size (RSS) of the
+process, the peak memory traced by tracemalloc during the block, the memory
+allocated in the block that is still held after it (retained), the change
+in open matplotlib figures, and the lines that allocated the most.
+tracemalloc slows Python code down, so this is meant for finding
+which loader or analysis function uses the most memory, not for every run.
+"""
+
+import os
+import csv
+import sys
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+
+MEMORY_SUFFIX = "--memory.csv"
+MEMORY_FIELDS = (
+    "stage",
+    "recording",
+    "name",
+    "pid",
+    "rss",
+    "max_rss",
+    "traced_peak",
+    "retained",
+    "open_figures",
+    "top_allocations",
+)
+MB = 1024 * 1024
+
+_active = None
+
+
+def memory_location(results_location):
+    """Return the path of the memory table saved next to results_location."""
+    return os.path.splitext(results_location)[0] + MEMORY_SUFFIX
+
+
+def current_rss():
+    """Return the resident set size of this process in bytes, or None if unknown."""
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def max_rss():
+    """Return the peak resident set size of this process in bytes, or None."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes and macOS reports bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _reset_peak():
+    """Reset the tracemalloc peak, which needs Python 3.9."""
+    # On older versions, peaks are the largest seen since tracemalloc started
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+
+
+def _num_open_figures():
+    """Return the number of open matplotlib figures, without importing pyplot."""
+    plt = sys.modules.get("matplotlib.pyplot", None)
+    return 0 if plt is None else len(plt.get_fignums())
+
+
+class MemoryProfiler(object):
+    """
+    Record the memory used by blocks of code, see help(simuran.memory_profiler).
+
+    Attributes
+    ----------
+    rows : list of dict
+        The measurements of each block, with the keys in MEMORY_FIELDS.
+        Sizes are in bytes.
+    recording : str
+        The name of the recording that blocks are recorded against.
+    top_allocations : int
+        The number of lines that allocated the most to store per block.
+
+    Parameters
+    ----------
+    top_allocations : int, optional
+        See Attributes, by default 3. Use 0 to skip the comparison of
+        tracemalloc snapshots, which is the slowest part of profiling.
+
+    """
+
+    def __init__(self, top_allocations=3):
+        """See help(MemoryProfiler)."""
+        self.rows = []
+        self.recording = ""
+        self.top_allocations = top_allocations
+        self._stack = []
+
+    @contextmanager
+    def measure(self, stage, name):
+        """Record the memory used by the body of a with statement."""
+        if self._stack:
+            parent = self._stack[-1]
+            parent["peak"] = max(parent["peak"], tracemalloc.get_traced_memory()[1])
+        block = {"peak": 0}
+        self._stack.append(block)
+        snapshot = None
+        if self.top_allocations > 0:
+            snapshot = tracemalloc.take_snapshot()
+        figures_before = _num_open_figures()
+        traced_before = tracemalloc.get_traced_memory()[0]
+        _reset_peak()
+        try:
+            yield
+        finally:
+            traced_after, peak = tracemalloc.get_traced_memory()
+            self._stack.pop()
+            peak = max(peak, block["peak"])
+            if self._stack:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+            top = ""
+            if snapshot is not None:
+                top = self._top_allocations(snapshot)
+            self.rows.append(
+                {
+                    "stage": stage,
+                    "recording": self.recording,
+                    "name": name,
+                    "pid": os.getpid(),
+                    "rss": current_rss(),
+                    "max_rss": max_rss(),
+                    "traced_peak": peak - traced_before,
+                    "retained": traced_after - traced_before,
+                    "open_figures": _num_open_figures() - figures_before,
+                    "top_allocations": top,
+                }
+            )
+            _reset_peak()
+
+    def _top_allocations(self, before):
+        filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ]
+        after = tracemalloc.take_snapshot().filter_traces(filters)
+        stats = after.compare_to(before.filter_traces(filters), "lineno")
+        parts = []
+        for stat in stats[: self.top_allocations]:
+            frame = stat.traceback[0]
+            parts.append(
+                "{}:{} {:+.1f} KiB".format(
+                    frame.filename, frame.lineno, stat.size_diff / 1024
+                )
+            )
+        return "; ".join(parts)
+
+    def extend(self, rows):
+        """Add rows, such as those of a profiler in a worker process."""
+        self.rows.extend(rows)
+
+    def recording_table(self):
+        """
+        Return the memory use of each recording.
+
+        Returns
+        -------
+        collections.OrderedDict
+            For each recording, a dict with the largest "rss",
+            the largest "traced_peak", and the total "retained"
+            over its blocks, ordered from the largest traced peak.
+
+        """
+        table = OrderedDict()
+        for row in self.rows:
+            entry = table.setdefault(
+                row["recording"], {"rss": 0, "traced_peak": 0, "retained": 0}
+            )
+            entry["rss"] = max(entry["rss"], row["rss"] or 0)
+            entry["traced_peak"] = max(entry["traced_peak"], row["traced_peak"])
+            entry["retained"] += row["retained"]
+        return OrderedDict(
+            sorted(table.items(), key=lambda x: x[1]["traced_peak"], reverse=True)
+        )
+
+    def find_leaks(self, min_calls=3, min_retained=MB):
+        """
+        Return the names of blocks whose retained memory grows with each call.
+
+        A block is flagged if it was run at least min_calls times and
+        either left memory allocated after every call, adding up to at least
+        min_retained bytes, or left matplotlib figures open.
+        Note that the result returned by an analysis function
+        is counted as retained memory.
+
+        Parameters
+        ----------
+        min_calls : int, optional
+            The number of calls needed to flag a block, by default 3.
+        min_retained : int, optional
+            The total bytes retained needed to flag a block, by default 1 MB.
+
+        Returns
+        -------
+        list of tuple
+            (stage, name, calls, total retained bytes, figures left open)
+            for each flagged block.
+
+        """
+        grouped = OrderedDict()
+        for row in self.rows:
+            grouped.setdefault((row["stage"], row["name"]), []).append(row)
+        leaks = []
+        for (stage, name), rows in grouped.items():
+            if len(rows) < min_calls:
+                continue
+            retained = sum(row["retained"] for row in rows)
+            figures = sum(row["open_figures"] for row in rows)
+            grows = all(row["retained"] > 0 for row in rows)
+            if (grows and retained >= min_retained) or (figures > 0):
+                leaks.append((stage, name, len(rows), retained, figures))
+        return leaks
+
+    def save(self, location):
+        """
+        Atomically write the rows to a csv file.
+
+        Parameters
+        ----------
+        location : str
+            The path to the csv file.
+
+        Returns
+        -------
+        None
+
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(location)), exist_ok=True)
+        temp_name = location + ".tmp"
+        try:
+            with open(temp_name, "w", newline="") as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=MEMORY_FIELDS)
+                writer.writeheader()
+                writer.writerows(self.rows)
+            os.replace(temp_name, location)
+        except BaseException:
+            if os.path.isfile(temp_name):
+                os.remove(temp_name)
+            raise
+
+    def print_summary(self, num_rows=5):
+        """
+        Print the recordings using the most memory and any suspected leaks.
+
+        Parameters
+        ----------
+        num_rows : int, optional
+            The number of recordings to list, by default 5.
+
+        Returns
+        -------
+        None
+
+        """
+        if len(self.rows) == 0:
+            return
+        print("Recordings using the most memory:")
+        for recording, entry in list(self.recording_table().items())[:num_rows]:
+            print(
+                "    {}: traced peak {:.1f}MB, retained {:.1f}MB, RSS {:.1f}MB".format(
+                    recording or "container",
+                    entry["traced_peak"] / MB,
+                    entry["retained"] / MB,
+                    entry["rss"] / MB,
+                )
+            )
+        for stage, name, calls, retained, figures in self.find_leaks():
+            print(
+                "WARNING: possible leak in {} {}, {} calls retained {:.1f}MB "
+                "and left {} figures open".format(
+                    stage, name, calls, retained / MB, figures
+                )
+            )
+
+
+@contextmanager
+def profiling(profiler, recording=""):
+    """
+    Make profiler record the blocks in profile_memory under recording.
+
+    tracemalloc is started if it is not already running, and stopped after.
+    Does nothing if profiler is None.
+
+    """
+    global _active
+    if profiler is None:
+        yield
+        return
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    old_active, old_recording = _active, profiler.recording
+    _active, profiler.recording = profiler, recording
+    try:
+        yield
+    finally:
+        _active, profiler.recording = old_active, old_recording
+        if started:
+            tracemalloc.stop()
+
+
+@contextmanager
+def profile_memory(stage, name):
+    """Record the memory used by the body of a with statement, if profiling."""
+    if _active is None:
+        yield
+        return
+    with _active.measure(stage, name):
+        yield
@@ -64,6 +64,10 @@ def set_fixed_params(in_dict):
     # EEG signals that were recorded in two second long trials
     in_dict["keep_all_data"] = False
 
+    # Modules imported once in each worker process when the pool starts
+    # None uses the defaults in simuran.main.worker_pool
+    in_dict["preload_modules"] = None
+
     return in_dict
 
 
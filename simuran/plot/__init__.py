@@ -1 +1,4 @@
 """This module provides plotting functionality."""
+from simuran.plot.backend import set_default_backend
+
+set_default_backend()
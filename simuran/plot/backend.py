@@ -0,0 +1,31 @@
+"""This module chooses the matplotlib backend before pyplot is imported."""
+
+import os
+import sys
+
+
+def has_display():
+    """Return True if windows can be shown, always True off Linux and BSD."""
+    if not sys.platform.startswith(("linux", "freebsd", "openbsd")):
+        return True
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def set_default_backend():
+    """
+    Use the non-interactive Agg backend if there is no display.
+
+    The backend is set through the MPLBACKEND environment variable,
+    so worker processes started afterwards use it too.
+    A backend chosen with MPLBACKEND is kept.
+
+    Returns
+    -------
+    None
+
+    """
+    if ("MPLBACKEND" in os.environ) or has_display():
+        return
+    os.environ["MPLBACKEND"] = "Agg"
+    if "matplotlib" in sys.modules:
+        sys.modules["matplotlib"].use("Agg")
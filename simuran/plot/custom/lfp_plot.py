@@ -5,15 +5,14 @@ from copy import deepcopy
 
 import numpy as np
 import matplotlib.pyplot as plt
-import seaborn as sns
 import more_itertools as mit
 
 import simuran.plot.base_plot
-from neurochat.nc_lfp import NLfp
-from neurochat.nc_utils import butter_filter
 
 
 def plot_compare_lfp(matrix_data, chans, save=True, save_loc=None, **kwargs):
+    import seaborn as sns
+
     ch = len(chans)
     default = {
         "title": "LFP Difference",
@@ -320,6 +319,9 @@ def plot_sample_of_signal(
 
     offseta and length are times
     """
+    from neurochat.nc_lfp import NLfp
+    from neurochat.nc_utils import butter_filter
+
     in_dir = os.path.dirname(load_loc)
     lfp = NLfp()
     lfp.load(load_loc)
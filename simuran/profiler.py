@@ -0,0 +1,313 @@
+"""
+This module profiles a run with cProfile, in the main process and in workers.
+
+Profiling is off by default. Once started with start_profiling,
+the main process and each worker that runs a task save their statistics
+to their own .pstats file in the profile directory, so workers that crash
+keep the statistics of the tasks they finished.
+Worker pools and job queues pass the profile directory on to their workers.
+save_profile merges the files into a report of the functions with the
+largest cumulative time, and a collapsed stack file that can be drawn
+with flamegraph.pl or https://www.speedscope.app.
+
+cProfile only profiles the thread that started it, so work in other
+threads, such as the readers of simuran.main.pipeline, is not included.
+"""
+
+import os
+import glob
+import pstats
+import socket
+import cProfile
+from contextlib import contextmanager
+
+PROFILE_DIR_ENV = "SIMURAN_PROFILE_DIR"
+REPORT_NAME = "profile.txt"
+COLLAPSED_NAME = "profile.collapsed"
+MERGED_NAME = "profile.pstats"
+
+_profile_dir = os.environ.get(PROFILE_DIR_ENV, None) or None
+_profiler = None
+_depth = 0
+
+
+def start_profiling(profile_dir):
+    """
+    Profile this process, and processes it starts, to profile_dir.
+
+    Parameters
+    ----------
+    profile_dir : str
+        The directory to write .pstats files to, created if it does not exist.
+
+    Returns
+    -------
+    None
+
+    """
+    global _profile_dir
+    profile_dir = os.path.abspath(profile_dir)
+    os.makedirs(profile_dir, exist_ok=True)
+    _profile_dir = profile_dir
+    os.environ[PROFILE_DIR_ENV] = profile_dir
+
+
+def stop_profiling():
+    """Stop profiling this process, statistics already saved are kept."""
+    global _profile_dir, _profiler
+    _profile_dir = None
+    _profiler = None
+    os.environ.pop(PROFILE_DIR_ENV, None)
+
+
+def set_profile_dir(profile_dir):
+    """
+    Start profiling to profile_dir, or stop profiling if profile_dir is None.
+
+    This is called by workers before each task. Statistics from an earlier
+    profile directory, or from a run whose files were removed, are discarded.
+
+    """
+    global _profiler
+    if profile_dir is None:
+        if _profile_dir is not None:
+            stop_profiling()
+        return
+    profile_dir = os.path.abspath(profile_dir)
+    if profile_dir != _profile_dir:
+        stop_profiling()
+        start_profiling(profile_dir)
+    elif (_profiler is not None) and not os.path.isfile(_stats_location()):
+        _profiler = None
+
+
+def get_profile_dir():
+    """Return the directory profiles are saved to, or None if not profiling."""
+    return _profile_dir
+
+
+def clear_profiles(profile_dir):
+    """Remove the statistics and reports in profile_dir from an earlier run."""
+    names = glob.glob(os.path.join(profile_dir, "profile-*.pstats"))
+    names += [
+        os.path.join(profile_dir, name)
+        for name in (REPORT_NAME, COLLAPSED_NAME, MERGED_NAME)
+    ]
+    for fname in names:
+        if os.path.isfile(fname):
+            os.remove(fname)
+
+
+def _stats_location():
+    name = "profile-{}-{}.pstats".format(socket.gethostname(), os.getpid())
+    return os.path.join(_profile_dir, name)
+
+
+@contextmanager
+def profiled():
+    """
+    Profile the body of a with statement if profiling is on.
+
+    The statistics of this process, added up over each profiled block,
+    are saved after the block. Nested blocks are profiled once.
+
+    """
+    global _profiler, _depth
+    if (_profile_dir is None) or (_depth > 0):
+        yield
+        return
+    if _profiler is None:
+        _profiler = cProfile.Profile()
+    profiler = _profiler
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler, such as a debugger, is already running
+        yield
+        return
+    _depth += 1
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _depth -= 1
+        if _profile_dir is not None:
+            location = _stats_location()
+            profiler.dump_stats(location + ".tmp")
+            os.replace(location + ".tmp", location)
+
+
+def load_profiles(profile_dir):
+    """
+    Merge the .pstats files of each process in profile_dir.
+
+    Returns
+    -------
+    pstats.Stats or None
+        The merged statistics, or None if there are no files.
+
+    """
+    stats = None
+    for fname in sorted(glob.glob(os.path.join(profile_dir, "profile-*.pstats"))):
+        try:
+            if stats is None:
+                stats = pstats.Stats(fname)
+            else:
+                stats.add(fname)
+        except (EOFError, ValueError, TypeError):
+            # Not a statistics file
+            print("WARNING: could not read {}, skipping".format(fname))
+    return stats
+
+
+def _label(func):
+    filename, line, name = func
+    if filename == "~":
+        return name
+    return "{} ({}:{})".format(name, os.path.basename(filename), line)
+
+
+def collapsed_stacks(stats, min_seconds=1e-4, max_depth=200):
+    """
+    Return the time spent in each call stack, in the collapsed stack format.
+
+    cProfile records how long each function spent being called from each
+    caller, but not full stacks. Stacks are rebuilt by following callers to
+    callees from functions called from outside the profiled code, and splitting
+    the time of a function between its stacks in proportion to the time
+    of each call edge.
+    The result is exact for call trees and an estimate otherwise.
+
+    Parameters
+    ----------
+    stats : pstats.Stats
+        The statistics to convert.
+    min_seconds : float, optional
+        Stacks that took less than this are left out, by default 1e-4.
+    max_depth : int, optional
+        The deepest stack to follow, by default 200.
+
+    Returns
+    -------
+    list of str
+        Lines of "caller;callee;... microseconds", largest first.
+
+    """
+    raw = stats.stats
+    callees = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+    totals = {}
+    # Each entry is (path, function, seconds of cumulative time on this path).
+    # Stacks start at functions called from outside the profiled code,
+    # such as the task function of a worker
+    to_visit = []
+    for func, (_, _, _, cumulative, callers) in raw.items():
+        inside = sum(edge[3] for caller, edge in callers.items() if caller in raw)
+        if cumulative - inside >= min_seconds:
+            to_visit.append(((), func, cumulative - inside))
+    while to_visit:
+        path, func, seconds = to_visit.pop()
+        path = path + (_label(func),)
+        _, _, inline_time, cumulative, _ = raw[func]
+        share = seconds / cumulative if cumulative > 0 else 0.0
+        key = ";".join(path)
+        totals[key] = totals.get(key, 0.0) + inline_time * share
+        if len(path) >= max_depth:
+            continue
+        for callee, edge_seconds in callees.get(func, []):
+            child_seconds = edge_seconds * share
+            if (child_seconds >= min_seconds) and (_label(callee) not in path):
+                to_visit.append((path, callee, child_seconds))
+    lines = [
+        (stack, int(round(seconds * 1e6)))
+        for stack, seconds in totals.items()
+        if seconds >= min_seconds
+    ]
+    lines.sort(key=lambda x: x[1], reverse=True)
+    return ["{} {}".format(stack, value) for stack, value in lines]
+
+
+def save_profile(profile_dir, num_rows=40):
+    """
+    Merge the profiles in profile_dir and save a report and collapsed stacks.
+
+    Parameters
+    ----------
+    profile_dir : str
+        The directory passed to start_profiling.
+    num_rows : int, optional
+        The number of functions in the report, by default 40.
+
+    Returns
+    -------
+    pstats.Stats or None
+        The merged statistics, or None if nothing was profiled.
+
+    """
+    stats = load_profiles(profile_dir)
+    if stats is None:
+        return None
+    stats.dump_stats(os.path.join(profile_dir, MERGED_NAME))
+
+    report = os.path.join(profile_dir, REPORT_NAME)
+    with open(report + ".tmp", "w") as f:
+        f.write("Merged profile of {} processes\n".format(len(stats.files)))
+        report_stats = pstats.Stats(stream=f)
+        report_stats.add(stats)
+        report_stats.sort_stats("cumulative").print_stats(num_rows)
+        report_stats.sort_stats("tottime").print_stats(num_rows)
+    os.replace(report + ".tmp", report)
+
+    collapsed = os.path.join(profile_dir, COLLAPSED_NAME)
+    with open(collapsed + ".tmp", "w") as f:
+        for line in collapsed_stacks(stats):
+            f.write(line + "\n")
+    os.replace(collapsed + ".tmp", collapsed)
+    return stats
+
+
+def print_hot_spots(stats, num_rows=10):
+    """Print the functions with the largest cumulative and own time."""
+    # Entries of pstats are (primitive calls, calls, own, cumulative, callers)
+    for index, name in ((3, "cumulative"), (2, "own")):
+        entries = sorted(stats.stats.items(), key=lambda x: x[1][index], reverse=True)
+        print("Functions with the most {} time:".format(name))
+        for func, entry in entries[:num_rows]:
+            print(
+                "    {:.2f}s {} ({} calls)".format(entry[index], _label(func), entry[1])
+            )
+
+
+@contextmanager
+def profiling(profile_dir):
+    """
+    Profile the body of a with statement to profile_dir and save a report.
+
+    Profiles from earlier runs in profile_dir are removed first.
+    Does nothing if profile_dir is None.
+
+    """
+    if profile_dir is None:
+        yield
+        return
+    stop_profiling()
+    if os.path.isdir(profile_dir):
+        clear_profiles(profile_dir)
+    start_profiling(profile_dir)
+    try:
+        with profiled():
+            yield
+    finally:
+        stop_profiling()
+        stats = save_profile(profile_dir)
+        if stats is not None:
+            print_hot_spots(stats)
+            print(
+                "Saved profile report to {}, and collapsed stacks for "
+                "flame graphs to {}".format(
+                    os.path.join(profile_dir, REPORT_NAME),
+                    os.path.join(profile_dir, COLLAPSED_NAME),
+                )
+            )
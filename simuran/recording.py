@@ -1,5 +1,8 @@
 """This module holds single experiment related information."""
 import os
+import time
+from collections import OrderedDict
+
 import numpy as np
 
 from simuran.base_class import BaseSimuran
@@ -9,6 +12,8 @@ from simuran.base_signal import BaseSignal
 from simuran.single_unit import SingleUnit
 from simuran.spatial import Spatial
 from simuran.loaders.loader_list import loaders_dict
+from simuran.memory_profiler import profile_memory
+from simuran.tracer import trace
 from skm_pyutils.py_config import split_dict
 
 
@@ -46,6 +51,8 @@ class Recording(BaseSimuran):
         the directory where they are all located, or a file listing them.
     source_files : dict
         A dictionary describing the source files for each attribute.
+    load_times : collections.OrderedDict
+        The seconds taken to load each available attribute on the last load.
 
     Parameters
     ----------
@@ -75,15 +82,21 @@ class Recording(BaseSimuran):
         self.param_handler = None
         self.source_file = base_file
         self.source_files = {}
+        self.load_times = OrderedDict()
         if param_file is not None:
             self._setup_from_file(param_file, load=load)
         elif params is not None:
             self._setup_from_dict(params, load=load)
 
     def load(self, *args, **kwargs):
-        """Load each available attribute."""
-        for item in self.get_available():
-            item.load()
+        """Load each available attribute, timing each in self.load_times."""
+        self.load_times = OrderedDict()
+        for name in self.available:
+            start_time = time.perf_counter()
+            with trace(name, "load", recording=self.source_file):
+                with profile_memory("load", name):
+                    getattr(self, name).load()
+            self.load_times[name] = time.perf_counter() - start_time
 
     def get_available(self):
         """Get the available attributes."""
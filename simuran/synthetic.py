@@ -0,0 +1,392 @@
+"""
+This module writes synthetic recordings in the Axona file format.
+
+The files are read by the NeuroChaT Axona loaders in simuran.loaders.nc_loader,
+so benchmarks and tests can run on datasets of any size without downloads.
+Each recording is a directory holding a .set file, an .eeg file per channel,
+a spike file and .cut file per tetrode, a position .txt file,
+and a simuran_params.py file describing them for
+simuran.recording_container.RecordingContainer.auto_setup.
+The data is random, but the same seed always gives the same files.
+make_results_tree writes batch outputs for the merge routines in the same way.
+"""
+
+import os
+import itertools
+
+import numpy as np
+
+AXONA_TIMEBASE = 96000
+SAMPLES_PER_SPIKE = 50
+CHANNELS_PER_TETRODE = 4
+_BYTES_PER_TIMESTAMP = 4
+_DATA_END = b"\r\ndata_end\r\n"
+
+PARAMS_TEMPLATE = '''"""Parameters of a synthetic Axona recording."""
+
+mapping = {{
+    "signals": {{
+        "num_signals": {num_channels},
+        "region": {regions},
+        "group": {groups},
+        "sampling_rate": {sampling_rates},
+        "channels": {channels},
+    }},
+    "units": {{
+        "num_groups": {num_tetrodes},
+        "region": {unit_regions},
+        "group": {tetrodes},
+    }},
+    "spatial": {{"arena_size": "default"}},
+    "loader": "nc_loader",
+    "loader_kwargs": {{"system": "Axona"}},
+}}
+'''
+
+
+def _header(lines):
+    return "".join(
+        "{} {}\r\n".format(key, value) for key, value in lines
+    ).encode("latin-1")
+
+
+def _common_header(duration):
+    return [
+        ("trial_date", "Wednesday, 1 Jan 2020"),
+        ("trial_time", "10:00:00"),
+        ("experimenter", "simuran"),
+        ("comments", "synthetic"),
+        ("duration", int(np.ceil(duration))),
+        ("sw_version", "1.2.2.16"),
+    ]
+
+
+def write_set_file(location, num_channels, num_tetrodes, duration):
+    """
+    Write an Axona .set file with the gains and channel map of a recording.
+
+    Parameters
+    ----------
+    location : str
+        The path to write the .set file to.
+    num_channels : int
+        The number of .eeg channels.
+    num_tetrodes : int
+        The number of tetrodes.
+    duration : float
+        The length of the recording in seconds.
+
+    Returns
+    -------
+    None
+
+    """
+    num_adc = max(num_channels, num_tetrodes * CHANNELS_PER_TETRODE)
+    lines = _common_header(duration) + [("ADC_fullscale_mv", 1500)]
+    lines += [("gain_ch_{}".format(i), 10000) for i in range(num_adc)]
+    lines += [("EEG_ch_{}".format(i + 1), i + 1) for i in range(num_channels)]
+    with open(location, "wb") as f:
+        f.write(_header(lines))
+
+
+def write_eeg_file(location, samples, sample_rate, duration):
+    """
+    Write 8 bit samples to an Axona .eeg file.
+
+    Parameters
+    ----------
+    location : str
+        The path to write to, such as name.eeg or name.eeg2.
+    samples : numpy.ndarray
+        The samples, which are clipped to the int8 range.
+    sample_rate : int
+        The sampling rate of the samples in Hz.
+    duration : float
+        The length of the recording in seconds.
+
+    Returns
+    -------
+    None
+
+    """
+    lines = _common_header(duration) + [
+        ("num_chans", 1),
+        ("sample_rate", "{:.1f} hz".format(sample_rate)),
+        ("bytes_per_sample", 1),
+        ("num_EEG_samples", len(samples)),
+    ]
+    data = np.clip(np.round(samples), -128, 127).astype(np.int8)
+    with open(location, "wb") as f:
+        f.write(_header(lines))
+        f.write(b"data_start")
+        f.write(data.tobytes())
+        f.write(_DATA_END)
+
+
+def write_spike_file(location, spike_times, waveforms, duration):
+    """
+    Write spikes to an Axona tetrode file, such as name.1.
+
+    Parameters
+    ----------
+    location : str
+        The path to write to.
+    spike_times : numpy.ndarray
+        The time of each spike in seconds.
+    waveforms : numpy.ndarray
+        The int8 waveforms, of shape (spikes, 4, SAMPLES_PER_SPIKE).
+    duration : float
+        The length of the recording in seconds.
+
+    Returns
+    -------
+    None
+
+    """
+    num_spikes = len(spike_times)
+    lines = _common_header(duration) + [
+        ("num_chans", CHANNELS_PER_TETRODE),
+        ("timebase", "{} hz".format(AXONA_TIMEBASE)),
+        ("bytes_per_timestamp", _BYTES_PER_TIMESTAMP),
+        ("samples_per_spike", SAMPLES_PER_SPIKE),
+        ("sample_rate", "48000 hz"),
+        ("bytes_per_sample", 1),
+        ("spike_format", "t,ch1,t,ch2,t,ch3,t,ch4"),
+        ("num_spikes", num_spikes),
+    ]
+    # Each spike stores a big endian timestamp before the samples of each channel
+    record = np.dtype(
+        [("time", ">u4"), ("samples", "i1", (SAMPLES_PER_SPIKE,))]
+    )
+    data = np.zeros((num_spikes, CHANNELS_PER_TETRODE), dtype=record)
+    stamps = np.round(np.asarray(spike_times) * AXONA_TIMEBASE).astype(np.uint32)
+    data["time"] = stamps[:, np.newaxis]
+    data["samples"] = waveforms
+    with open(location, "wb") as f:
+        f.write(_header(lines))
+        f.write(b"data_start")
+        f.write(data.tobytes())
+        f.write(_DATA_END)
+
+
+def write_cut_file(location, unit_tags, spike_file_name):
+    """Write the cluster of each spike to an Axona .cut file."""
+    num_clusters = int(np.max(unit_tags)) + 1 if len(unit_tags) else 0
+    with open(location, "w") as f:
+        f.write("n_clusters: {}\n".format(num_clusters))
+        f.write(
+            "Exact_cut_for: {} spikes: {}\n".format(spike_file_name, len(unit_tags))
+        )
+        f.write(" ".join(str(tag) for tag in unit_tags))
+        f.write("\n")
+
+
+def write_position_file(location, times, x, y, direction, speed, pixels=400):
+    """Write position data in the .txt format NeuroChaT exports for Axona."""
+    with open(location, "w") as f:
+        f.write("Pixels per metre: {}\n".format(pixels))
+        f.write("time X Y Direction Speed\n")
+        np.savetxt(
+            f, np.column_stack([times, x, y, direction, speed]), fmt="%.4f"
+        )
+
+
+def write_axona_recording(
+    out_dir,
+    name="synthetic",
+    num_channels=2,
+    num_tetrodes=1,
+    duration=60.0,
+    spike_rate=5.0,
+    num_units=3,
+    sample_rate=250,
+    position_rate=50,
+    seed=0,
+    write_params=True,
+):
+    """
+    Write a synthetic Axona recording to out_dir.
+
+    Parameters
+    ----------
+    out_dir : str
+        The directory to write the recording to, created if needed.
+    name : str, optional
+        The base name of the recording files, by default "synthetic".
+    num_channels : int, optional
+        The number of .eeg channels, by default 2.
+    num_tetrodes : int, optional
+        The number of tetrodes, by default 1.
+    duration : float, optional
+        The length of the recording in seconds, by default 60.0.
+    spike_rate : float, optional
+        The mean firing rate of each unit in Hz, by default 5.0.
+    num_units : int, optional
+        The number of units on each tetrode, by default 3.
+    sample_rate : int, optional
+        The sampling rate of the .eeg files in Hz, by default 250.
+    position_rate : int, optional
+        The sampling rate of the position data in Hz, by default 50.
+    seed : int, optional
+        The seed of the random data, by default 0.
+    write_params : bool, optional
+        Whether to write a simuran_params.py file, by default True.
+
+    Returns
+    -------
+    str
+        The path to the .set file.
+
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.RandomState(seed)
+    base = os.path.join(out_dir, name)
+    write_set_file(base + ".set", num_channels, num_tetrodes, duration)
+
+    # A theta rhythm with noise, scaled to use most of the 8 bit range
+    num_samples = int(duration * sample_rate)
+    lfp_time = np.arange(num_samples) / sample_rate
+    for c in range(num_channels):
+        samples = 60 * np.sin(2 * np.pi * 8 * lfp_time + c) + rng.normal(
+            0, 20, num_samples
+        )
+        extension = ".eeg" if c == 0 else ".eeg{}".format(c + 1)
+        write_eeg_file(base + extension, samples, sample_rate, duration)
+
+    spike_shape = np.exp(-0.5 * ((np.arange(SAMPLES_PER_SPIKE) - 10) / 3.0) ** 2)
+    for t in range(num_tetrodes):
+        num_spikes = rng.poisson(spike_rate * num_units * duration)
+        spike_times = np.sort(rng.uniform(0, duration, num_spikes))
+        unit_tags = rng.randint(1, num_units + 1, num_spikes)
+        amplitudes = rng.uniform(20, 100, (num_units + 1, CHANNELS_PER_TETRODE))
+        waveforms = (
+            amplitudes[unit_tags][:, :, np.newaxis] * spike_shape
+            + rng.normal(0, 5, (num_spikes, CHANNELS_PER_TETRODE, SAMPLES_PER_SPIKE))
+        )
+        waveforms = np.clip(np.round(waveforms), -128, 127).astype(np.int8)
+        spike_name = "{}.{}".format(base, t + 1)
+        write_spike_file(spike_name, spike_times, waveforms, duration)
+        write_cut_file(
+            "{}_{}.cut".format(base, t + 1), unit_tags, os.path.basename(spike_name)
+        )
+
+    # A random walk in a 100 by 100 box
+    num_positions = int(duration * position_rate)
+    steps = rng.normal(0, 1, (num_positions, 2))
+    position = np.abs((np.cumsum(steps, axis=0) + 50) % 200 - 100)
+    velocity = np.diff(position, axis=0, prepend=position[:1])
+    write_position_file(
+        base + "_1.txt",
+        np.arange(num_positions) / position_rate,
+        position[:, 0],
+        position[:, 1],
+        np.degrees(np.arctan2(velocity[:, 1], velocity[:, 0])) % 360,
+        np.hypot(velocity[:, 0], velocity[:, 1]) * position_rate,
+    )
+
+    if write_params:
+        with open(os.path.join(out_dir, "simuran_params.py"), "w") as f:
+            f.write(
+                PARAMS_TEMPLATE.format(
+                    num_channels=num_channels,
+                    regions=["CA1"] * num_channels,
+                    groups=[1] * num_channels,
+                    sampling_rates=[sample_rate] * num_channels,
+                    channels=[c + 1 for c in range(num_channels)],
+                    num_tetrodes=num_tetrodes,
+                    unit_regions=["CA1"] * num_tetrodes,
+                    tetrodes=[t + 1 for t in range(num_tetrodes)],
+                )
+            )
+
+    return base + ".set"
+
+
+def make_axona_dataset(out_dir, fan_out=(2, 2), seed=0, **kwargs):
+    """
+    Write a directory tree of synthetic Axona recordings.
+
+    Parameters
+    ----------
+    out_dir : str
+        The directory to write the dataset to.
+    fan_out : tuple of int, optional
+        The number of subdirectories at each level of the tree,
+        by default (2, 2), which writes out_dir/d0/d0 to out_dir/d1/d1.
+        A recording is written to each directory at the last level.
+    seed : int, optional
+        The seed of the first recording, by default 0.
+        Each recording uses a different seed.
+    **kwargs : keyword arguments
+        Passed to write_axona_recording.
+
+    Returns
+    -------
+    list of str
+        The path to the .set file of each recording.
+
+    """
+    set_files = []
+    levels = [range(n) for n in fan_out]
+    for i, path in enumerate(itertools.product(*levels)):
+        rec_dir = os.path.join(out_dir, *["d{}".format(p) for p in path])
+        name = "rec" + "_".join(str(p) for p in path)
+        set_files.append(
+            write_axona_recording(rec_dir, name=name, seed=seed + i, **kwargs)
+        )
+    return set_files
+
+
+def make_results_tree(out_dir, num_dirs, rows=20, figures=5, seed=0):
+    """
+    Write a directory tree of batch outputs, as merged by simuran.main.merge.
+
+    Parameters
+    ----------
+    out_dir : str
+        The directory to write the outputs to.
+    num_dirs : int
+        The number of batch output directories, out_dir/batch0 and so on.
+        Each holds sim_results/results.csv and sim_results/plots.
+    rows : int, optional
+        The number of rows of random numbers in each csv file, by default 20.
+    figures : int, optional
+        The number of small png figures in each plots directory, by default 5.
+    seed : int, optional
+        The seed of the random numbers, by default 0.
+
+    Returns
+    -------
+    list of str
+        The path to each csv file.
+
+    """
+    rng = np.random.RandomState(seed)
+    png = _png_bytes() if figures > 0 else b""
+    csv_files = []
+    for d in range(num_dirs):
+        sub_dir = os.path.join(out_dir, "batch{}".format(d), "sim_results")
+        os.makedirs(os.path.join(sub_dir, "plots"), exist_ok=True)
+        csv_files.append(os.path.join(sub_dir, "results.csv"))
+        with open(csv_files[-1], "w") as f:
+            f.write("Recording,Name,mean,std,rate,count\n")
+            for r in range(rows):
+                values = ",".join("{:.4f}".format(v) for v in rng.rand(4))
+                f.write("rec{},name{},{}\n".format(r, r, values))
+        for i in range(figures):
+            fname = os.path.join(sub_dir, "plots", "fig{}.png".format(i))
+            with open(fname, "wb") as f:
+                f.write(png)
+    return csv_files
+
+
+def _png_bytes():
+    """Return a small png of a line plot, made without pyplot."""
+    import io
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(2, 2))
+    fig.add_subplot(1, 1, 1).plot([0, 1], [1, 0])
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    return buffer.getvalue()
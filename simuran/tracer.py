@@ -0,0 +1,229 @@
+"""
+This module records a timeline of a run in the Chrome trace event format.
+
+Tracing is off by default and costs a single check per traced block.
+Once started with start_tracing, each process appends begin and end events
+to its own file in the trace directory, so events from worker processes,
+including those that crash, are kept. Worker pools and job queues pass the
+trace directory on to their workers. save_trace combines the files into
+a single JSON file, which can be opened in https://ui.perfetto.dev
+or chrome://tracing.
+"""
+
+import os
+import json
+import glob
+import time
+import socket
+import threading
+from functools import wraps
+from contextlib import contextmanager
+
+TRACE_DIR_ENV = "SIMURAN_TRACE_DIR"
+TRACE_NAME = "trace.json"
+
+_trace_dir = os.environ.get(TRACE_DIR_ENV, None) or None
+_trace_file = None
+_trace_path = None
+_trace_lock = threading.Lock()
+# Native thread ids match those shown by system tools, but need Python 3.8
+_thread_id = getattr(threading, "get_native_id", threading.get_ident)
+
+
+def start_tracing(trace_dir):
+    """
+    Record trace events from this process, and processes it starts, to trace_dir.
+
+    Parameters
+    ----------
+    trace_dir : str
+        The directory to write event files to, created if it does not exist.
+
+    Returns
+    -------
+    None
+
+    """
+    global _trace_dir
+    trace_dir = os.path.abspath(trace_dir)
+    if trace_dir == _trace_dir:
+        return
+    stop_tracing()
+    os.makedirs(trace_dir, exist_ok=True)
+    _trace_dir = trace_dir
+    os.environ[TRACE_DIR_ENV] = trace_dir
+
+
+def stop_tracing():
+    """Stop recording trace events in this process."""
+    global _trace_dir, _trace_file
+    with _trace_lock:
+        if _trace_file is not None:
+            _trace_file.close()
+            _trace_file = None
+    _trace_dir = None
+    os.environ.pop(TRACE_DIR_ENV, None)
+
+
+def set_trace_dir(trace_dir):
+    """
+    Start tracing to trace_dir, or stop tracing if trace_dir is None.
+
+    This is called by workers before each task. If the event file
+    of this process was removed by a new trace, a new one is started.
+
+    """
+    global _trace_file
+    if trace_dir is None:
+        if _trace_dir is not None:
+            stop_tracing()
+        return
+    start_tracing(trace_dir)
+    with _trace_lock:
+        if (_trace_file is not None) and not os.path.isfile(_trace_path):
+            _trace_file.close()
+            _trace_file = None
+
+
+def clear_trace(trace_dir):
+    """Remove the event files and trace in trace_dir from an earlier run."""
+    for fname in glob.glob(os.path.join(trace_dir, "events-*.jsonl")):
+        os.remove(fname)
+    if os.path.isfile(os.path.join(trace_dir, TRACE_NAME)):
+        os.remove(os.path.join(trace_dir, TRACE_NAME))
+
+
+def get_trace_dir():
+    """Return the directory trace events are written to, or None if not tracing."""
+    return _trace_dir
+
+
+def _write_event(phase, name, category, args):
+    global _trace_file, _trace_path
+    event = {
+        "name": name,
+        "cat": category,
+        "ph": phase,
+        "ts": int(time.time() * 1e6),
+        "pid": os.getpid(),
+        "tid": _thread_id(),
+    }
+    if args:
+        event["args"] = args
+    with _trace_lock:
+        if _trace_dir is None:
+            return
+        if _trace_file is None:
+            name = "{}-{}".format(socket.gethostname(), os.getpid())
+            _trace_path = os.path.join(_trace_dir, "events-{}.jsonl".format(name))
+            _trace_file = open(_trace_path, "a")
+            process_name = {
+                "name": "process_name",
+                "ph": "M",
+                "pid": event["pid"],
+                "args": {"name": name},
+            }
+            _trace_file.write(json.dumps(process_name) + "\n")
+        _trace_file.write(json.dumps(event, default=str) + "\n")
+        _trace_file.flush()
+
+
+@contextmanager
+def trace(name, category, **args):
+    """
+    Record the body of a with statement as an event on the timeline.
+
+    Parameters
+    ----------
+    name : str
+        The name of the event, such as a function or recording name.
+    category : str
+        The kind of event, such as "batch", "recording", "load",
+        "function", "figures", or "io".
+    **args : keyword arguments
+        Extra information to show with the event.
+
+    """
+    if _trace_dir is None:
+        yield
+        return
+    _write_event("B", name, category, args)
+    try:
+        yield
+    finally:
+        _write_event("E", name, category, None)
+
+
+def traced(category):
+    """Return a decorator that records each call of a function as an event."""
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _trace_dir is None:
+                return fn(*args, **kwargs)
+            with trace(fn.__name__, category):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def save_trace(trace_dir, location=None):
+    """
+    Combine the event files in trace_dir into a Chrome trace JSON file.
+
+    Parameters
+    ----------
+    trace_dir : str
+        The directory passed to start_tracing.
+    location : str, optional
+        The path to save the trace to, by default trace_dir/trace.json.
+
+    Returns
+    -------
+    str
+        The path to the saved trace.
+
+    """
+    location = os.path.join(trace_dir, TRACE_NAME) if location is None else location
+    events = []
+    for fname in sorted(glob.glob(os.path.join(trace_dir, "events-*.jsonl"))):
+        with open(fname, "r") as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    # The last line of a process killed while writing
+                    continue
+    events.sort(key=lambda event: event.get("ts", 0))
+    temp_name = location + ".tmp"
+    with open(temp_name, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    os.replace(temp_name, location)
+    return location
+
+
+@contextmanager
+def tracing(trace_dir):
+    """
+    Trace the body of a with statement to trace_dir and save the trace.
+
+    Events from earlier runs in trace_dir are removed first.
+    Does nothing if trace_dir is None.
+
+    """
+    if trace_dir is None:
+        yield
+        return
+    stop_tracing()
+    if os.path.isdir(trace_dir):
+        clear_trace(trace_dir)
+    start_tracing(trace_dir)
+    try:
+        yield
+    finally:
+        stop_tracing()
+        location = save_trace(trace_dir)
+        print("Saved trace to {}, open it in https://ui.perfetto.dev".format(location))
@@ -0,0 +1,24 @@
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--update-baselines",
+        action="store_true",
+        help="Save the measurements of the perf tests as their new baselines",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "perf: performance regression test, run with pytest -m perf"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if "perf" in config.getoption("markexpr"):
+        return
+    skip_perf = pytest.mark.skip(reason="performance test, run with pytest -m perf")
+    for item in items:
+        if "perf" in item.keywords:
+            item.add_marker(skip_perf)
@@ -0,0 +1,95 @@
+import os
+import tempfile
+
+from simuran.analysis.analysis_handler import AnalysisHandler
+from simuran.analysis.cache import AnalysisCache
+from simuran.single_unit import SingleUnit
+
+calls = []
+
+
+def count_spikes(unit, scale):
+    calls.append(scale)
+    return {"count": scale * 2}
+
+
+def test_analysis_cache():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source = os.path.join(temp_dir, "unit.2")
+        with open(source, "w") as f:
+            f.write("spikes")
+        unit = SingleUnit()
+        unit.set_source_file({"Spike": source, "Clusters": None})
+
+        cache = AnalysisCache(os.path.join(temp_dir, "cache"))
+        ah = AnalysisHandler(cache=cache)
+        ah.add_fn(count_spikes, unit, 1)
+        ah.add_fn(count_spikes, unit, 2)
+        ah.run_all_fns()
+        assert calls == [1, 2]
+
+        ah.reset_results()
+        ah.run_all_fns()
+        assert calls == [1, 2]
+        assert ah.results["count_spikes_1"] == {"count": 4}
+
+        with open(source, "w") as f:
+            f.write("more spikes")
+        ah.reset_results()
+        ah.run_all_fns()
+        assert calls == [1, 2, 1, 2]
+
+        name = "{}.count_spikes".format(__name__)
+        assert cache.stats[name] == {"hits": 2, "misses": 4}
+
+
+def scale_value(value):
+    return value * 2
+
+
+def test_cache_keys():
+    import subprocess
+    import sys
+
+    import simuran
+    from simuran.analysis.cache import cache_depends_on
+
+    # Sets iterate in an order that depends on the string hash seed
+    code = (
+        "from simuran.analysis.cache import AnalysisCache\n"
+        "args = ({'a', 'b', 'c', 'd'}, {'x': frozenset({'e', 'f', 'g'})})\n"
+        "print(AnalysisCache('').get_key(abs, args, {'s': {'h', 'i'}}))\n"
+    )
+    keys = set()
+    for seed in ("1", "2", "3"):
+        env = dict(os.environ, PYTHONHASHSEED=seed)
+        env["PYTHONPATH"] = os.path.dirname(os.path.dirname(simuran.__file__))
+        output = subprocess.check_output([sys.executable, "-c", code], env=env)
+        keys.add(output.strip())
+    assert len(keys) == 1
+
+    cache = AnalysisCache("")
+    key = cache.get_key(count_spikes, (None, 1), {})
+
+    # The source of a helper is only in the key once it is declared
+    namespace = {}
+    exec("def helper(value):\n    return value + 1\n", namespace)
+    cache_depends_on(namespace["helper"])(count_spikes)
+    try:
+        with_helper = cache.get_key(count_spikes, (None, 1), {})
+        assert with_helper != key
+        exec("def helper(value):\n    return value + 2\n", namespace)
+        cache_depends_on(namespace["helper"])(count_spikes)
+        assert cache.get_key(count_spikes, (None, 1), {}) != with_helper
+        cache_depends_on(scale_value, version=2)(count_spikes)
+        versioned = cache.get_key(count_spikes, (None, 1), {})
+        cache_depends_on(scale_value, version=3)(count_spikes)
+        assert cache.get_key(count_spikes, (None, 1), {}) != versioned
+    finally:
+        del count_spikes.cache_dependencies, count_spikes.cache_version
+    assert cache.get_key(count_spikes, (None, 1), {}) == key
+
+
+if __name__ == "__main__":
+    test_analysis_cache()
+    test_cache_keys()
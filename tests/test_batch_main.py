@@ -0,0 +1,135 @@
+import os
+import tempfile
+
+import pytest
+
+FN_PARAMS = """
+def count(recording):
+    return 1
+
+
+fn_params = {
+    "run": [count],
+    "save": [("results", "count")],
+    "select_recordings": None,
+}
+"""
+
+
+def write_file(location, text):
+    os.makedirs(os.path.dirname(location), exist_ok=True)
+    with open(location, "w") as f:
+        f.write(text)
+
+
+def make_run_list(temp_dir, names, **extra):
+    """Return a run list analysing a small dataset with a batch config per name."""
+    from simuran.synthetic import make_axona_dataset
+
+    data_dir = os.path.join(temp_dir, "data")
+    make_axona_dataset(
+        data_dir, fan_out=(2,), duration=2, num_channels=1, num_tetrodes=1
+    )
+    fn_loc = os.path.join(temp_dir, "configs", "fn_params.py")
+    write_file(fn_loc, FN_PARAMS)
+    run_list = []
+    for name in names:
+        batch_loc = os.path.join(temp_dir, "configs", name, "simuran_batch_params.py")
+        base_loc = os.path.join(os.path.dirname(batch_loc), "simuran_base_params.py")
+        write_file(base_loc, "mapping = {}\n")
+        params = {
+            "start_dir": data_dir,
+            "regex_filters": [],
+            "overwrite": True,
+            "only_check": False,
+            "interactive": False,
+            "mapping": {},
+            "mapping_file": base_loc,
+            "out_basename": "simuran_params.py",
+            "delete_old_files": False,
+        }
+        write_file(batch_loc, "params = {!r}\n".format(params))
+        run_dict = {
+            "batch_param_loc": batch_loc,
+            "fn_param_loc": fn_loc,
+            "file_list_name": "file_list_{}.txt".format(name),
+            "cell_list_name": "cell_list_{}.txt".format(name),
+        }
+        run_dict.update(extra)
+        run_list.append(run_dict)
+    return run_list
+
+
+def test_batch_shard_weight():
+    from simuran.main.batch_main import batch_main
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        run_list = make_run_list(temp_dir, ["a", "b"], shard_weight=2)
+        for shard in ((0, 2), (1, 2)):
+            results, recordings = batch_main(
+                run_list,
+                num_cpus=1,
+                shard=shard,
+                save_info=True,
+                do_batch_setup=False,
+                do_cell_picker=False,
+                check_params=False,
+            )
+            assert results == [[{"results_count": 1}] * 2]
+            assert len(recordings[0]) == 2
+
+
+def test_batch_iteration_timeout():
+    from simuran.main.batch_main import batch_main
+    from simuran.main.worker_pool import shutdown_worker_pool
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        run_list = make_run_list(temp_dir, ["a"])
+        try:
+            # The iteration runs in a pool worker, which can not start its own pool
+            results, _ = batch_main(
+                run_list,
+                num_cpus=2,
+                iteration_timeout=120,
+                save_info=True,
+                do_batch_setup=False,
+                do_cell_picker=False,
+                check_params=False,
+            )
+        finally:
+            shutdown_worker_pool()
+        assert results == [[{"results_count": 1}] * 2]
+
+
+def test_batch_tables_same_name():
+    pytest.importorskip("pyarrow")
+    from simuran.main.batch_main import batch_main
+    from simuran.main.table_store import open_result_table
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Both batch configs are named simuran_batch_params.py
+        run_list = make_run_list(temp_dir, ["a", "b"])
+        table_dir = os.path.join(temp_dir, "sim_results", "tables")
+        batch_main(
+            run_list,
+            num_cpus=1,
+            save_info=True,
+            do_batch_setup=False,
+            do_cell_picker=False,
+            check_params=False,
+            table_format="parquet",
+            table_dir=table_dir,
+        )
+        summary = open_result_table(table_dir, fmt="parquet")
+        frame = summary.to_table().to_pandas()
+        assert len(frame) == 4
+        batches = set(frame["batch"])
+        assert len(batches) == 2
+        for batch in batches:
+            assert batch.startswith("simuran_batch_params-")
+
+
+if __name__ == "__main__":
+    test_batch_shard_weight()
+    test_batch_iteration_timeout()
+    test_batch_tables_same_name()
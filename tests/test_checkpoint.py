@@ -0,0 +1,39 @@
+import os
+import tempfile
+
+
+def test_checkpoint_resume():
+    from simuran.main.checkpoint import (
+        config_fingerprint,
+        save_checkpoint,
+        load_checkpoint,
+        is_checkpoint_valid,
+        assemble_checkpoints,
+    )
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        batch_loc = os.path.join(temp_dir, "batch_params.py")
+        fn_loc = os.path.join(temp_dir, "fn_params.py")
+        with open(batch_loc, "w") as f:
+            f.write("params = {}\n")
+        with open(fn_loc, "w") as f:
+            f.write("fn_params = {'run': []}\n")
+        checkpoint_dir = os.path.join(temp_dir, "checkpoints")
+
+        fingerprint = config_fingerprint(batch_loc, fn_loc, {"file_list_name": "a"})
+        save_checkpoint(checkpoint_dir, 1, (1, [{"a": 1}], ["rec1"]), fingerprint)
+        assert is_checkpoint_valid(checkpoint_dir, 1, fingerprint)
+        assert not is_checkpoint_valid(checkpoint_dir, 0, fingerprint)
+        assert os.listdir(checkpoint_dir) == ["iteration_00001.pickle"]
+
+        with open(fn_loc, "a") as f:
+            f.write("# changed\n")
+        new_fingerprint = config_fingerprint(batch_loc, fn_loc, {"file_list_name": "a"})
+        assert new_fingerprint != fingerprint
+        assert load_checkpoint(checkpoint_dir, 1, new_fingerprint) is None
+
+        assert assemble_checkpoints(checkpoint_dir, 2) == ([[], [{"a": 1}]], [[], ["rec1"]])
+
+
+if __name__ == "__main__":
+    test_checkpoint_resume()
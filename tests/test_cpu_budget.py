@@ -0,0 +1,19 @@
+import os
+
+
+def test_split_cpu_budget():
+    from simuran.main.cpu_budget import split_cpu_budget, thread_limited_env
+
+    assert split_cpu_budget(32, 200) == (32, 1, 1)
+    assert split_cpu_budget(32, 4) == (4, 1, 8)
+    assert split_cpu_budget(32, 1) == (1, 32, 32)
+    assert split_cpu_budget(1, 10) == (1, 1, 1)
+
+    old_value = os.environ.get("OMP_NUM_THREADS", None)
+    with thread_limited_env(3):
+        assert os.environ["OMP_NUM_THREADS"] == "3"
+    assert os.environ.get("OMP_NUM_THREADS", None) == old_value
+
+
+if __name__ == "__main__":
+    test_split_cpu_budget()
@@ -30,5 +30,57 @@ def test_numpy_container():
     assert container.get_possible_values("size") == [100, 200]
 
 
+def test_data_from_attr_list():
+    import os
+
+    from simuran.recording import Recording
+    from simuran.recording_container import RecordingContainer
+
+    rc = RecordingContainer()
+    for i in range(40):
+        recording = Recording(base_file=os.path.join("data", "rec{}.set".format(i)))
+        recording.results = {
+            "fn": {"rate": i + 0.0005, "peak": np.float64(i / 8), "count": i},
+            "summary": {"label": "rec{}".format(i), "ok": i % 2 == 0},
+            "get_items": lambda: [1, 2],
+        }
+        rc.append(recording)
+    # Every row other than one has the same keys
+    rc[-1].results["summary"]["extra"] = 2.675
+    attr_list = [
+        ("results", "fn", "rate"),
+        ("results", "fn", "peak"),
+        ("results", "fn", "count"),
+        ("results", "summary"),
+        ("results", "get_items"),
+        ("results", "fn", "keys"),
+    ]
+    rows = rc.data_from_attr_list(attr_list, decimals=2)
+    for recording, row in zip(rc, rows):
+        expected = {}
+        for key, value in recording.data_dict_from_attr_list(attr_list).items():
+            try:
+                expected[key] = round(value, 2)
+            except TypeError:
+                expected[key] = value
+        assert list(row) == list(expected)
+        for key, value in expected.items():
+            assert type(row[key]) is type(value)
+            assert row[key] == value
+    assert rows[1]["results_fn_rate"] == 1.0
+    assert type(rows[1]["results_fn_peak"]) is np.float64
+    assert rows[1]["results_fn_peak"] == 0.12
+    assert rows[2]["ok"] == 1
+    assert rows[3]["results_get_items"] == [1, 2]
+    assert list(rows[3]["results_fn_keys"]) == ["rate", "peak", "count"]
+    assert rows[-1]["extra"] == 2.67
+    assert rc.data_from_attr_list(attr_list, idx=3, decimals=2) == rows[3]
+
+    friendly_names = ["Rate", "Peak", "Count", "", "Items", "Keys"]
+    row = rc.data_from_attr_list(attr_list, friendly_names=friendly_names, idx=0)
+    assert list(row)[:3] == ["Rate", "Peak", "Count"]
+
+
 if __name__ == "__main__":
     test_numpy_container()
+    test_data_from_attr_list()
@@ -0,0 +1,44 @@
+import os
+import sys
+import subprocess
+import tempfile
+
+
+def test_job_queue():
+    from simuran.main.job_queue import JobQueue
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        job_queue = JobQueue(temp_dir, lease_time=60)
+        names = job_queue.submit(pow, [(i, 2) for i in range(6)])
+
+        # A worker that claimed a task and then stopped responding
+        name, claimed_path, _ = job_queue.claim("lost-worker")
+        assert job_queue.requeue_expired() == []
+        os.utime(claimed_path, (0, 0))
+        assert job_queue.requeue_expired() == [name]
+
+        code = (
+            "from simuran.main.job_queue import run_worker; "
+            "run_worker({!r}, poll_interval=0.1, exit_when_empty=True)".format(temp_dir)
+        )
+        workers = [subprocess.Popen([sys.executable, "-c", code]) for _ in range(2)]
+        outputs = dict(job_queue.wait(names, poll_interval=0.1))
+        for worker in workers:
+            assert worker.wait(timeout=60) == 0
+
+        assert [outputs[name] for name in names] == [0, 1, 4, 9, 16, 25]
+        assert job_queue.num_pending() == 0
+        assert job_queue.num_claimed() == 0
+
+        # Clearing one submission leaves the tasks of others in the queue
+        others = job_queue.submit(pow, [(2, 3)], submission="other")
+        assert job_queue.clear(names[0].split("_task_")[0]) == 6
+        assert job_queue.num_pending() == 1
+        assert job_queue.result(names[0]) is None
+        assert job_queue.clear("other") == 1
+        assert job_queue.num_pending() == 0
+        assert others == ["other_task_00000.pickle"]
+
+
+if __name__ == "__main__":
+    test_job_queue()
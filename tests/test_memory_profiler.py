@@ -0,0 +1,82 @@
+import os
+import csv
+import tempfile
+
+from simuran.analysis.analysis_handler import AnalysisHandler
+
+_kept = []
+
+
+def keep_memory(size):
+    _kept.append(bytearray(size))
+    return size
+
+
+def open_figure():
+    import matplotlib.pyplot as plt
+
+    return plt.figure()
+
+
+def test_memory_profiler():
+    import matplotlib.pyplot as plt
+    from simuran.memory_profiler import (
+        MemoryProfiler,
+        memory_location,
+        profiling,
+        profile_memory,
+    )
+
+    with profile_memory("function", "not profiled"):
+        pass
+
+    profiler = MemoryProfiler()
+    ah = AnalysisHandler()
+    for _ in range(3):
+        ah.add_fn(keep_memory, 1024 * 1024)
+    ah.add_fn(sum, [1, 2, 3])
+    ah.add_fn(open_figure)
+    with profiling(profiler, "rec1"):
+        ah.run_all_fns()
+    with profiling(profiler, "rec2"):
+        with profile_memory("load", "signals"):
+            data = bytearray(4 * 1024 * 1024)
+            del data
+    plt.close("all")
+
+    assert [row["name"] for row in profiler.rows] == [
+        "keep_memory",
+        "keep_memory",
+        "keep_memory",
+        "sum",
+        "open_figure",
+        "signals",
+    ]
+    assert all(row["retained"] > 1000 * 1000 for row in profiler.rows[:3])
+    assert profiler.rows[4]["open_figures"] == 1
+    assert profiler.rows[5]["traced_peak"] > 4 * 1000 * 1000
+    assert profiler.rows[5]["retained"] < 1024 * 1024
+
+    leaks = profiler.find_leaks(min_calls=3)
+    assert [(stage, name) for stage, name, _, _, _ in leaks] == [
+        ("function", "keep_memory")
+    ]
+    assert [(s, n) for s, n, _, _, _ in profiler.find_leaks(min_calls=1)] == [
+        ("function", "keep_memory"),
+        ("function", "open_figure"),
+    ]
+    assert list(profiler.recording_table().keys()) == ["rec2", "rec1"]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        location = memory_location(os.path.join(temp_dir, "sim_results.csv"))
+        assert location == os.path.join(temp_dir, "sim_results--memory.csv")
+        profiler.save(location)
+        with open(location, "r", newline="") as f:
+            rows = list(csv.DictReader(f))
+        assert len(rows) == 6
+        assert rows[0]["recording"] == "rec1"
+    _kept.clear()
+
+
+if __name__ == "__main__":
+    test_memory_profiler()
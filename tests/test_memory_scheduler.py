@@ -0,0 +1,48 @@
+import os
+import tempfile
+
+
+def test_memory_scheduler():
+    from simuran.recording import Recording
+    from simuran.main.memory_scheduler import (
+        MemoryScheduler,
+        source_files_size,
+        estimate_recording_memory,
+    )
+    from simuran.main.worker_pool import get_worker_pool, shutdown_worker_pool
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        fnames = []
+        for i, size in enumerate((10, 20, 30)):
+            fname = os.path.join(temp_dir, "{}.bin".format(i))
+            with open(fname, "wb") as f:
+                f.write(b"0" * size)
+            fnames.append(fname)
+        assert source_files_size(
+            {"signals": fnames[:2], "units": [{"Spike": fnames[2], "Clusters": None}]}
+        ) == 60
+
+    # Recordings without parameters are estimated from their files alone
+    assert estimate_recording_memory(Recording()) == 0
+
+    gb = 1024 ** 3
+    scheduler = MemoryScheduler(ram_budget=3)
+    estimates = [1 * gb, 4 * gb, 2 * gb, 1 * gb]
+    assert scheduler.fits(4 * gb, {})
+    assert not scheduler.fits(1 * gb, {1: 4 * gb})
+    assert scheduler.fits(2 * gb, {0: 1 * gb})
+    assert not scheduler.fits(1 * gb, {2: 2 * gb, 0: 1 * gb})
+
+    try:
+        pool = get_worker_pool(2, preload_modules=[])
+        tasks = [(i,) for i in range(len(estimates))]
+        results = list(scheduler.run(pool, 2, abs, tasks, estimates))
+        assert sorted(results) == [0, 1, 2, 3]
+        assert results[0] == 1
+        assert scheduler.peak_in_flight <= 4 * gb
+    finally:
+        shutdown_worker_pool()
+
+
+if __name__ == "__main__":
+    test_memory_scheduler()
@@ -0,0 +1,168 @@
+import os
+import tempfile
+
+import numpy as np
+
+
+def test_csv_data():
+    from simuran.main.merge import csv_data
+
+    numbers = "Recording,Name,a,b\nr1,n1,1.5,2\n\nr2,n2, 3 ,nan\n"
+    data = csv_data(numbers)
+    assert data.shape == (2, 2)
+    assert np.allclose(data[:, 0], [1.5, 3])
+    assert np.isnan(data[1, 1])
+
+    mixed = 'Recording,Name,a,b,c\nr1,"n, 1",1,"[1, 2]",True\nr2,n2,NA,x,False\n'
+    data = csv_data(mixed)
+    assert data.shape == (2, 3)
+    assert data[0, 0] == 1
+    assert np.isnan(data[1, 0])
+    assert np.all(np.isnan(data[:, 1:]))
+
+
+def test_csv_merge():
+    from simuran.main.merge import csv_merge
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        contents = [
+            "Recording,Name,a,b\nr1,n1,1,2\nr2,n2,3,4\n",
+            'Recording,Name,a,b\nr1,"n, 1",2,x\n',
+        ]
+        for i, text in enumerate(contents):
+            os.makedirs(os.path.join(temp_dir, str(i)))
+            with open(os.path.join(temp_dir, str(i), "results.csv"), "w") as f:
+                f.write(text)
+        csv_merge(temp_dir)
+
+        with open(os.path.join(temp_dir, "merge.csv"), "r") as f:
+            merged = f.read()
+    # Files are merged in order of their paths
+    assert merged == (
+        contents[0]
+        + "Average,,2.0,3.0\nStd,,1.0,1.0\n\n"
+        + contents[1]
+        + "Average,,2.0,nan\nStd,,0.0,nan\n\n"
+    )
+
+
+def test_csv_merge_incremental():
+    from simuran.main.merge import csv_merge
+
+    def write(temp_dir, name, text):
+        os.makedirs(os.path.join(temp_dir, name), exist_ok=True)
+        with open(os.path.join(temp_dir, name, "results.csv"), "w") as f:
+            f.write(text)
+
+    def merged_text(temp_dir):
+        with open(os.path.join(temp_dir, "merge.csv"), "r") as f:
+            return f.read()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for i in range(3):
+            write(temp_dir, str(i), "Recording,Name,a\nr{},n,{}\n".format(i, i))
+        for keep_headers in (True, False):
+            assert csv_merge(temp_dir, keep_headers=keep_headers)["merged"] == 3
+            assert csv_merge(temp_dir, keep_headers=keep_headers)["skipped"] == 3
+
+            # New files are appended, changed and deleted files are replaced
+            write(temp_dir, "3", "Recording,Name,a\nr3,n,3\n")
+            counts = csv_merge(temp_dir, keep_headers=keep_headers)
+            assert counts == {"merged": 1, "skipped": 3, "removed": 0}
+            write(temp_dir, "2", "Recording,Name,a\nr2,n,10\nr2,n,20\n")
+            os.remove(os.path.join(temp_dir, "0", "results.csv"))
+            counts = csv_merge(temp_dir, keep_headers=keep_headers)
+            # Without headers, the new first file is merged again with its header
+            num_merged = 1 if keep_headers else 2
+            assert counts["merged"] == num_merged
+            assert counts["skipped"] == 3 - num_merged
+            assert counts["removed"] == 1
+            incremental = merged_text(temp_dir)
+            csv_merge(temp_dir, keep_headers=keep_headers, incremental=False)
+            assert incremental == merged_text(temp_dir)
+            assert "Average,,15.0" in incremental
+            write(temp_dir, "0", "Recording,Name,a\nr0,n,0\n")
+            write(temp_dir, "2", "Recording,Name,a\nr2,n,2\n")
+            os.remove(os.path.join(temp_dir, "3", "results.csv"))
+
+        # A merge.csv changed by hand is merged again
+        with open(os.path.join(temp_dir, "merge.csv"), "a") as f:
+            f.write("edited\n")
+        assert csv_merge(temp_dir, keep_headers=False)["merged"] == 3
+        assert "edited" not in merged_text(temp_dir)
+
+
+def test_merge_files():
+    from simuran.main.merge import merge_files
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for i in range(3):
+            plot_dir = os.path.join(temp_dir, "batch{}".format(i), "plots")
+            os.makedirs(plot_dir)
+            with open(os.path.join(plot_dir, "fig.png"), "wb") as f:
+                f.write(b"png" * (i + 1))
+        merged_dir = os.path.join(temp_dir, "all_results_merged")
+        merged = os.path.join(merged_dir, "batch0--plots--fig.png")
+        source = os.path.join(temp_dir, "batch0", "plots", "fig.png")
+
+        assert merge_files(temp_dir)["copied"] == 3
+        assert sorted(os.listdir(merged_dir))[0] == "batch0--plots--fig.png"
+        # Only files that changed are merged again
+        assert merge_files(temp_dir)["skipped"] == 3
+        with open(source, "wb") as f:
+            f.write(b"changed")
+        counts = merge_files(temp_dir)
+        assert counts == {
+            "copied": 1,
+            "linked": 0,
+            "skipped": 2,
+            "removed": 0,
+            "missing": 0,
+        }
+        with open(merged, "rb") as f:
+            assert f.read() == b"changed"
+
+        counts = merge_files(temp_dir, mode="symlink", num_threads=2)
+        assert counts["linked"] == 3
+        assert os.path.islink(merged)
+        assert merge_files(temp_dir, mode="symlink")["skipped"] == 3
+
+        assert merge_files(temp_dir, mode="hardlink")["linked"] == 3
+        assert os.path.samefile(merged, source)
+        assert not os.path.islink(merged)
+        assert merge_files(temp_dir)["skipped"] == 3
+        assert len(os.listdir(merged_dir)) == 3
+
+        # Merged files are restored, and removed with their source
+        os.remove(merged)
+        assert merge_files(temp_dir)["copied"] == 1
+        os.remove(source)
+        assert merge_files(temp_dir)["removed"] == 1
+        assert not os.path.exists(merged)
+        assert merge_files(temp_dir, all_result_ext="svg")["removed"] == 0
+        assert len(os.listdir(merged_dir)) == 2
+
+        # Files removed after the directories are listed are left out
+        from unittest import mock
+        import simuran.main.merge as merge_module
+
+        listed = merge_module.get_all_files_in_dir
+
+        def list_with_removed(d, **kwargs):
+            return listed(d, **kwargs) + [os.path.join(d, "gone.png")]
+
+        with mock.patch.object(merge_module, "get_all_files_in_dir", list_with_removed):
+            counts = merge_files(temp_dir)
+        assert counts["missing"] == 3
+        assert counts["skipped"] == 2
+        missing_src = os.path.join(temp_dir, "gone.png")
+        dst = os.path.join(merged_dir, "gone.png")
+        assert merge_module._merge_file(missing_src, dst) == "missing"
+        assert len(os.listdir(merged_dir)) == 2
+
+
+if __name__ == "__main__":
+    test_csv_data()
+    test_csv_merge()
+    test_csv_merge_incremental()
+    test_merge_files()
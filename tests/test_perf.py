@@ -0,0 +1,190 @@
+"""
+Performance regression tests, run with python -m pytest -m perf.
+
+Each test times a key path on fixed synthetic data, and measures its peak
+memory with tracemalloc, then compares them to tests/resources/perf_baselines.json.
+Timings depend on the machine, so after a deliberate change, or on a new
+machine, save new baselines with python -m pytest -m perf --update-baselines.
+New tests fail until their baselines are saved in the same way.
+Set SIMURAN_PERF_TOLERANCE to scale the allowed slowdown, for example
+to 2 on a busy machine.
+"""
+
+import os
+import json
+import time
+import tracemalloc
+
+import pytest
+
+here = os.path.dirname(os.path.abspath(__file__))
+BASELINES = os.path.join(here, "resources", "perf_baselines.json")
+
+# A test fails if it is this many times slower, plus a fixed margin
+TIME_TOLERANCE = 1.5
+TIME_MARGIN = 0.05
+MEMORY_TOLERANCE = 1.2
+MEMORY_MARGIN = 2 * 1024 * 1024
+
+pytestmark = pytest.mark.perf
+
+
+def measure(fn, repeat=3):
+    """Return the fastest time of fn over repeat calls, and its peak memory."""
+    fn()
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start_time)
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(times), peak
+
+
+def check_baseline(request, name, seconds, peak):
+    """
+    Compare a measurement to its baseline.
+
+    The measurement is saved as the baseline instead with --update-baselines.
+    A test without a baseline fails, so new or renamed tests are not
+    given one without asking.
+    """
+    baselines = {}
+    if os.path.isfile(BASELINES):
+        with open(BASELINES, "r") as f:
+            baselines = json.load(f)
+    if request.config.getoption("--update-baselines"):
+        baselines[name] = {"seconds": round(seconds, 4), "peak_bytes": peak}
+        with open(BASELINES + ".tmp", "w") as f:
+            json.dump(baselines, f, indent=4, sort_keys=True)
+            f.write("\n")
+        os.replace(BASELINES + ".tmp", BASELINES)
+        return
+    if name not in baselines:
+        pytest.fail(
+            "No baseline for {} in {}, save one with "
+            "python -m pytest -m perf --update-baselines".format(name, BASELINES)
+        )
+
+    baseline = baselines[name]
+    scale = float(os.environ.get("SIMURAN_PERF_TOLERANCE", 1.0))
+    max_seconds = baseline["seconds"] * TIME_TOLERANCE * scale + TIME_MARGIN
+    max_peak = baseline["peak_bytes"] * MEMORY_TOLERANCE + MEMORY_MARGIN
+    assert seconds <= max_seconds, "{} took {:.3f}s, the baseline is {:.3f}s".format(
+        name, seconds, baseline["seconds"]
+    )
+    assert peak <= max_peak, "{} used {:.1f}MB, the baseline is {:.1f}MB".format(
+        name, peak / 1024 ** 2, baseline["peak_bytes"] / 1024 ** 2
+    )
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    from simuran.synthetic import make_axona_dataset
+
+    out_dir = str(tmp_path_factory.mktemp("perf_axona"))
+    set_files = make_axona_dataset(
+        out_dir, fan_out=(4, 4), duration=120, num_channels=4, num_tetrodes=2
+    )
+    param_files = [
+        os.path.join(os.path.dirname(f), "simuran_params.py") for f in set_files
+    ]
+    return out_dir, param_files
+
+
+def summarise_recording(recording):
+    import numpy as np
+
+    return {
+        "power": float(np.mean([np.mean(s.samples ** 2) for s in recording.signals])),
+        "spikes": sum(len(u.timestamps) for u in recording.units),
+    }
+
+
+def sleep_recording(recording, seconds=0.3):
+    time.sleep(seconds)
+    return {"slept": seconds}
+
+
+def test_perf_recording_load(request, dataset):
+    from simuran.recording import Recording
+
+    _, param_files = dataset
+    seconds, peak = measure(lambda: Recording(param_file=param_files[0], load=True))
+    check_baseline(request, "recording_load", seconds, peak)
+
+
+def test_perf_container_setup(request, dataset):
+    from simuran.recording_container import RecordingContainer
+
+    _, param_files = dataset
+    seconds, peak = measure(lambda: RecordingContainer().setup(param_files))
+    check_baseline(request, "container_setup", seconds, peak)
+
+
+def test_perf_run_all_fns(request, dataset):
+    from simuran.recording import Recording
+    from simuran.analysis.analysis_handler import AnalysisHandler
+
+    _, param_files = dataset
+    recording = Recording(param_file=param_files[0], load=True)
+
+    def run_all_fns():
+        analysis_handler = AnalysisHandler()
+        for i in range(50):
+            analysis_handler.add_fn(summarise_recording, recording)
+        analysis_handler.run_all_fns()
+
+    seconds, peak = measure(run_all_fns)
+    check_baseline(request, "run_all_fns", seconds, peak)
+
+
+def test_perf_csv_merge(request, tmp_path):
+    from simuran.synthetic import make_results_tree
+    from simuran.main.merge import csv_merge
+
+    in_dir = str(tmp_path)
+    make_results_tree(in_dir, 200, figures=0)
+
+    def merge():
+        if os.path.isfile(os.path.join(in_dir, "merge.csv")):
+            os.remove(os.path.join(in_dir, "merge.csv"))
+        csv_merge(in_dir)
+
+    seconds, peak = measure(merge)
+    check_baseline(request, "csv_merge", seconds, peak)
+
+
+def test_perf_parallel_analysis(dataset):
+    """Recordings must be analysed at the same time with more than one worker."""
+    from simuran.recording_container import RecordingContainer
+    from simuran.main.main import run_all_analysis
+    from simuran.main.worker_pool import shutdown_worker_pool
+
+    start_dir, _ = dataset
+    rc = RecordingContainer()
+    rc.auto_setup(start_dir)
+    rc.container = rc.container[:4]
+    out_dir = os.path.join(start_dir, "out")
+
+    def run(num_cpus):
+        run_all_analysis(
+            rc, [sleep_recording], None, [], [], False, [], out_dir, num_cpus=num_cpus
+        )
+
+    try:
+        # Start the workers first, so only the analysis is timed
+        run(2)
+        start_time = time.perf_counter()
+        run(2)
+        parallel = time.perf_counter() - start_time
+    finally:
+        shutdown_worker_pool()
+
+    # Serial analysis sleeps for 4 * 0.3 seconds, two workers take half that
+    assert parallel < 0.75 * 4 * 0.3, "2 workers took {:.2f}s".format(parallel)
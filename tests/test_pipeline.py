@@ -0,0 +1,104 @@
+import os
+import time
+import tempfile
+import threading
+
+
+def test_async_pipeline():
+    from simuran.main.pipeline import AsyncPipeline, read_source_files
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        fnames = []
+        for i in range(5):
+            fname = os.path.join(temp_dir, "{}.bin".format(i))
+            with open(fname, "wb") as f:
+                f.write(b"0" * (i + 1) * 100)
+            fnames.append(fname)
+        assert read_source_files({"a": fnames[:2], "b": fnames[2]}) == 600
+
+        read, output = [], []
+        pipeline = AsyncPipeline(
+            pow,
+            io_fn=lambda task: read.append(read_source_files(fnames[task[0]])),
+            output_fn=output.append,
+            io_concurrency=2,
+            cpu_concurrency=2,
+            queue_depth=1,
+        )
+        pipeline.run([(i, 2) for i in range(5)])
+        assert sorted(read) == [100, 200, 300, 400, 500]
+        assert sorted(output) == [0, 1, 4, 9, 16]
+        for name in ("io", "cpu", "output"):
+            assert pipeline.metrics[name].num_items == 5
+        assert pipeline.metrics["cpu"].max_queue_depth <= 1
+
+        pipeline = AsyncPipeline(pow, output_fn=output.append)
+        try:
+            pipeline.run([(0, -1)])
+        except ZeroDivisionError:
+            pass
+        else:
+            raise AssertionError("Expected the pipeline to raise ZeroDivisionError")
+
+
+def test_async_pipeline_can_start():
+    from simuran.main.pipeline import AsyncPipeline
+
+    lock = threading.Lock()
+    in_flight = [0]
+    peak = [0]
+
+    def analyse(cost):
+        with lock:
+            in_flight[0] += cost
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.05)
+        with lock:
+            in_flight[0] -= cost
+        return cost
+
+    def can_start(task, running):
+        return len(running) == 0 or task[0] + sum(t[0] for t in running) <= 3
+
+    output = []
+    pipeline = AsyncPipeline(
+        analyse,
+        output_fn=output.append,
+        cpu_concurrency=3,
+        queue_depth=4,
+        can_start=can_start,
+    )
+    pipeline.run([(cost,) for cost in (4, 2, 1, 1, 2, 1)])
+    assert sorted(output) == [1, 1, 1, 2, 2, 4]
+    assert peak[0] == 4
+
+
+def test_pipeline_options():
+    import pytest
+    from simuran.recording_container import RecordingContainer
+    from simuran.main.main import check_pipeline_options, run_all_analysis
+
+    check_pipeline_options(True)
+    check_pipeline_options(None, task_timeout=10, retries=2)
+    for options in ({"task_timeout": 10}, {"retries": 1}):
+        with pytest.raises(ValueError):
+            check_pipeline_options({"io_concurrency": 2}, **options)
+        with pytest.raises(ValueError):
+            run_all_analysis(
+                RecordingContainer(),
+                [],
+                None,
+                [],
+                [],
+                False,
+                [],
+                "",
+                pipeline=True,
+                **options
+            )
+
+
+if __name__ == "__main__":
+    test_async_pipeline()
+    test_async_pipeline_can_start()
+    test_pipeline_options()
@@ -0,0 +1,54 @@
+import os
+import glob
+import time
+import tempfile
+
+
+def nested_sleep():
+    time.sleep(0.05)
+
+
+def test_profiler():
+    from simuran.profiler import profiling, get_profile_dir, collapsed_stacks
+    from simuran.profiler import load_profiles
+    from simuran.main.worker_pool import (
+        get_worker_pool,
+        imap_unordered,
+        shutdown_worker_pool,
+    )
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        profile_dir = os.path.join(temp_dir, "profile")
+        try:
+            pool = get_worker_pool(1, preload_modules=[])
+            for _ in range(2):
+                with profiling(profile_dir):
+                    assert get_profile_dir() == os.path.abspath(profile_dir)
+                    nested_sleep()
+                    list(imap_unordered(pool, time.sleep, [(0.1,), (0.1,)]))
+                assert get_profile_dir() is None
+        finally:
+            shutdown_worker_pool()
+
+        assert len(glob.glob(os.path.join(profile_dir, "profile-*.pstats"))) == 2
+        stats = load_profiles(profile_dir)
+        sleep = [f for f in stats.stats if f[2] == "<built-in method time.sleep>"]
+        # One call in the parent and, from the second run only, two in the worker
+        assert stats.stats[sleep[0]][1] == 3
+
+        with open(os.path.join(profile_dir, "profile.txt"), "r") as f:
+            report = f.read()
+        assert "Merged profile of 2 processes" in report
+        assert "nested_sleep" in report
+
+        with open(os.path.join(profile_dir, "profile.collapsed"), "r") as f:
+            lines = f.read().splitlines()
+        stacks = dict(line.rsplit(" ", 1) for line in lines)
+        assert int(stacks["<built-in method time.sleep>"]) >= 200000
+        nested = [s for s in stacks if s.endswith("time.sleep>") and "nested" in s]
+        assert len(nested) == 1 and nested[0].count(";") >= 1
+        assert lines == collapsed_stacks(stats)
+
+
+if __name__ == "__main__":
+    test_profiler()
@@ -0,0 +1,69 @@
+import os
+import json
+import tempfile
+
+import pytest
+
+
+def test_progress_reporter():
+    from simuran.main.progress import reporting, report_progress, tracking
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        status_file = os.path.join(temp_dir, "status.json")
+        with reporting(status_file, show=False) as reporter:
+            report_progress("total", "recordings", value=3)
+            with tracking("recordings", "a.set", 1024 ** 2):
+                assert reporter.summary()["running"][0]["task"] == "a.set"
+            with pytest.raises(ValueError):
+                with tracking("recordings", "b.set", 1024 ** 2):
+                    raise ValueError("Failed recording")
+            # Nested reporting blocks count with the outer reporter
+            with reporting() as inner:
+                assert inner is reporter
+            summary = reporter.summary()
+
+        recordings = summary["units"]["recordings"]
+        assert recordings["completed"] == 1
+        assert recordings["failed"] == 1
+        assert recordings["total"] == 3
+        assert summary["main_unit"] == "recordings"
+        assert summary["eta_seconds"] is not None
+        assert summary["running"] == []
+
+        with open(status_file, "r") as f:
+            status = json.load(f)
+        assert status["state"] == "finished"
+        assert status["units"]["recordings"]["completed"] == 1
+        assert status["mb_per_second"] > 0
+
+        # Events are dropped when nothing is reporting
+        report_progress("finish", "recordings", "c.set")
+
+
+def test_progress_from_workers():
+    from simuran.main.progress import reporting, report_progress
+    from simuran.main.worker_pool import (
+        get_worker_pool,
+        imap_unordered,
+        shutdown_worker_pool,
+    )
+
+    events = [("finish", "recordings", "rec{}".format(i), 10) for i in range(5)]
+    try:
+        pool = get_worker_pool(2, preload_modules=[])
+        # Workers only send events while the main process is reporting
+        list(imap_unordered(pool, report_progress, events))
+        with reporting(show=False) as reporter:
+            report_progress("total", "recordings", value=5)
+            list(imap_unordered(pool, report_progress, events))
+        summary = reporter.summary()
+    finally:
+        shutdown_worker_pool()
+
+    assert summary["units"]["recordings"]["completed"] == 5
+    assert reporter.nbytes == 50
+
+
+if __name__ == "__main__":
+    test_progress_reporter()
+    test_progress_from_workers()
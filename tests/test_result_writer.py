@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+
+def test_streaming_result_writer():
+    from simuran.recording import Recording
+    from simuran.recording_container import RecordingContainer
+    from simuran.main.result_writer import StreamingResultWriter
+
+    results = [
+        {"fn": {"rate": 1.23456}},
+        {"fn": {"rate": 2.0, "peak": 3, "note": "a, b"}},
+        {"fn": {"rate": None, "extra": 5}},
+        {"fn": {"rate": 4.5}},
+    ]
+    rc = RecordingContainer()
+    for i, result in enumerate(results):
+        rc.append(Recording(base_file=os.path.join("data", "rec{}.set".format(i))))
+        rc[-1].results = result
+    attr_list = [("results", "fn")]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        expected_loc = os.path.join(temp_dir, "expected.csv")
+        rc.save_summary_data(expected_loc, attr_list, decimals=2)
+
+        streamed_loc = os.path.join(temp_dir, "out", "streamed.csv")
+        writer = StreamingResultWriter(streamed_loc, rc, attr_list, decimals=2)
+        for i in (3, 0, 2, 1):
+            writer.add(i)
+            with open(streamed_loc, "r") as f:
+                assert len(f.readlines()) == len(writer._file_order) + 1
+        writer.finalize()
+
+        with open(expected_loc, "r") as f:
+            expected = f.read()
+        with open(streamed_loc, "r") as f:
+            assert f.read() == expected
+
+
+if __name__ == "__main__":
+    test_streaming_result_writer()
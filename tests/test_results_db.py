@@ -0,0 +1,125 @@
+import os
+import tempfile
+
+
+def make_recordings(name, num_recordings):
+    from simuran.recording import Recording
+
+    recordings = []
+    for i in range(num_recordings):
+        recording = Recording(
+            base_file=os.path.join("data", "{}_rec{}.set".format(name, i))
+        )
+        recording.results = {
+            "rate": {"mean": i + 0.5, "label": "a, b"},
+            "rate_1": {"mean": i * 2.0},
+            "count": i,
+        }
+        recording.argument_sets = {
+            "rate": "slow: args=[], kwargs={'bins': 10}",
+            "rate_1": "fast: args=[], kwargs={'bins': 2}",
+        }
+        recordings.append(recording)
+    return recordings
+
+
+def write_results(location, name, num_recordings):
+    """Add the results of fake recordings to the database at location."""
+    from simuran.main.results_db import ResultsDatabase
+
+    database = ResultsDatabase(location, batch=name, batch_size=7)
+    for recording in make_recordings(name, num_recordings):
+        database.add(recording)
+    database.close()
+    return database.run_id, database.num_rows
+
+
+def test_results_db():
+    from simuran.main.results_db import query_results, list_runs, cli
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        location = os.path.join(temp_dir, "db", "results.sqlite")
+        run_id, num_rows = write_results(location, "batch_a", 3)
+        assert num_rows == 12
+        write_results(location, "batch_b", 2)
+
+        frame = query_results(location)
+        assert len(frame) == 20
+        assert set(frame["batch"]) == {"batch_a", "batch_b"}
+        frame = query_results(location, function="rate*", key="mean", batch="*_a")
+        assert list(frame["value"]) == [0.5, 0.0, 1.5, 2.0, 2.5, 4.0]
+        assert frame["args"].iloc[0] == "slow: args=[], kwargs={'bins': 10}"
+        assert (frame["run_id"] == run_id).all()
+        frame = query_results(location, function="rate", key="label")
+        assert frame["text"].iloc[0] == "a, b"
+        recording = os.path.join("data", "batch_b_rec1.set")
+        frame = query_results(location, recording=recording, function="count")
+        assert list(frame["value"]) == [1.0]
+        assert list(frame["args"]) == [""]
+
+        runs = list_runs(location)
+        assert list(runs["batch"]) == ["batch_a", "batch_b"]
+        assert list(runs["num_results"]) == [12, 8]
+
+        out_loc = os.path.join(temp_dir, "out.csv")
+        assert len(cli([location, "--function", "count", "-o", out_loc])) == 5
+        assert os.path.isfile(out_loc)
+
+
+def test_argument_sets():
+    from simuran.recording import Recording
+    from simuran.analysis.analysis_handler import AnalysisHandler
+    from simuran.main.main import _add_recording_fns, _argument_sets
+
+    def rate(recording, bins=1, simuran_save_result=True):
+        return bins
+
+    def count(recording):
+        return 1
+
+    function_args = {
+        "rate": {
+            "slow": ([], {"bins": 10}),
+            "skipped": ([], {"simuran_save_result": False}),
+            "fast": ([2], {}),
+        }
+    }
+    functions = [rate, count]
+    handler = AnalysisHandler()
+    _add_recording_fns(handler, Recording(), functions, function_args)
+    handler.run_all_fns()
+    argument_sets = _argument_sets(functions, function_args)
+    assert list(argument_sets) == list(handler.results)
+    assert argument_sets == {
+        "rate": "slow: args=[], kwargs={'bins': 10}",
+        "rate_1": "fast: args=[2], kwargs={}",
+        "count": "args=[], kwargs={}",
+    }
+
+
+def test_results_db_parallel():
+    from simuran.main.results_db import query_results, list_runs
+    from simuran.main.worker_pool import (
+        get_worker_pool,
+        imap_unordered,
+        shutdown_worker_pool,
+    )
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        location = os.path.join(temp_dir, "results.sqlite")
+        tasks = [(location, "batch{}".format(i), 20) for i in range(6)]
+        try:
+            pool = get_worker_pool(3, preload_modules=[])
+            outputs = list(imap_unordered(pool, write_results, tasks))
+        finally:
+            shutdown_worker_pool()
+        assert sorted(num_rows for _, num_rows in outputs) == [80] * 6
+        assert len(list_runs(location)) == 6
+        assert len(query_results(location)) == 480
+        assert len(query_results(location, function="count", batch="batch3")) == 20
+
+
+if __name__ == "__main__":
+    test_results_db()
+    test_argument_sets()
+    test_results_db_parallel()
@@ -0,0 +1,60 @@
+def test_shard_indices():
+    from simuran.main.shard import parse_shard, shard_indices, run_list_weights
+
+    assert parse_shard("1/3") == (1, 3)
+    for bad in ("3/3", "-1/2", "a/2", "1"):
+        try:
+            parse_shard(bad)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("Expected {} to be rejected".format(bad))
+
+    weights = run_list_weights(
+        [{"shard_weight": w} for w in (5, 1, 1, 3, 2, 2)] + [{}, {}]
+    )
+    shards = [shard_indices(weights, i, 3) for i in range(3)]
+    assert sorted(sum(shards, [])) == list(range(8))
+    loads = [sum(weights[i] for i in shard) for shard in shards]
+    assert max(loads) - min(loads) <= 1
+    assert shards == [shard_indices(weights, i, 3) for i in range(3)]
+
+
+def test_run_list_weights():
+    import os
+    import tempfile
+
+    from simuran.main.shard import run_list_weights, shard_indices
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        run_list = []
+        for name, sizes in (("big", (300, 500)), ("small", (100,)), ("tiny", (10,))):
+            for i, size in enumerate(sizes):
+                rec_dir = os.path.join(temp_dir, name, "rec{}".format(i))
+                os.makedirs(rec_dir)
+                with open(os.path.join(rec_dir, "data.bin"), "wb") as f:
+                    f.write(b"0" * size)
+            os.makedirs(os.path.join(temp_dir, name, "skipped"))
+            with open(os.path.join(temp_dir, name, "skipped", "data.bin"), "wb") as f:
+                f.write(b"0" * 1000)
+            batch_loc = os.path.join(temp_dir, name + "_batch_params.py")
+            params = {
+                "start_dir": os.path.join(temp_dir, name),
+                "regex_filters": ["rec.*"],
+            }
+            with open(batch_loc, "w") as f:
+                f.write("params = {!r}\n".format(params))
+            run_list.append({"batch_param_loc": batch_loc})
+        run_list.append({"batch_param_loc": os.path.join(temp_dir, "missing.py")})
+
+        # Sized by the files that match the filters, missing configs get the mean
+        weights = run_list_weights(run_list)
+        assert weights == [800.0, 100.0, 10.0, 910.0 / 3]
+        assert shard_indices(weights, 0, 2) == [0]
+        run_list[0]["shard_weight"] = 1
+        assert run_list_weights(run_list)[0] == 1.0
+
+
+if __name__ == "__main__":
+    test_shard_indices()
+    test_run_list_weights()
@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+import subprocess
+
+here = os.path.dirname(os.path.abspath(__file__))
+main_dir = os.path.dirname(here)
+
+# Packages that only analysis, loading, and plotting should import
+HEAVY_MODULES = ("matplotlib", "neurochat", "mne", "seaborn", "pandas", "scipy", "tqdm")
+# Seconds that starting the command line interface may add to starting Python
+STARTUP_BUDGET = 1.0
+
+
+def run_python(code, **env):
+    """Run code in a new Python process and return its output."""
+    full_env = dict(os.environ)
+    full_env["PYTHONPATH"] = os.pathsep.join(
+        [main_dir] + [p for p in [os.environ.get("PYTHONPATH")] if p]
+    )
+    for key, value in env.items():
+        if value is None:
+            full_env.pop(key, None)
+        else:
+            full_env[key] = value
+    return subprocess.check_output(
+        [sys.executable, "-c", code], env=full_env, cwd=main_dir
+    ).decode()
+
+
+def best_time(code, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        run_python(code)
+        times.append(time.perf_counter() - start_time)
+    return min(times)
+
+
+def test_lazy_imports():
+    code = (
+        "import sys, simuran.cli, simuran.main.merge, simuran.recording_container\n"
+        "print(','.join(m for m in {} if m in sys.modules))".format(HEAVY_MODULES)
+    )
+    assert run_python(code).strip() == ""
+
+
+def test_startup_time():
+    python_time = best_time("pass")
+    for argv in (["simuran", "--help"], ["simuran-merge", "--help"]):
+        entry = "cli_entry" if argv[0] == "simuran" else "merge_entry"
+        code = (
+            "import sys\n"
+            "sys.argv = {}\n"
+            "from simuran.cli import {}\n"
+            "try:\n"
+            "    {}()\n"
+            "except SystemExit:\n"
+            "    pass\n".format(argv, entry, entry)
+        )
+        startup_time = best_time(code) - python_time
+        assert startup_time < STARTUP_BUDGET, "{} took {:.2f}s".format(
+            " ".join(argv), startup_time
+        )
+
+
+def test_headless_backend():
+    code = (
+        "import simuran.main.main, matplotlib.pyplot as plt\n"
+        "print(plt.get_backend())"
+    )
+    backend = run_python(code, DISPLAY=None, WAYLAND_DISPLAY=None, MPLBACKEND=None)
+    if sys.platform.startswith("linux"):
+        assert backend.strip().lower() == "agg"
+
+
+if __name__ == "__main__":
+    test_lazy_imports()
+    test_startup_time()
+    test_headless_backend()
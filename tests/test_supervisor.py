@@ -0,0 +1,107 @@
+import os
+import time
+import tempfile
+
+
+def fail_once(marker):
+    """Raise an error the first time this is called with marker."""
+    if not os.path.isfile(marker):
+        with open(marker, "w"):
+            pass
+        raise ValueError("First attempt")
+    return "done"
+
+
+def test_supervisor():
+    from simuran.main.supervisor import TaskSupervisor
+    from simuran.main.worker_pool import get_worker_pool, shutdown_worker_pool
+
+    try:
+        supervisor = TaskSupervisor(
+            timeout=1.0, retries=1, backoff=0.1, raise_errors=False, poll_interval=0.05
+        )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            tasks = [
+                (fail_once, (os.path.join(temp_dir, "marker"),)),
+                (time.sleep, (60,)),
+                (os._exit, (1,)),
+                (abs, (-3,)),
+            ]
+            pool = get_worker_pool(2, preload_modules=[])
+            start_time = time.monotonic()
+            results = dict(
+                supervisor.run(
+                    pool,
+                    2,
+                    _call,
+                    tasks,
+                    labels=["retry", "hang", "crash", "ok"],
+                )
+            )
+            assert time.monotonic() - start_time < 30
+        assert results == {0: "done", 3: 3}
+        failures = {f.label: f for f in supervisor.failures}
+        assert sorted(failures.keys()) == ["crash", "hang"]
+        assert failures["hang"].attempts == 2
+        assert "timed out" in failures["hang"].cause
+        assert "died" in failures["crash"].cause
+
+        # The pool is replaced after workers were lost
+        pool = get_worker_pool(2, preload_modules=[])
+        supervisor = TaskSupervisor(poll_interval=0.05)
+        try:
+            list(supervisor.run(pool, 2, _call, [(int, ("x",))]))
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("Expected the task error to be raised")
+        assert len(supervisor.failures) == 1
+    finally:
+        shutdown_worker_pool()
+
+
+def _call(fn, args):
+    return fn(*args)
+
+
+def hang_on_b(recording):
+    """Hang on the recording named b, return 1 otherwise."""
+    if os.path.basename(recording.source_file) == "b.set":
+        time.sleep(60)
+    return 1
+
+
+def test_supervised_recordings():
+    from simuran.recording import Recording
+    from simuran.recording_container import RecordingContainer
+    from simuran.main.main import run_all_analysis
+    from simuran.main.worker_pool import shutdown_worker_pool
+
+    rc = RecordingContainer()
+    for name in ("a", "b", "c"):
+        rc.append(Recording(base_file=os.path.join("data", name + ".set")))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        try:
+            start_time = time.monotonic()
+            # The recording that times out does not stop the others
+            run_all_analysis(
+                rc,
+                [hang_on_b],
+                None,
+                [],
+                [],
+                False,
+                [],
+                temp_dir,
+                num_cpus=2,
+                task_timeout=2,
+            )
+            assert time.monotonic() - start_time < 30
+        finally:
+            shutdown_worker_pool()
+    assert [dict(r.results) for r in rc] == [{"hang_on_b": 1}, {}, {"hang_on_b": 1}]
+
+
+if __name__ == "__main__":
+    test_supervisor()
+    test_supervised_recordings()
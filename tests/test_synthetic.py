@@ -0,0 +1,50 @@
+import os
+import tempfile
+
+import numpy as np
+
+
+def test_synthetic_axona():
+    from simuran.synthetic import make_axona_dataset
+    from simuran.recording_container import RecordingContainer
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        set_files = make_axona_dataset(
+            temp_dir,
+            fan_out=(2, 1),
+            duration=4,
+            num_channels=2,
+            num_tetrodes=2,
+            spike_rate=10,
+            num_units=2,
+        )
+        assert [os.path.relpath(f, temp_dir) for f in set_files] == [
+            os.path.join("d0", "d0", "rec0_0.set"),
+            os.path.join("d1", "d0", "rec1_0.set"),
+        ]
+
+        rc = RecordingContainer()
+        rc.auto_setup(temp_dir)
+        assert len(rc) == 2
+        recording = rc.get(0)
+
+        assert len(recording.signals) == 2
+        signal = recording.signals[1].underlying
+        assert len(signal.get_samples()) == 4 * 250
+        assert signal.get_channel_id() == 2
+        assert np.std(signal.get_samples()) > 0
+
+        unit = recording.units[1].underlying
+        assert unit.get_unit_list() == [1, 2]
+        times = unit.get_timestamp()
+        assert len(times) == len(unit.get_unit_tags()) > 0
+        assert np.all(np.diff(times) >= 0) and times[-1] <= 4
+        assert unit.get_waveform()["ch4"].shape == (len(times), 50)
+
+        spatial = recording.spatial.underlying
+        assert len(spatial.get_pos_x()) == 4 * 50
+        assert np.min(spatial.get_pos_x()) == 0
+
+
+if __name__ == "__main__":
+    test_synthetic_axona()
@@ -0,0 +1,119 @@
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+
+def make_container(results):
+    from simuran.recording import Recording
+    from simuran.recording_container import RecordingContainer
+
+    rc = RecordingContainer()
+    for i, result in enumerate(results):
+        rc.append(Recording(base_file=os.path.join("data", "rec{}.set".format(i))))
+        rc[-1].results = result
+    return rc
+
+
+def test_result_tables():
+    pytest.importorskip("pyarrow")
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    from simuran.main.table_store import save_result_tables, open_result_table
+
+    batches = {
+        "batch_a": [
+            {"fn": {"rate": 1.23456, "ok": True, "spikes": [1, 2]}},
+            {"fn": {"rate": None, "ok": False, "spikes": []}, "other": 5},
+        ],
+        "batch_b": [{"fn": {"rate": np.float64(2.5), "peak": 3, "ok": None}}],
+    }
+    attr_list = [("results", "fn")]
+    for fmt in ("parquet", "feather"):
+        with tempfile.TemporaryDirectory() as table_dir:
+            for batch, results in batches.items():
+                locations = save_result_tables(
+                    make_container(results),
+                    attr_list,
+                    table_dir,
+                    "fn_config",
+                    batch,
+                    fmt=fmt,
+                    decimals=2,
+                )
+                assert locations["summary"].endswith(
+                    os.path.join("function_config=fn_config", "batch=" + batch)
+                    + os.sep
+                    + "part-0."
+                    + fmt
+                )
+
+            summary = open_result_table(table_dir, fmt=fmt)
+            schema = summary.schema
+            assert schema.field("rate").type == pa.float64()
+            # Booleans are rounded to numbers, as in the summary csv
+            assert schema.field("ok").type == pa.float64()
+            assert schema.field("spikes").type == pa.string()
+            assert schema.field("source_name").type == pa.string()
+            # A column only saved by batch_b is null in batch_a
+            assert schema.field("peak").type == pa.float64()
+            frame = summary.to_table().to_pandas().sort_values("batch")
+            assert list(frame["batch"]) == ["batch_a", "batch_a", "batch_b"]
+            assert frame["rate"].iloc[0] == 1.23
+            assert np.isnan(frame["peak"].iloc[0])
+
+            results = open_result_table(table_dir, table="results", fmt=fmt)
+            table = results.to_table(
+                filter=(ds.field("batch") == "batch_a") & (ds.field("key") == "")
+            )
+            assert table.column("function").to_pylist() == ["other"]
+            assert table.column("value").to_pylist() == [5.0]
+            assert results.count_rows() == 10
+
+            # Saving a batch again replaces its files
+            save_result_tables(
+                make_container(batches["batch_b"][:0]),
+                attr_list,
+                table_dir,
+                "fn_config",
+                "batch_b",
+                fmt=fmt,
+            )
+            results = open_result_table(table_dir, table="results", fmt=fmt)
+            assert results.count_rows() == 7
+
+
+def test_mixed_type_tables():
+    pytest.importorskip("pyarrow")
+    import pyarrow as pa
+    from simuran.main.table_store import (
+        open_result_table,
+        summary_table,
+        table_location,
+        write_table,
+    )
+
+    batches = {
+        "batch_a": [{"rate": 1.5, "ok": True, "peak": None}],
+        "batch_b": [{"rate": [1, 2], "ok": 2.0, "peak": None}],
+    }
+    for fmt in ("parquet", "feather"):
+        with tempfile.TemporaryDirectory() as table_dir:
+            for batch, rows in batches.items():
+                location = table_location(table_dir, "summary", "fn", batch, fmt)
+                write_table(summary_table(rows), location, fmt=fmt)
+
+            summary = open_result_table(table_dir, fmt=fmt)
+            schema = summary.schema
+            assert schema.field("rate").type == pa.string()
+            assert schema.field("ok").type == pa.float64()
+            assert schema.field("peak").type == pa.null()
+            frame = summary.to_table().to_pandas().sort_values("batch")
+            assert list(frame["rate"]) == ["1.5", "[1, 2]"]
+            assert list(frame["ok"]) == [1.0, 2.0]
+
+
+if __name__ == "__main__":
+    test_result_tables()
+    test_mixed_type_tables()
@@ -0,0 +1,46 @@
+import os
+import csv
+import time
+import tempfile
+
+from simuran.analysis.analysis_handler import AnalysisHandler
+
+
+def test_timing_table():
+    from simuran.main.timing import TimingTable, timings_location
+
+    ah = AnalysisHandler()
+    ah.add_fn(time.sleep, 0.02)
+    ah.add_fn(abs, -1)
+    ah.run_all_fns()
+    assert [name for name, _ in ah.timings] == ["sleep", "abs"]
+    assert ah.timings[0][1] >= 0.02
+    ah.reset()
+    assert ah.timings == []
+
+    timings = TimingTable()
+    timings.add("load", 1.0, "rec1", "signals")
+    timings.add("analysis", 3.0, "rec1", "fn_a")
+    timings.add("analysis", 0.5, "rec2", "fn_b")
+    timings.add("analysis", 1.0, "rec2", "fn_a")
+    with timings.timer("summary", name="finalize"):
+        pass
+    assert list(timings.totals("name", stage="analysis").items()) == [
+        ("fn_a", 4.0),
+        ("fn_b", 0.5),
+    ]
+    assert list(timings.totals("recording").keys())[:2] == ["rec1", "rec2"]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        location = timings_location(os.path.join(temp_dir, "sim_results.csv"))
+        assert location == os.path.join(temp_dir, "sim_results--timings.csv")
+        timings.save(location)
+        with open(location, "r", newline="") as f:
+            rows = list(csv.DictReader(f))
+        assert len(rows) == 5
+        assert rows[0]["name"] == "signals"
+        assert float(rows[1]["seconds"]) == 3.0
+
+
+if __name__ == "__main__":
+    test_timing_table()
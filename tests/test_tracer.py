@@ -0,0 +1,55 @@
+import os
+import json
+import tempfile
+
+
+def test_tracer():
+    from simuran.tracer import trace, tracing, get_trace_dir
+    from simuran.main.pipeline import read_source_files
+    from simuran.main.worker_pool import (
+        get_worker_pool,
+        imap_unordered,
+        shutdown_worker_pool,
+    )
+
+    with trace("not traced", "main"):
+        pass
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        trace_dir = os.path.join(temp_dir, "trace")
+        fname = os.path.join(temp_dir, "data.bin")
+        with open(fname, "wb") as f:
+            f.write(b"0" * 100)
+
+        try:
+            pool = get_worker_pool(2, preload_modules=[])
+            with tracing(trace_dir):
+                assert get_trace_dir() == os.path.abspath(trace_dir)
+                with trace("outer", "main", value=1):
+                    sizes = list(imap_unordered(pool, read_source_files, [(fname,)]))
+            assert sizes == [100]
+            assert get_trace_dir() is None
+        finally:
+            shutdown_worker_pool()
+
+        with open(os.path.join(trace_dir, "trace.json"), "r") as f:
+            events = json.load(f)["traceEvents"]
+
+    phases = [(e["ph"], e["name"]) for e in events if e["ph"] != "M"]
+    assert phases == [
+        ("B", "outer"),
+        ("B", "read_source_files"),
+        ("E", "read_source_files"),
+        ("E", "outer"),
+    ]
+    by_name = {e["name"]: e for e in events if e["ph"] == "B"}
+    outer, worker = by_name["outer"], by_name["read_source_files"]
+    assert outer["args"] == {"value": 1}
+    assert worker["pid"] != outer["pid"]
+    assert worker["cat"] == "io"
+    process_names = [e for e in events if e["ph"] == "M"]
+    assert len(process_names) == 2
+
+
+if __name__ == "__main__":
+    test_tracer()
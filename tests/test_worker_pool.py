@@ -0,0 +1,58 @@
+import os
+import time
+
+
+def test_worker_pool_reuse():
+    from simuran.main.worker_pool import (
+        get_worker_pool,
+        imap_unordered,
+        shutdown_worker_pool,
+    )
+
+    try:
+        pool = get_worker_pool(2, preload_modules=[])
+        pids = set(imap_unordered(pool, os.getpid, [()] * 4))
+        assert get_worker_pool(2, preload_modules=[]) is pool
+        pids_again = set(imap_unordered(pool, os.getpid, [()] * 4))
+        assert pids_again <= pids
+        assert os.getpid() not in pids
+    finally:
+        shutdown_worker_pool()
+
+
+def sleep_interval(seconds):
+    start = time.monotonic()
+    time.sleep(seconds)
+    return start, time.monotonic(), os.environ["OMP_NUM_THREADS"]
+
+
+def test_worker_pool_larger():
+    from simuran.main.worker_pool import (
+        get_worker_pool,
+        imap_unordered,
+        shutdown_worker_pool,
+    )
+
+    try:
+        pool = get_worker_pool(3, num_threads=1, preload_modules=[])
+        # A smaller job with more threads re-uses the larger pool
+        assert get_worker_pool(2, num_threads=2, preload_modules=[]) is pool
+        tasks = [(0.2,)] * 4
+        intervals = sorted(imap_unordered(pool, sleep_interval, tasks, chunksize=1))
+        assert {threads for _, _, threads in intervals} == {"2"}
+        intervals = sorted(
+            imap_unordered(pool, sleep_interval, tasks, chunksize=1, max_in_flight=2)
+        )
+        assert len(intervals) == 4
+        # At most two tasks overlap at any time
+        for start, _, _ in intervals:
+            running = [1 for s, e, _ in intervals if s <= start < e]
+            assert len(running) <= 2
+        assert get_worker_pool(4, preload_modules=[]) is not pool
+    finally:
+        shutdown_worker_pool()
+
+
+if __name__ == "__main__":
+    test_worker_pool_reuse()
+    test_worker_pool_larger()